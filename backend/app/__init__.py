@@ -15,6 +15,10 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from config.settings import get_config
 from .models.base import db
+from .cache import purchase_cache, user_cache
+from .login_tracker import login_tracker
+from . import unit_of_work
+from .services.allowlist_service import approved_email_index
 
 
 # Initialize extensions
@@ -24,7 +28,7 @@ mail = Mail()
 
 def create_app(config_name=None):
     """Application factory function"""
-    app = Flask(__name__)
+    app = Flask(__name__, template_folder='../templates')
     
     # Load configuration
     if config_name is None:
@@ -32,10 +36,23 @@ def create_app(config_name=None):
     
     config_class = get_config()
     app.config.from_object(config_class)
+    if app.config.get('UPLOAD_SERVE_MODE') == 'x-sendfile':
+        app.config['USE_X_SENDFILE'] = True
     
     # Initialize extensions
     db.init_app(app)
+    purchase_cache.configure(
+        maxsize=app.config.get('PURCHASE_CACHE_MAX_ENTRIES'),
+        ttl=app.config.get('PURCHASE_CACHE_TIMEOUT')
+    )
+    user_cache.configure(
+        maxsize=app.config.get('USER_CACHE_MAX_ENTRIES'),
+        ttl=app.config.get('USER_CACHE_TIMEOUT')
+    )
     login_manager.init_app(app)
+    login_tracker.init_app(app)
+    unit_of_work.init_app(app)
+    approved_email_index.refresh_interval = app.config.get('ALLOWLIST_REFRESH_INTERVAL', 60)
     mail.init_app(app)
     
     # Configure CORS with more explicit settings
@@ -54,7 +71,13 @@ def create_app(config_name=None):
     @login_manager.user_loader
     def load_user(user_id):
         from .models import User
-        return User.query.get(int(user_id))
+        return User.get_cached(int(user_id))
+    
+    @login_manager.request_loader
+    def load_user_from_token(request):
+        # Bearer access tokens authorize API calls without a database lookup
+        from .services.token_service import TokenService
+        return TokenService.user_from_request(request.headers.get('Authorization'))
     
     # Add after_request handler for additional CORS headers
     @app.after_request
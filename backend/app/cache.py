@@ -0,0 +1,131 @@
+"""
+In-process caches shared by the services
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after ``ttl`` seconds.
+
+    Each gunicorn worker holds its own instance, so a write made in one
+    worker is seen by the others at the latest ``ttl`` seconds later.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize: int = None, ttl: float = None) -> None:
+        """Apply limits from app configuration"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry, or ``default``"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store an entry, evicting the least recently used ones past ``maxsize``"""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the cached value, computing and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate and size counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
+
+    def _evict(self) -> None:
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+# Aggregates computed over purchases (statistics, list facets); flushed whenever a
+# transaction that changed purchases commits.
+purchase_cache = TTLCache(maxsize=512, ttl=30)
+
+# Column snapshots of users for the flask-login user loader, keyed by id.
+# Entries are dropped when a transaction that changed the user commits;
+# other workers pick the change up within ``ttl`` seconds.
+user_cache = TTLCache(maxsize=1024, ttl=60)
+
+_PURCHASES_CHANGED = 'purchases_changed'
+_USERS_CHANGED = 'users_changed'
+
+
+def mark_purchases_changed(session: Session) -> None:
+    """Flag the session so purchase caches are flushed once it commits"""
+    session.info[_PURCHASES_CHANGED] = True
+
+
+def mark_user_changed(session: Session, user_id: int) -> None:
+    """Record a changed user so its cache entry is dropped once the session commits"""
+    session.info.setdefault(_USERS_CHANGED, set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _flush_purchase_cache(session):
+    if session.info.pop(_PURCHASES_CHANGED, False):
+        purchase_cache.clear()
+    for user_id in session.info.pop(_USERS_CHANGED, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_purchase_changes(session):
+    session.info.pop(_PURCHASES_CHANGED, None)
+    session.info.pop(_USERS_CHANGED, None)
@@ -0,0 +1,167 @@
+"""
+Filter language for purchase list queries
+
+``GET /api/purchases`` accepts arguments of the form ``field[op]=value``.
+A bare ``field=value`` means ``eq``, or ``in`` when the value holds
+several comma-separated entries:
+
+    status=Purchased,Shipped
+    urgency[nin]=Neither
+    created_at[gte]=2024-01-01&created_at[lt]=2024-02-01
+    total_cost[gt]=500&requester=alice@mit.edu
+
+Conditions on the same or different fields are ANDed. Each one compiles to
+a plain comparison on the column itself, never wrapped in a function, so
+the planner can use the indexes declared in ``Purchase.__table_args__``.
+"""
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterable, List, Mapping, Tuple
+
+from .models import Purchase, PurchaseStatus, ApprovalStatus, UrgencyLevel
+
+_EQUALITY_OPS = ('eq', 'ne', 'in', 'nin')
+_RANGE_OPS = ('gt', 'gte', 'lt', 'lte')
+
+_ARGUMENT = re.compile(r'^(\w+)(?:\[(\w+)\])?$')
+
+
+def _parse_enum(enum):
+    def parse(value: str):
+        try:
+            return enum(value)
+        except ValueError:
+            raise ValueError(f'Invalid value {value!r}; use one of {", ".join(member.value for member in enum)}')
+    return parse
+
+
+def _parse_date(value: str):
+    """A datetime, or a bare date which range bounds widen to the whole day"""
+    try:
+        if 'T' in value or ' ' in value or ':' in value:
+            return datetime.fromisoformat(value)
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date {value!r}; use YYYY-MM-DD or an ISO 8601 datetime')
+
+
+def _parse_amount(value: str) -> Decimal:
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount {value!r}')
+    return amount
+
+
+def _parse_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'Invalid id {value!r}')
+
+
+# Filterable fields: (column, operators, value parser)
+FILTER_FIELDS = {
+    'status': (Purchase.status, _EQUALITY_OPS, _parse_enum(PurchaseStatus)),
+    'approval_status': (Purchase.approval_status, _EQUALITY_OPS, _parse_enum(ApprovalStatus)),
+    'urgency': (Purchase.urgency, _EQUALITY_OPS, _parse_enum(UrgencyLevel)),
+    'subteam': (Purchase.subteam, _EQUALITY_OPS, str),
+    'requester': (Purchase.requester_email, _EQUALITY_OPS, str),
+    'user_id': (Purchase.user_id, _EQUALITY_OPS, _parse_int),
+    'created_at': (Purchase.created_at, _RANGE_OPS, _parse_date),
+    'shipped_at': (Purchase.shipped_at, _RANGE_OPS, _parse_date),
+    'arrived_at': (Purchase.arrived_at, _RANGE_OPS, _parse_date),
+    'total_cost': (Purchase.total_cost, _RANGE_OPS, _parse_amount),
+}
+
+# Older argument names, kept working for existing clients
+ALIASES = {
+    'min_cost': ('total_cost', 'gte'),
+    'max_cost': ('total_cost', 'lte'),
+}
+
+
+class PurchaseFilter:
+    """Parsed ``field[op]=value`` conditions for the purchase list"""
+
+    def __init__(self, conditions: Iterable[Tuple[str, str, tuple]] = ()):
+        self.conditions = tuple(sorted(conditions, key=repr))
+
+    @classmethod
+    def from_args(cls, args: Mapping[str, Any]) -> 'PurchaseFilter':
+        """Parse the filter arguments out of a request's query string.
+
+        Arguments that are not filters (``page``, ``sort``, ...) are
+        ignored; an unknown operator or an unparsable value raises
+        ``ValueError``.
+        """
+        conditions = []
+        for key in args:
+            field, op = ALIASES.get(key, (None, None))
+            if field is None:
+                match = _ARGUMENT.match(key)
+                if not match or match.group(1) not in FILTER_FIELDS:
+                    continue
+                field, op = match.groups()
+
+            _, ops, parse = FILTER_FIELDS[field]
+            raw = args.getlist(key) if hasattr(args, 'getlist') else [args[key]]
+            entries = [entry.strip() for value in raw if value is not None
+                       for entry in str(value).split(',') if entry.strip()]
+            if not entries:
+                continue
+
+            if op is None:
+                op = 'in' if len(entries) > 1 else 'eq'
+                if op not in ops:
+                    raise ValueError(f'{field} needs an operator: {field}[{"|".join(ops)}]=value')
+            elif op not in ops:
+                raise ValueError(f'Unknown operator {field}[{op}]; use one of {", ".join(ops)}')
+            if op not in ('in', 'nin') and len(entries) > 1:
+                raise ValueError(f'{field}[{op}] takes a single value')
+
+            try:
+                values = tuple(parse(entry) for entry in entries)
+            except ValueError as e:
+                raise ValueError(f'{field}: {e}')
+            conditions.append((field, op, values))
+        return cls(conditions)
+
+    def __bool__(self) -> bool:
+        return bool(self.conditions)
+
+    def key(self) -> tuple:
+        """Hashable identity of the filter, for cache keys"""
+        return self.conditions
+
+    def clauses(self) -> List:
+        """SQL expressions for the conditions, to be ANDed together"""
+        return [_compile(field, op, values) for field, op, values in self.conditions]
+
+
+def _compile(field: str, op: str, values: tuple):
+    column = FILTER_FIELDS[field][0]
+    value = values[0]
+
+    if op in ('eq', 'in'):
+        return column == value if len(values) == 1 else column.in_(values)
+    if op in ('ne', 'nin'):
+        return column != value if len(values) == 1 else column.not_in(values)
+
+    if isinstance(value, date) and not isinstance(value, datetime):
+        # A bare date covers the whole day: "lte 2024-01-31" ends at midnight of the 1st
+        value = datetime.combine(value, datetime.min.time())
+        if op in ('gt', 'lte'):
+            value += timedelta(days=1)
+            op = {'gt': 'gte', 'lte': 'lt'}[op]
+
+    if op == 'gt':
+        return column > value
+    if op == 'gte':
+        return column >= value
+    if op == 'lt':
+        return column < value
+    return column <= value
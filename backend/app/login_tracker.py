@@ -0,0 +1,142 @@
+"""
+Write-behind buffer for login tracking
+"""
+import atexit
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .cache import user_cache
+from .models.base import db
+
+
+class LoginTracker:
+    """Buffers ``last_login``/``login_count`` updates and writes them in batches.
+
+    Each worker process keeps its own buffer and flushes it with one
+    executemany UPDATE every ``interval`` seconds, when ``max_users``
+    distinct users are waiting, and at interpreter exit. A worker that is
+    killed outright loses at most the logins recorded since its last flush,
+    i.e. ``interval`` seconds of counters; logins themselves are unaffected.
+    With ``interval`` 0 every login is written immediately.
+    """
+
+    def __init__(self, interval: float = 10, max_users: int = 1000):
+        self.interval = interval
+        self.max_users = max_users
+        self._app = None
+        self._pending: Dict[int, Tuple[datetime, int]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread_pid = None
+        atexit.register(self._flush_at_exit)
+
+    def init_app(self, app) -> None:
+        """Bind to an app for background flushes and read the limits from its config"""
+        self._app = app
+        self.interval = app.config.get('LOGIN_FLUSH_INTERVAL', self.interval)
+        self.max_users = app.config.get('LOGIN_BUFFER_MAX_USERS', self.max_users)
+
+    def record(self, user) -> None:
+        """Buffer a login for ``user`` and reflect it on the instance without dirtying it"""
+        now = datetime.utcnow()
+        set_committed_value(user, 'last_login', now)
+        set_committed_value(user, 'login_count', (user.login_count or 0) + 1)
+
+        if self.interval <= 0:
+            self._write({user.id: (now, 1)})
+            return
+
+        with self._lock:
+            _, logins = self._pending.get(user.id, (None, 0))
+            self._pending[user.id] = (now, logins + 1)
+            backlog = len(self._pending)
+
+        self._ensure_thread()
+        if backlog >= self.max_users:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write every buffered login now; returns the number of users updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return 0
+
+        try:
+            self._write(pending)
+        except Exception:
+            # Keep the counters for the next attempt
+            with self._lock:
+                for user_id, (last_login, logins) in pending.items():
+                    newer, more = self._pending.get(user_id, (last_login, 0))
+                    self._pending[user_id] = (max(last_login, newer), logins + more)
+            raise
+
+        return len(pending)
+
+    def pending(self) -> int:
+        """Number of users with unwritten logins"""
+        with self._lock:
+            return len(self._pending)
+
+    def _write(self, pending: Dict[int, Tuple[datetime, int]]) -> None:
+        """One executemany UPDATE for all buffered users"""
+        from .models import User
+
+        users = User.__table__
+        statement = update(users).where(users.c.id == bindparam('user_id')).values(
+            last_login=bindparam('last_login'),
+            login_count=func.coalesce(users.c.login_count, 0) + bindparam('logins')
+        )
+
+        try:
+            db.session.execute(statement, [
+                {'user_id': user_id, 'last_login': last_login, 'logins': logins}
+                for user_id, (last_login, logins) in pending.items()
+            ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for user_id in pending:
+            user_cache.invalidate(user_id)
+
+    def _ensure_thread(self) -> None:
+        """Start this process's flusher thread (again after a fork)"""
+        if self._thread_pid == os.getpid() or self._app is None:
+            return
+
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name='login-tracker', daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    self._app.logger.error(f'Login tracking flush failed: {str(e)}')
+
+    def _flush_at_exit(self) -> None:
+        if self._app is None or not self.pending():
+            return
+        with self._app.app_context():
+            try:
+                self.flush()
+            except Exception as e:
+                self._app.logger.error(f'Login tracking flush at exit failed: {str(e)}')
+
+
+login_tracker = LoginTracker()
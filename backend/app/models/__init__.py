@@ -2,9 +2,14 @@
 Database models for the Purchasing App
 """
 from .user import User, UserRole
-from .purchase import Purchase, PurchaseStatus, ApprovalStatus, UrgencyLevel
+from .purchase import Purchase, PurchaseStatus, ApprovalStatus, UrgencyLevel, TransitionConflict
+from .outbox import EmailOutbox, OutboxStatus
+from .digest import DigestItem
+from .stored_file import StoredFile
+from .approved_email import ApprovedEmail
 
 __all__ = [
     'User', 'UserRole', 
-    'Purchase', 'PurchaseStatus', 'ApprovalStatus', 'UrgencyLevel'
+    'Purchase', 'PurchaseStatus', 'ApprovalStatus', 'UrgencyLevel', 'TransitionConflict',
+    'EmailOutbox', 'OutboxStatus', 'DigestItem', 'StoredFile', 'ApprovedEmail'
 ]
@@ -0,0 +1,16 @@
+"""
+Registration allowlist model
+"""
+from .base import db, BaseModel
+from .user import UserRole
+
+
+class ApprovedEmail(BaseModel):
+    """Email address allowed to register, with the role it registers as"""
+    __tablename__ = 'approved_emails'
+
+    email = db.Column(db.String(255), unique=True, nullable=False)
+    role = db.Column(db.Enum(UserRole), nullable=False)
+
+    def __repr__(self):
+        return f'<ApprovedEmail {self.email} - {self.role.value}>'
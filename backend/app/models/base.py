@@ -15,16 +15,17 @@ class BaseModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
+    # Model methods only change the session; the caller's unit of work
+    # (see app/unit_of_work.py) commits.
+    
     def save(self):
-        """Save the model to database"""
+        """Add the model to the session"""
         db.session.add(self)
-        db.session.commit()
         return self
     
     def delete(self):
-        """Delete the model from database"""
+        """Mark the model for deletion"""
         db.session.delete(self)
-        db.session.commit()
     
     def to_dict(self):
         """Convert model to dictionary"""
@@ -0,0 +1,24 @@
+"""
+Notification digest model
+"""
+from sqlalchemy import Index
+
+from .base import db, BaseModel
+
+
+class DigestItem(BaseModel):
+    """Approval notification held back for an approver's next digest email"""
+    __tablename__ = 'notification_digest_items'
+
+    approver_email = db.Column(db.String(255), nullable=False)
+    approval_type = db.Column(db.String(20), nullable=False)  # 'sublead' or 'executive'
+    purchase_id = db.Column(db.Integer, db.ForeignKey('purchases.id'), nullable=False)
+
+    purchase = db.relationship('Purchase')
+
+    __table_args__ = (
+        Index('idx_digest_approver', 'approver_email', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<DigestItem {self.approver_email} - purchase {self.purchase_id}>'
@@ -0,0 +1,66 @@
+"""
+Email outbox model
+"""
+from enum import Enum
+from datetime import datetime, timedelta
+from sqlalchemy import Index
+
+from .base import db, BaseModel
+
+
+class OutboxStatus(Enum):
+    """Outbox message delivery status enumeration"""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+
+class EmailOutbox(BaseModel):
+    """Rendered email waiting for delivery by the outbox worker.
+
+    Rows are added to the same session as the state change that triggers
+    them, so a notification exists if and only if that change committed.
+    """
+    __tablename__ = 'email_outbox'
+
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # Comma-separated addresses
+    html_body = db.Column(db.Text, nullable=False)
+    text_body = db.Column(db.Text)
+
+    # Delivery tracking
+    status = db.Column(db.Enum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        Index('idx_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.subject} - {self.status.value}>'
+
+    @property
+    def recipient_list(self) -> list:
+        """Recipients as a list"""
+        return [address for address in self.recipients.split(',') if address]
+
+    def mark_sent(self) -> None:
+        """Record a successful delivery"""
+        self.status = OutboxStatus.SENT
+        self.attempts += 1
+        self.sent_at = datetime.utcnow()
+        self.last_error = None
+
+    def mark_attempt_failed(self, error: str, max_attempts: int, backoff: int, max_backoff: int) -> None:
+        """Record a failed delivery and schedule a retry with exponential backoff"""
+        self.attempts += 1
+        self.last_error = error
+
+        if self.attempts >= max_attempts:
+            self.status = OutboxStatus.FAILED
+        else:
+            delay = min(backoff * 2 ** (self.attempts - 1), max_backoff)
+            self.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
@@ -3,9 +3,17 @@ Purchase model and related enums
 """
 from enum import Enum
 from datetime import datetime
-from sqlalchemy import Index
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Index, and_, case, func, literal, or_, update
+from sqlalchemy.ext.hybrid import hybrid_property
 
 from .base import db, BaseModel
+from .stored_file import StoredFile
+from ..cache import mark_purchases_changed
+
+
+class TransitionConflict(ValueError):
+    """Raised when a purchase is no longer in the state a transition expects"""
 
 
 class ApprovalStatus(Enum):
@@ -61,6 +69,11 @@ class Purchase(BaseModel):
     # Pricing
     price = db.Column(db.Numeric(10, 2), nullable=False)
     shipping_cost = db.Column(db.Numeric(10, 2), default=0.0)
+    # Maintained by the database so lists can be filtered and sorted by cost
+    total_cost = db.Column(
+        db.Numeric(12, 2),
+        db.Computed('price * quantity + COALESCE(shipping_cost, 0)', persisted=True)
+    )
     
     # Organization
     subteam = db.Column(db.String(100), nullable=False)
@@ -99,7 +112,8 @@ class Purchase(BaseModel):
     exec_email = db.Column(db.String(120))
     exec_approval_status = db.Column(db.String(50), default='Pending')
     
-    # File uploads
+    # File uploads (path within the arrival photo upload subfolder)
+    ARRIVAL_PHOTO_FOLDER = 'arrival_photos'
     arrival_photo = db.Column(db.String(200))
     
     # Soft delete and resolution
@@ -111,22 +125,25 @@ class Purchase(BaseModel):
     
     # Indexes for performance
     __table_args__ = (
-        Index('idx_purchase_status', 'status'),
-        Index('idx_approval_status', 'approval_status'),
-        Index('idx_user_id', 'user_id'),
-        Index('idx_subteam', 'subteam'),
-        Index('idx_created_at', 'created_at'),
-        Index('idx_is_deleted', 'is_deleted'),
+        # Equality filters followed by the default sort, so a filtered page
+        # is read in order from one index range instead of a scan
+        Index('idx_status_created_at', 'status', 'created_at', 'id'),
+        Index('idx_approval_status_created_at', 'approval_status', 'created_at', 'id'),
+        Index('idx_user_id_created_at', 'user_id', 'created_at', 'id'),
+        Index('idx_subteam_created_at', 'subteam', 'created_at', 'id'),
+        Index('idx_requester_email_created_at', 'requester_email', 'created_at', 'id'),
+        Index('idx_created_at_id', 'created_at', 'id'),
+        Index('idx_shipped_at', 'shipped_at'),
+        Index('idx_arrived_at', 'arrived_at'),
+        Index('idx_total_cost_id', 'total_cost', 'id'),
     )
     
+    # Orders above this total need executive approval
+    EXECUTIVE_APPROVAL_THRESHOLD = 3000
+    
     def __repr__(self):
         return f'<Purchase {self.item_name} - {self.status.value}>'
     
-    @property
-    def total_cost(self) -> float:
-        """Calculate total cost including shipping"""
-        return float(self.price) + float(self.shipping_cost or 0)
-    
     @property
     def is_urgent(self) -> bool:
         """Check if purchase is urgent"""
@@ -137,10 +154,21 @@ class Purchase(BaseModel):
         """Check if purchase is special/large"""
         return self.urgency in [UrgencyLevel.SPECIAL_LARGE, UrgencyLevel.BOTH]
     
-    @property
+    @hybrid_property
     def needs_executive_approval(self) -> bool:
         """Check if purchase needs executive approval"""
-        return self.is_urgent or self.is_special_large or self.total_cost > 3000
+        total_cost = self.total_cost
+        if total_cost is None:
+            # The computed column is only filled in once the row is flushed
+            total_cost = self.price * self.quantity + (self.shipping_cost or 0)
+        return self.is_urgent or self.is_special_large or total_cost > self.EXECUTIVE_APPROVAL_THRESHOLD
+    
+    @needs_executive_approval.expression
+    def needs_executive_approval(cls):
+        return or_(
+            cls.urgency.in_([UrgencyLevel.URGENT, UrgencyLevel.SPECIAL_LARGE, UrgencyLevel.BOTH]),
+            cls.total_cost > cls.EXECUTIVE_APPROVAL_THRESHOLD
+        )
     
     @property
     def can_be_purchased(self) -> bool:
@@ -155,73 +183,161 @@ class Purchase(BaseModel):
             ApprovalStatus.PENDING_EXECUTIVE
         ]
     
-    def approve_by_sublead(self, sublead_email: str) -> None:
-        """Approve purchase by sublead"""
-        self.sublead_email = sublead_email
+    # State transitions run as one conditional UPDATE ... RETURNING that
+    # re-checks the expected state in SQL, so two concurrent approvers
+    # cannot both succeed. They do not commit; the caller commits, so the
+    # change and any notifications it queues land in one transaction.
+    
+    @classmethod
+    def compare_and_set(cls, purchase_ids: List[int], expected, values: Dict[str, Any]) -> List['Purchase']:
+        """Update the purchases still matching ``expected``; returns the rows that changed"""
+        if not purchase_ids:
+            return []
         
-        if self.needs_executive_approval:
-            self.approval_status = ApprovalStatus.PENDING_EXECUTIVE
-        else:
-            self.approval_status = ApprovalStatus.FULLY_APPROVED
+        purchases = db.session.scalars(
+            update(cls)
+            .where(cls.id.in_(purchase_ids), expected)
+            .values(**values)
+            .returning(cls),
+            execution_options={'synchronize_session': False, 'populate_existing': True}
+        ).all()
         
-        db.session.commit()
+        if purchases:
+            mark_purchases_changed(db.session)
+        return purchases
+    
+    @classmethod
+    def sublead_approval(cls, sublead_email: str) -> Tuple[Any, Dict[str, Any]]:
+        """Expected state and new values for a sublead approval"""
+        status_type = cls.approval_status.type
+        return cls.approval_status == ApprovalStatus.PENDING_SUBLEAD, {
+            'sublead_email': sublead_email,
+            'approval_status': case(
+                (cls.needs_executive_approval, literal(ApprovalStatus.PENDING_EXECUTIVE, status_type)),
+                else_=literal(ApprovalStatus.FULLY_APPROVED, status_type)
+            ),
+        }
+    
+    @classmethod
+    def executive_approval(cls, exec_email: str) -> Tuple[Any, Dict[str, Any]]:
+        """Expected state and new values for an executive approval"""
+        return cls.approval_status == ApprovalStatus.PENDING_EXECUTIVE, {
+            'exec_email': exec_email,
+            'exec_approval_status': 'Approved',
+            'approval_status': ApprovalStatus.FULLY_APPROVED,
+        }
+    
+    @classmethod
+    def rejection(cls, reason: str = None) -> Tuple[Any, Dict[str, Any]]:
+        """Expected state and new values for a rejection"""
+        values = {'approval_status': ApprovalStatus.REJECTED}
+        if reason:
+            values['notes'] = case(
+                (func.coalesce(cls.notes, '') == '', f'Rejection reason: {reason}'),
+                else_=cls.notes + f'\n\nRejection reason: {reason}'
+            )
+        return cls.approval_status != ApprovalStatus.REJECTED, values
+    
+    @classmethod
+    def fulfillment(cls, status: 'PurchaseStatus', photo_filename: str = None) -> Tuple[Any, Dict[str, Any]]:
+        """Expected state and new values for a fulfillment status change"""
+        values = {'status': status}
+        if status == PurchaseStatus.SHIPPED:
+            values['shipped_at'] = datetime.utcnow()
+        elif status == PurchaseStatus.ARRIVED:
+            values['arrived_at'] = datetime.utcnow()
+            if photo_filename:
+                values['arrival_photo'] = photo_filename
+        return cls.fulfillment_guard(status), values
+    
+    def _transition(self, expected, values: Dict[str, Any]) -> None:
+        """Apply a transition to this purchase or raise TransitionConflict"""
+        if not self.compare_and_set([self.id], expected, values):
+            raise TransitionConflict('Purchase was changed by another request; reload and try again')
+    
+    def approve_by_sublead(self, sublead_email: str) -> None:
+        """Approve purchase by sublead"""
+        self._transition(*self.sublead_approval(sublead_email))
     
     def approve_by_executive(self, exec_email: str) -> None:
         """Approve purchase by executive"""
-        self.exec_email = exec_email
-        self.exec_approval_status = 'Approved'
-        self.approval_status = ApprovalStatus.FULLY_APPROVED
-        db.session.commit()
+        self._transition(*self.executive_approval(exec_email))
     
     def reject(self, reason: str = None) -> None:
         """Reject purchase"""
-        self.approval_status = ApprovalStatus.REJECTED
-        if reason:
-            self.notes = f"{self.notes or ''}\n\nRejection reason: {reason}".strip()
-        db.session.commit()
+        self._transition(*self.rejection(reason))
+    
+    # Fulfillment status each transition starts from
+    PREVIOUS_STATUS = {
+        PurchaseStatus.PURCHASED: PurchaseStatus.NOT_PURCHASED,
+        PurchaseStatus.SHIPPED: PurchaseStatus.PURCHASED,
+        PurchaseStatus.ARRIVED: PurchaseStatus.SHIPPED,
+    }
+    
+    def fulfillment_error(self, status: 'PurchaseStatus') -> Optional[str]:
+        """Why the purchase cannot move to a fulfillment status, or None if it can"""
+        if status == PurchaseStatus.PURCHASED and not self.can_be_purchased:
+            return "Purchase must be fully approved before marking as purchased"
+        if status == PurchaseStatus.PURCHASED and self.status != PurchaseStatus.NOT_PURCHASED:
+            return "Purchase has already been purchased"
+        if status == PurchaseStatus.SHIPPED and self.status != PurchaseStatus.PURCHASED:
+            return "Purchase must be purchased before marking as shipped"
+        if status == PurchaseStatus.ARRIVED and self.status != PurchaseStatus.SHIPPED:
+            return "Purchase must be shipped before marking as arrived"
+        return None
+    
+    @classmethod
+    def fulfillment_guard(cls, status: 'PurchaseStatus'):
+        """SQL condition matching the rows fulfillment_error allows to move to ``status``"""
+        guard = cls.status == cls.PREVIOUS_STATUS[status]
+        if status == PurchaseStatus.PURCHASED:
+            guard = and_(guard, cls.approval_status == ApprovalStatus.FULLY_APPROVED)
+        return guard
     
     def mark_as_purchased(self) -> None:
         """Mark purchase as purchased"""
-        if not self.can_be_purchased:
-            raise ValueError("Purchase must be fully approved before marking as purchased")
+        error = self.fulfillment_error(PurchaseStatus.PURCHASED)
+        if error:
+            raise ValueError(error)
         
-        self.status = PurchaseStatus.PURCHASED
-        db.session.commit()
+        self._transition(*self.fulfillment(PurchaseStatus.PURCHASED))
     
     def mark_as_shipped(self) -> None:
         """Mark purchase as shipped"""
-        if self.status != PurchaseStatus.PURCHASED:
-            raise ValueError("Purchase must be purchased before marking as shipped")
+        error = self.fulfillment_error(PurchaseStatus.SHIPPED)
+        if error:
+            raise ValueError(error)
         
-        self.status = PurchaseStatus.SHIPPED
-        self.shipped_at = datetime.utcnow()
-        db.session.commit()
+        self._transition(*self.fulfillment(PurchaseStatus.SHIPPED))
     
     def mark_as_arrived(self, photo_filename: str = None) -> None:
         """Mark purchase as arrived"""
-        if self.status != PurchaseStatus.SHIPPED:
-            raise ValueError("Purchase must be shipped before marking as arrived")
+        error = self.fulfillment_error(PurchaseStatus.ARRIVED)
+        if error:
+            raise ValueError(error)
+        
+        old_photo = self.arrival_photo
+        self._transition(*self.fulfillment(PurchaseStatus.ARRIVED, photo_filename))
         
-        self.status = PurchaseStatus.ARRIVED
-        self.arrived_at = datetime.utcnow()
-        if photo_filename:
-            self.arrival_photo = photo_filename
-        db.session.commit()
+        if photo_filename and photo_filename != old_photo:
+            if old_photo:
+                StoredFile.release(self.ARRIVAL_PHOTO_FOLDER, old_photo)
+            StoredFile.acquire(self.ARRIVAL_PHOTO_FOLDER, photo_filename)
     
     def soft_delete(self) -> None:
         """Soft delete the purchase"""
         self.is_deleted = True
-        db.session.commit()
+        mark_purchases_changed(db.session)
     
     def restore(self) -> None:
         """Restore soft deleted purchase"""
         self.is_deleted = False
-        db.session.commit()
+        mark_purchases_changed(db.session)
     
     def resolve(self) -> None:
         """Mark purchase as resolved"""
         self.is_resolved = True
-        db.session.commit()
+        mark_purchases_changed(db.session)
     
     def to_dict(self):
         """Convert to dictionary for API responses"""
@@ -230,7 +346,7 @@ class Purchase(BaseModel):
             'approval_status': self.approval_status.value if self.approval_status else None,
             'status': self.status.value if self.status else None,
             'urgency': self.urgency.value if self.urgency else None,
-            'total_cost': self.total_cost,
+            'total_cost': float(self.total_cost) if self.total_cost is not None else None,
             'is_urgent': self.is_urgent,
             'is_special_large': self.is_special_large,
             'needs_executive_approval': self.needs_executive_approval,
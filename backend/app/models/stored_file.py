@@ -0,0 +1,55 @@
+"""
+Content-addressed upload storage model
+"""
+from datetime import datetime
+from sqlalchemy import Index, UniqueConstraint, case, update
+
+from .base import db, BaseModel
+
+
+class StoredFile(BaseModel):
+    """One stored upload, shared by every record that references the same content.
+
+    ``path`` is relative to the upload subfolder and derived from the
+    SHA-256 of the uploaded bytes (``ab/cd/<sha256><ext>``). In subfolders
+    with a reference owner (``FileService.COLLECTABLE_SUBFOLDERS``), files
+    whose ``ref_count`` drops to zero are removed by the orphan cleanup once
+    they have been unreferenced for the grace period.
+    """
+    __tablename__ = 'stored_files'
+
+    subfolder = db.Column(db.String(50), nullable=False, default='')
+    path = db.Column(db.String(200), nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    released_at = db.Column(db.DateTime, default=datetime.utcnow)  # Last time ref_count reached zero
+
+    __table_args__ = (
+        UniqueConstraint('subfolder', 'path', name='uq_stored_file_path'),
+        Index('idx_stored_file_orphans', 'ref_count', 'released_at'),
+    )
+
+    def __repr__(self):
+        return f'<StoredFile {self.subfolder}/{self.path} refs={self.ref_count}>'
+
+    @classmethod
+    def acquire(cls, subfolder: str, path: str, count: int = 1) -> None:
+        """Add ``count`` references to a stored file; the caller commits"""
+        db.session.execute(
+            update(cls)
+            .where(cls.subfolder == subfolder, cls.path == path)
+            .values(ref_count=cls.ref_count + count, released_at=None)
+        )
+
+    @classmethod
+    def release(cls, subfolder: str, path: str) -> None:
+        """Drop a reference to a stored file; the caller commits"""
+        db.session.execute(
+            update(cls)
+            .where(cls.subfolder == subfolder, cls.path == path, cls.ref_count > 0)
+            .values(
+                ref_count=cls.ref_count - 1,
+                released_at=case((cls.ref_count <= 1, datetime.utcnow()), else_=cls.released_at)
+            )
+        )
@@ -3,11 +3,17 @@ User model and related enums
 """
 from enum import Enum
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached, object_session
 import secrets
 
 from .base import db, BaseModel
+from ..cache import user_cache, mark_user_changed
+from ..login_tracker import login_tracker
+from ..passwords import hash_password, verify_password, needs_rehash
+from ..policy import Permission, has_permission
 
 
 class UserRole(Enum):
@@ -41,6 +47,9 @@ class User(UserMixin, BaseModel):
     reset_token = db.Column(db.String(255), unique=True)  # Increased from 100
     reset_token_expiry = db.Column(db.DateTime)
     
+    # Notification preferences
+    approval_digest = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+    
     # Last login tracking
     last_login = db.Column(db.DateTime)
     login_count = db.Column(db.Integer, default=0)
@@ -51,21 +60,44 @@ class User(UserMixin, BaseModel):
     def __repr__(self):
         return f'<User {self.email}>'
     
+    @classmethod
+    def get_cached(cls, user_id: int) -> Optional['User']:
+        """Load a user through the per-process identity cache
+        
+        A hit rebuilds the user from its column snapshot and attaches it to
+        the session without a query, so it can still be modified and saved.
+        """
+        snapshot = user_cache.get(user_id)
+        if snapshot is None:
+            user = db.session.get(cls, user_id)
+            if user is not None:
+                user_cache.set(user_id, {
+                    attr.key: getattr(user, attr.key) for attr in cls.__mapper__.column_attrs
+                })
+            return user
+        
+        user = cls(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
     def set_password(self, password: str) -> None:
         """Set password hash"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password: str) -> bool:
         """Check password against hash"""
         if not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self) -> bool:
+        """Check if the stored hash predates the configured hash method"""
+        return bool(self.password_hash) and needs_rehash(self.password_hash)
     
     def generate_reset_token(self) -> str:
         """Generate password reset token"""
         self.reset_token = secrets.token_urlsafe(32)
         self.reset_token_expiry = datetime.utcnow() + timedelta(hours=1)
-        db.session.commit()
         return self.reset_token
     
     def verify_reset_token(self, token: str) -> bool:
@@ -85,13 +117,10 @@ class User(UserMixin, BaseModel):
         """Clear password reset token"""
         self.reset_token = None
         self.reset_token_expiry = None
-        db.session.commit()
     
     def record_login(self) -> None:
-        """Record user login"""
-        self.last_login = datetime.utcnow()
-        self.login_count += 1
-        db.session.commit()
+        """Record user login; the counters are written in batches by the login tracker"""
+        login_tracker.record(self)
     
     # Role checking methods
     def is_requester(self) -> bool:
@@ -112,11 +141,11 @@ class User(UserMixin, BaseModel):
     
     def can_approve_orders(self) -> bool:
         """Check if user can approve orders"""
-        return self.role in [UserRole.SUBLEAD, UserRole.EXECUTIVE]
+        return has_permission(self, Permission.APPROVE_ORDERS)
     
     def can_manage_orders(self) -> bool:
         """Check if user can manage order fulfillment"""
-        return self.role == UserRole.BUSINESS
+        return has_permission(self, Permission.MANAGE_ORDERS)
     
     def to_dict(self):
         """Convert to dictionary for API responses"""
@@ -136,8 +165,7 @@ class User(UserMixin, BaseModel):
     
     @staticmethod
     def get_approved_emails():
-        """Get list of approved email addresses"""
-        # This could be moved to a separate configuration or database table
+        """Default allowlist, seeded into the approved_emails table by migrate.py"""
         return {
             'requester': [
                 'requester@mit.edu',
@@ -151,4 +179,13 @@ class User(UserMixin, BaseModel):
             'business': [
                 'business@mit.edu',
             ]
-        }
\ No newline at end of file
+        }
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    """Drop the cached snapshot once the change commits (role, active flag, profile, password)"""
+    session = object_session(target)
+    if session is not None:
+        mark_user_changed(session, target.id)
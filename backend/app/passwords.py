@@ -0,0 +1,86 @@
+"""
+Password hashing with configurable cost and bounded concurrency
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when a password check waited too long for a free hashing slot"""
+
+
+# hashlib's scrypt and pbkdf2 release the GIL, so a small thread pool both
+# runs hashes in parallel and caps how many run at once in this process.
+# The cap only bites under threaded workers (gunicorn gthread, the dev
+# server): a sync worker handles one request at a time, so it never has
+# more than one hash waiting on the pool.
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    """Return this process's hashing pool; threads do not survive a fork"""
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def hash_method() -> str:
+    """Hash method for new passwords, from PASSWORD_HASH_METHOD"""
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def _run_bounded(function, *args):
+    """Run a hashing call on this process's pool, waiting at most PASSWORD_HASH_WAIT_TIMEOUT"""
+    config = current_app.config
+    future = _get_executor(config.get('PASSWORD_HASH_WORKERS', 2)).submit(function, *args)
+
+    try:
+        return future.result(timeout=config.get('PASSWORD_HASH_WAIT_TIMEOUT', 5))
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordHasherBusy('Password hashing is busy, try again shortly')
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with the configured method and cost, on the bounded pool"""
+    return _run_bounded(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check a password on the bounded hashing pool
+
+    Raises PasswordHasherBusy when no slot frees up within
+    PASSWORD_HASH_WAIT_TIMEOUT seconds, so a login burst queues briefly
+    and then fails fast instead of tying up every request thread.
+    """
+    return _run_bounded(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=32)
+def _expand_method(method: str) -> str:
+    """Method with werkzeug's default parameters filled in, as it writes them into hashes"""
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2' and len(args) < 2:
+        hash_name = args[0] if args else 'sha256'
+        return f'pbkdf2:{hash_name}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """Whether a stored hash was made with a method or cost other than the configured one"""
+    return _expand_method(password_hash.split('$', 1)[0]) != _expand_method(hash_method())
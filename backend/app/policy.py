@@ -0,0 +1,137 @@
+"""
+Role-based access policy, compiled once per process
+
+Each role maps to a permission bitmask, so checks are integer ANDs, and to
+a SQL clause that scopes purchase queries to the rows the role may see.
+"""
+from enum import IntFlag
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, or_
+
+
+class Permission(IntFlag):
+    """Permission bits; names match the strings exposed by the API"""
+    VIEW_OWN_ORDERS = 1 << 0
+    CREATE_ORDERS = 1 << 1
+    APPROVE_ORDERS = 1 << 2
+    VIEW_TEAM_ORDERS = 1 << 3
+    VIEW_ALL_ORDERS = 1 << 4
+    EXECUTIVE_APPROVAL = 1 << 5
+    MANAGE_ORDERS = 1 << 6
+    PURCHASE_ORDERS = 1 << 7
+
+
+_BASE = Permission.VIEW_OWN_ORDERS | Permission.CREATE_ORDERS
+
+# Keyed by UserRole value
+ROLE_PERMISSIONS = {
+    'requester': _BASE,
+    'sublead': _BASE | Permission.APPROVE_ORDERS | Permission.VIEW_TEAM_ORDERS,
+    'executive': _BASE | Permission.APPROVE_ORDERS | Permission.VIEW_ALL_ORDERS | Permission.EXECUTIVE_APPROVAL,
+    'business': _BASE | Permission.MANAGE_ORDERS | Permission.VIEW_ALL_ORDERS | Permission.PURCHASE_ORDERS,
+}
+
+# Bind parameters carrying the current user's id and email into a scope clause
+SCOPE_USER_ID = 'scope_user_id'
+SCOPE_USER_EMAIL = 'scope_user_email'
+
+_NO_PERMISSIONS = Permission(0)
+
+
+def _names(mask: Permission) -> Tuple[str, ...]:
+    return tuple(permission.name.lower() for permission in Permission if permission in mask)
+
+
+_ROLE_PERMISSION_NAMES = {role: _names(mask) for role, mask in ROLE_PERMISSIONS.items()}
+
+
+def permissions_for(user) -> Permission:
+    """Permission bitmask of a user's role"""
+    if user is None or user.role is None:
+        return _NO_PERMISSIONS
+    return ROLE_PERMISSIONS.get(user.role.value, _NO_PERMISSIONS)
+
+
+def has_permission(user, required: Permission) -> bool:
+    """Whether the user's role grants every bit in ``required``"""
+    return permissions_for(user) & required == required
+
+
+def permission_names(user) -> list:
+    """Permission names for the user's role, as listed by the API"""
+    if user is None or user.role is None:
+        return []
+    return list(_ROLE_PERMISSION_NAMES.get(user.role.value, ()))
+
+
+@lru_cache(maxsize=256)
+def _parse_names(names: Tuple[str, ...]) -> Optional[Permission]:
+    mask = _NO_PERMISSIONS
+    for name in names:
+        permission = Permission.__members__.get(name.upper())
+        if permission is None:
+            return None
+        mask |= permission
+    return mask
+
+
+def parse_permissions(names: Iterable[str]) -> Optional[Permission]:
+    """Bitmask for a list of permission names, or None if any name is unknown"""
+    return _parse_names(tuple(sorted(set(names))))
+
+
+def _build_scope(role: str, user=None):
+    """Scope clause for a role; None means every row.
+
+    Without a user the clause holds unfilled bind parameters, to be given
+    values with ``Query.params``; with one, the user's values are bound in.
+    """
+    from .models import Purchase, ApprovalStatus
+
+    mask = ROLE_PERMISSIONS.get(role, _NO_PERMISSIONS)
+    user_id = bindparam(SCOPE_USER_ID, **({'value': user.id} if user is not None else {}))
+    own = Purchase.user_id == user_id
+
+    if mask & Permission.VIEW_ALL_ORDERS:
+        return None
+    if mask & Permission.VIEW_TEAM_ORDERS:
+        # Subleads see their own orders, everything awaiting sublead approval
+        # and the orders they have already acted on
+        acted = bindparam(SCOPE_USER_EMAIL, **({'value': user.email} if user is not None else {}))
+        return or_(
+            own,
+            Purchase.approval_status == ApprovalStatus.PENDING_SUBLEAD,
+            Purchase.sublead_email == acted,
+            Purchase.exec_email == acted
+        )
+    return own
+
+
+@lru_cache(maxsize=None)
+def _role_scope(role: str):
+    """Scope clause for a role with unfilled parameters, built on first use"""
+    return _build_scope(role)
+
+
+def scope_purchases(query, user):
+    """Restrict a purchase query to the rows the user may see"""
+    clause = _role_scope(user.role.value)
+    if clause is None:
+        return query
+    return query.filter(clause).params(**{SCOPE_USER_ID: user.id, SCOPE_USER_EMAIL: user.email})
+
+
+def scope_condition(condition, user):
+    """AND a condition with the user's scope, so UPDATEs reach only rows the user may see"""
+    if _role_scope(user.role.value) is None:
+        return condition
+    return and_(condition, _build_scope(user.role.value, user))
+
+
+def scope_key(user) -> tuple:
+    """Cache key part identifying which rows a user sees"""
+    if _role_scope(user.role.value) is None:
+        return ('all',)
+    return (user.role.value, user.id)
@@ -0,0 +1,120 @@
+"""
+Fast serialization for purchase list responses
+"""
+import json
+from typing import Any, Dict, Iterable, List
+from flask import current_app
+from werkzeug.http import http_date
+
+from .models import Purchase, ApprovalStatus, UrgencyLevel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+# Table columns, in the same order BaseModel.to_dict emits them
+COLUMN_FIELDS = tuple(column.name for column in Purchase.__table__.columns)
+
+# Derived fields and the columns they are computed from
+DERIVED_FIELDS = {
+    'is_urgent': ('urgency',),
+    'is_special_large': ('urgency',),
+    'needs_executive_approval': ('urgency', 'total_cost'),
+    'can_be_purchased': ('approval_status',),
+    'is_pending_approval': ('approval_status',),
+}
+
+ALL_FIELDS = COLUMN_FIELDS + tuple(DERIVED_FIELDS)
+
+_ENUM_FIELDS = {'approval_status', 'status', 'urgency'}
+_ISO_DATE_FIELDS = {'purchase_date', 'shipped_at', 'arrived_at'}
+_HTTP_DATE_FIELDS = {'created_at', 'updated_at'}
+_MONEY_FIELDS = {'price', 'shipping_cost', 'total_cost'}
+
+_URGENT = {UrgencyLevel.URGENT, UrgencyLevel.BOTH}
+_SPECIAL_LARGE = {UrgencyLevel.SPECIAL_LARGE, UrgencyLevel.BOTH}
+_PENDING = {ApprovalStatus.PENDING_SUBLEAD, ApprovalStatus.PENDING_EXECUTIVE}
+
+
+class PurchaseListSerializer:
+    """Serialize purchase lists from projected Core rows.
+
+    Produces the same output as ``Purchase.to_dict`` but reads only the
+    columns the requested fields need, so list queries can skip ORM
+    hydration and identity-map tracking entirely.
+    """
+
+    def __init__(self, fields: Iterable[str] = None):
+        if fields:
+            fields = [field.strip() for field in fields if field.strip()]
+            unknown = [field for field in fields if field not in ALL_FIELDS]
+            if unknown:
+                raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+            if 'id' not in fields:
+                fields.insert(0, 'id')
+            self.fields = tuple(fields)
+        else:
+            self.fields = ALL_FIELDS
+
+        needed = {'id', 'created_at'}  # always needed for keyset cursors
+        for field in self.fields:
+            needed.update(DERIVED_FIELDS.get(field, (field,)))
+        self.columns = [getattr(Purchase, name) for name in COLUMN_FIELDS if name in needed]
+
+    @classmethod
+    def from_request_arg(cls, value: str = None) -> 'PurchaseListSerializer':
+        """Build a serializer from a comma-separated ``fields=`` argument"""
+        return cls(value.split(',') if value else None)
+
+    def serialize(self, rows: List[Any]) -> List[Dict[str, Any]]:
+        """Serialize projected rows in a single pass"""
+        fields = self.fields
+        return [self._serialize_row(row._mapping, fields) for row in rows]
+
+    @staticmethod
+    def _serialize_row(row, fields) -> Dict[str, Any]:
+        data = {}
+
+        for field in fields:
+            if field in DERIVED_FIELDS:
+                if field == 'needs_executive_approval':
+                    urgency = row['urgency']
+                    value = (urgency in _URGENT or urgency in _SPECIAL_LARGE
+                             or row['total_cost'] > Purchase.EXECUTIVE_APPROVAL_THRESHOLD)
+                elif field == 'is_urgent':
+                    value = row['urgency'] in _URGENT
+                elif field == 'is_special_large':
+                    value = row['urgency'] in _SPECIAL_LARGE
+                elif field == 'can_be_purchased':
+                    value = row['approval_status'] == ApprovalStatus.FULLY_APPROVED
+                else:
+                    value = row['approval_status'] in _PENDING
+            else:
+                value = row[field]
+                if field in _MONEY_FIELDS:
+                    value = float(value) if value else 0
+                elif value is not None:
+                    if field in _ENUM_FIELDS:
+                        value = value.value
+                    elif field in _ISO_DATE_FIELDS:
+                        value = value.isoformat()
+                    elif field in _HTTP_DATE_FIELDS:
+                        value = http_date(value)
+
+            data[field] = value
+
+        return data
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode a JSON payload, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def json_response(payload: Any, status: int = 200):
+    """Build a JSON response with the fast encoder"""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
@@ -5,5 +5,14 @@ from .auth_service import AuthService
 from .purchase_service import PurchaseService
 from .email_service import EmailService
 from .file_service import FileService
+from .search_service import SearchService
+from .outbox_service import OutboxService
+from .digest_service import DigestService
+from .upload_gc_service import UploadGCService
+from .token_service import TokenService
+from .allowlist_service import AllowlistService
+from .purchase_import_service import PurchaseImportService
 
-__all__ = ['AuthService', 'PurchaseService', 'EmailService', 'FileService']
+__all__ = ['AuthService', 'PurchaseService', 'EmailService', 'FileService', 'SearchService',
+           'OutboxService', 'DigestService', 'UploadGCService', 'TokenService',
+           'AllowlistService', 'PurchaseImportService']
@@ -0,0 +1,161 @@
+"""
+Registration allowlist service
+"""
+import csv
+import io
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, IO
+
+from flask import current_app
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..models import ApprovedEmail, UserRole
+from ..models.base import db
+
+
+class ApprovedEmailIndex:
+    """Per-process hash index of the allowlist: email -> role.
+
+    Lookups are dictionary reads. Every ``refresh_interval`` seconds one
+    cheap aggregate query checks whether the table changed and reloads it
+    if so; imports in this process invalidate it immediately. An email that
+    is not in the index is looked up directly, so entries added by another
+    worker are usable before the next refresh.
+    """
+
+    def __init__(self, refresh_interval: float = 60):
+        self.refresh_interval = refresh_interval
+        self._roles: Optional[Dict[str, UserRole]] = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def role_for(self, email: str) -> Optional[UserRole]:
+        """Role an email may register as, or None if it is not allowed"""
+        email = email.lower().strip()
+        roles = self._current()
+        role = roles.get(email)
+
+        if role is None:
+            role = db.session.query(ApprovedEmail.role).filter_by(email=email).scalar()
+            if role is not None:
+                roles[email] = role
+        return role
+
+    def by_role(self) -> Dict[str, list]:
+        """Allowed emails grouped by role value"""
+        grouped = {role.value: [] for role in UserRole}
+        for email, role in self._current().items():
+            grouped[role.value].append(email)
+        return grouped
+
+    def invalidate(self) -> None:
+        """Force a reload on the next lookup"""
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+    def _current(self) -> Dict[str, UserRole]:
+        if self._roles is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return self._roles
+
+        with self._lock:
+            if self._roles is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return self._roles
+
+            version = tuple(db.session.query(
+                func.count(ApprovedEmail.id), func.max(ApprovedEmail.id), func.max(ApprovedEmail.updated_at)
+            ).one())
+            if self._roles is None or version != self._version:
+                rows = db.session.query(ApprovedEmail.email, ApprovedEmail.role).execution_options(yield_per=5000)
+                self._roles = {email: role for email, role in rows}
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._roles
+
+
+approved_email_index = ApprovedEmailIndex()
+
+
+class AllowlistService:
+    """Service for managing the registration allowlist"""
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def role_for(email: str) -> Optional[UserRole]:
+        """Role an email may register as, or None if it is not allowed"""
+        return approved_email_index.role_for(email)
+
+    def import_csv(self, stream: IO, replace: bool = False) -> Dict[str, Any]:
+        """Upsert ``email,role`` rows from a CSV file in batches
+
+        With ``replace`` the allowlist becomes exactly the imported rows.
+        Invalid rows are reported by line number and skipped.
+        """
+        result = {'success': False, 'message': '', 'imported': 0, 'removed': 0, 'errors': []}
+
+        if isinstance(stream.read(0), bytes):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames or not {'email', 'role'} <= {name.strip().lower() for name in reader.fieldnames}:
+            result['message'] = 'CSV must have email and role columns'
+            return result
+
+        rows = {}
+        for line, record in enumerate(reader, start=2):
+            record = {(key or '').strip().lower(): (value or '').strip() for key, value in record.items()}
+            email = record.get('email', '').lower()
+            if '@' not in email:
+                result['errors'].append({'line': line, 'message': f'Invalid email: {email!r}'})
+                continue
+            try:
+                role = UserRole(record.get('role', '').lower())
+            except ValueError:
+                result['errors'].append({'line': line, 'message': f'Unknown role: {record.get("role")!r}'})
+                continue
+            rows[email] = role
+
+        try:
+            now = datetime.utcnow()
+            values = [
+                {'email': email, 'role': role, 'created_at': now, 'updated_at': now}
+                for email, role in rows.items()
+            ]
+            for offset in range(0, len(values), self.BATCH_SIZE):
+                db.session.execute(self._upsert(values[offset:offset + self.BATCH_SIZE]))
+
+            if replace:
+                result['removed'] = db.session.execute(
+                    delete(ApprovedEmail).where(ApprovedEmail.updated_at < now)
+                ).rowcount
+
+            db.session.commit()
+            approved_email_index.invalidate()
+
+            result['success'] = True
+            result['imported'] = len(values)
+            result['message'] = f'Imported {len(values)} allowlist entries'
+            current_app.logger.info(f'Allowlist import: {len(values)} upserted, {result["removed"]} removed, '
+                                    f'{len(result["errors"])} rejected')
+
+        except Exception as e:
+            db.session.rollback()
+            result['message'] = f'Failed to import allowlist: {str(e)}'
+            current_app.logger.error(f'Allowlist import failed: {str(e)}')
+
+        return result
+
+    @staticmethod
+    def _upsert(values: list):
+        """INSERT ... ON CONFLICT (email) DO UPDATE for the active database"""
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        statement = dialect.insert(ApprovedEmail).values(values)
+        return statement.on_conflict_do_update(
+            index_elements=[ApprovedEmail.email],
+            set_={'role': statement.excluded.role, 'updated_at': statement.excluded.updated_at}
+        )
@@ -5,9 +5,13 @@ from typing import Optional, Dict, Any
 from flask import current_app
 from flask_login import login_user, logout_user
 
-from ..models import User, UserRole
+from ..models import User
 from ..models.base import db
+from ..passwords import PasswordHasherBusy
+from ..policy import has_permission, parse_permissions, permission_names
+from ..unit_of_work import unit_of_work
 from .email_service import EmailService
+from .allowlist_service import AllowlistService
 
 
 class AuthService:
@@ -22,6 +26,16 @@ class AuthService:
         user = User.query.filter_by(email=email.lower().strip()).first()
         
         if user and user.check_password(password) and user.is_active:
+            # Upgrade hashes made with an outdated method or cost
+            if user.password_needs_rehash():
+                try:
+                    with unit_of_work():
+                        user.set_password(password)
+                    current_app.logger.info(f'Password hash upgraded for {user.email}')
+                except PasswordHasherBusy:
+                    # The password is verified; upgrade it on a quieter login
+                    current_app.logger.warning(f'Password hash upgrade deferred for {user.email}')
+            
             user.record_login()
             return user
         
@@ -66,29 +80,23 @@ class AuthService:
             return result
         
         # Validate email against approved list
-        approved_emails = User.get_approved_emails()
-        user_role = None
-        
-        for role_name, emails in approved_emails.items():
-            if email in emails:
-                user_role = UserRole(role_name)
-                break
+        user_role = AllowlistService.role_for(email)
         
         if not user_role:
             result['message'] = 'Email not in approved list'
             return result
         
         try:
-            # Create new user
-            user = User(
-                email=email,
-                full_name=full_name.strip(),
-                role=user_role
-            )
-            user.set_password(password)
-            
-            db.session.add(user)
-            db.session.commit()
+            with unit_of_work():
+                # Create new user
+                user = User(
+                    email=email,
+                    full_name=full_name.strip(),
+                    role=user_role
+                )
+                user.set_password(password)
+                
+                db.session.add(user)
             
             result['success'] = True
             result['message'] = 'Registration successful'
@@ -96,8 +104,9 @@ class AuthService:
             
             current_app.logger.info(f'New user registered: {email} as {user_role.value}')
             
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Registration failed: {str(e)}'
             current_app.logger.error(f'Registration failed for {email}: {str(e)}')
         
@@ -121,12 +130,13 @@ class AuthService:
             return result
         
         try:
-            # Generate reset token
-            token = user.generate_reset_token()
-            
-            # Send reset email
-            email_service = EmailService()
-            email_sent = email_service.send_password_reset_email(user, token)
+            with unit_of_work():
+                # Generate reset token
+                token = user.generate_reset_token()
+                
+                # Send reset email
+                email_service = EmailService()
+                email_sent = email_service.send_password_reset_email(user, token)
             
             if email_sent:
                 result['success'] = True
@@ -158,14 +168,17 @@ class AuthService:
         
         try:
             # Update password
-            user.set_password(new_password)
-            user.clear_reset_token()
+            with unit_of_work():
+                user.set_password(new_password)
+                user.clear_reset_token()
             
             result['success'] = True
             result['message'] = 'Password reset successful'
             
             current_app.logger.info(f'Password reset completed for {user.email}')
             
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             result['message'] = 'Failed to reset password'
             current_app.logger.error(f'Password reset failed for user {user.email}: {str(e)}')
@@ -173,21 +186,29 @@ class AuthService:
         return result
     
     @staticmethod
-    def update_user_profile(user: User, full_name: str = None) -> Dict[str, Any]:
+    def update_user_profile(user: User, full_name: str = None, approval_digest: bool = None) -> Dict[str, Any]:
         """Update user profile information"""
         result = {'success': False, 'message': ''}
         
+        # JSON clients may send the flag as a string; bool('false') would be True
+        if isinstance(approval_digest, str) and approval_digest.strip().lower() in ('true', 'false'):
+            approval_digest = approval_digest.strip().lower() == 'true'
+        if approval_digest is not None and not isinstance(approval_digest, bool):
+            result['message'] = 'approval_digest must be true or false'
+            return result
+        
         try:
-            if full_name:
-                user.full_name = full_name.strip()
-            
-            db.session.commit()
+            with unit_of_work():
+                if full_name:
+                    user.full_name = full_name.strip()
+                
+                if approval_digest is not None:
+                    user.approval_digest = approval_digest
             
             result['success'] = True
             result['message'] = 'Profile updated successfully'
             
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Failed to update profile: {str(e)}'
             current_app.logger.error(f'Profile update failed for {user.email}: {str(e)}')
         
@@ -204,26 +225,13 @@ class AuthService:
                 return False
         
         if required_permissions:
-            user_permissions = AuthService.get_user_permissions(user)
-            for permission in required_permissions:
-                if permission not in user_permissions:
-                    return False
+            required = parse_permissions(required_permissions)
+            if required is None or not has_permission(user, required):
+                return False
         
         return True
     
     @staticmethod
     def get_user_permissions(user: User) -> list:
         """Get list of permissions for user based on role"""
-        if not user:
-            return []
-        
-        base_permissions = ['view_own_orders', 'create_orders']
-        
-        if user.is_sublead():
-            return base_permissions + ['approve_orders', 'view_team_orders']
-        elif user.is_executive():
-            return base_permissions + ['approve_orders', 'view_all_orders', 'executive_approval']
-        elif user.is_business():
-            return base_permissions + ['manage_orders', 'view_all_orders', 'purchase_orders']
-        else:
-            return base_permissions
+        return permission_names(user)
@@ -0,0 +1,76 @@
+"""
+Approval notification digest service
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from ..models import ApprovalStatus, DigestItem
+from ..models.base import db
+from .email_service import EmailService
+
+
+# Approval stage each digest item is waiting on
+_AWAITED_STATUS = {
+    'sublead': ApprovalStatus.PENDING_SUBLEAD,
+    'executive': ApprovalStatus.PENDING_EXECUTIVE,
+}
+
+
+class DigestService:
+    """Service for coalescing approval notifications into periodic digests
+
+    Approvers who opt in (``User.approval_digest``) have their approval
+    notifications held by ``EmailService`` and get one email per
+    ``APPROVAL_DIGEST_WINDOW`` listing every purchase that started waiting
+    on them, instead of one email per purchase.
+    """
+
+    def __init__(self, email_service: EmailService = None):
+        self.email_service = email_service or EmailService()
+
+    def flush_due(self, now: datetime = None) -> Dict[str, Any]:
+        """Queue a digest for every approver whose oldest held item is past the window"""
+        result = {'digests': 0, 'items': 0}
+        now = now or datetime.utcnow()
+        window = timedelta(seconds=current_app.config.get('APPROVAL_DIGEST_WINDOW', 3600))
+
+        due = [row[0] for row in db.session.query(DigestItem.approver_email).group_by(
+            DigestItem.approver_email
+        ).having(func.min(DigestItem.created_at) <= now - window)]
+
+        if not due:
+            return result
+
+        # Inner join and lock only the digest rows: PostgreSQL refuses
+        # FOR UPDATE on the nullable side of an outer join
+        items = DigestItem.query.options(joinedload(DigestItem.purchase, innerjoin=True)).filter(
+            DigestItem.approver_email.in_(due)
+        ).order_by(DigestItem.approver_email, DigestItem.created_at).with_for_update(
+            of=DigestItem, skip_locked=True
+        ).all()
+
+        by_approver = {}
+        for item in items:
+            by_approver.setdefault(item.approver_email, []).append(item)
+
+        for approver_email, held in by_approver.items():
+            # Drop purchases that were approved, rejected or deleted meanwhile
+            waiting = [
+                item for item in held
+                if not item.purchase.is_deleted
+                and item.purchase.approval_status == _AWAITED_STATUS.get(item.approval_type)
+            ]
+
+            if waiting:
+                self.email_service.send_approval_digest(approver_email, waiting)
+                result['digests'] += 1
+                result['items'] += len(waiting)
+
+            for item in held:
+                db.session.delete(item)
+
+        db.session.commit()
+        return result
@@ -1,45 +1,198 @@
 """
 Email service for sending notifications
 """
-from typing import Optional, Dict, Any
-from flask import current_app, render_template, url_for
+import smtplib
+import threading
+import time
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlsplit
+from flask import current_app, has_request_context, render_template, url_for
 from flask_mail import Message, Mail
 import logging
 
-from ..models import User, Purchase
+from ..models import User, Purchase, EmailOutbox, DigestItem
+from ..models.base import db
+
+
+class DeliveryStats:
+    """Throughput and latency counters for SMTP delivery"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self) -> None:
+        """Zero all counters"""
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+        self.batches = 0
+        self.send_seconds = 0.0
+        self.max_latency = 0.0
+    
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+    
+    def record_batch(self) -> None:
+        with self._lock:
+            self.batches += 1
+    
+    def record_send(self, success: bool, seconds: float) -> None:
+        with self._lock:
+            if success:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.send_seconds += seconds
+            self.max_latency = max(self.max_latency, seconds)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Current counters plus derived rates"""
+        with self._lock:
+            attempts = self.sent + self.failed
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'connections': self.connections,
+                'batches': self.batches,
+                'messages_per_second': round(self.sent / self.send_seconds, 2) if self.send_seconds else None,
+                'avg_latency_ms': round(self.send_seconds / attempts * 1000, 3) if attempts else None,
+                'max_latency_ms': round(self.max_latency * 1000, 3)
+            }
 
 
 class EmailService:
-    """Service for handling email notifications"""
+    """Service for handling email notifications
+    
+    Notifications are not sent inline: ``_send_email`` renders them into the
+    ``email_outbox`` table on the caller's session, and they go out once the
+    caller commits and the outbox worker (``worker.py``) picks them up.
+    """
     
     def __init__(self, mail_instance: Mail = None):
-        self.mail = mail_instance
+        self._mail = mail_instance
+        self.stats = DeliveryStats()
+    
+    @property
+    def mail(self) -> Optional[Mail]:
+        return self._mail or current_app.extensions.get('mail')
     
     def _send_email(self, subject: str, recipients: list, html_body: str, text_body: str = None) -> bool:
-        """Send email with error handling"""
+        """Queue email for delivery in the current transaction"""
+        if not current_app.config.get('ENABLE_EMAIL_NOTIFICATIONS', True):
+            current_app.logger.info(f'Email notifications disabled: {subject} to {recipients}')
+            return True
+        
+        db.session.add(EmailOutbox(
+            subject=subject,
+            recipients=','.join(recipients),
+            html_body=html_body,
+            text_body=text_body or self._html_to_text(html_body)
+        ))
+        current_app.logger.info(f'Email queued: {subject} to {recipients}')
+        return True
+    
+    def deliver(self, subject: str, recipients: list, html_body: str, text_body: str = None) -> None:
+        """Send email now; raises on failure so callers can retry"""
         if not self.mail:
-            current_app.logger.error('Mail instance not configured')
-            return False
+            raise RuntimeError('Mail instance not configured')
         
         if current_app.config.get('MAIL_SUPPRESS_SEND', False):
             current_app.logger.info(f'Email suppressed: {subject} to {recipients}')
-            return True
+            return
         
+        started = time.perf_counter()
         try:
-            msg = Message(
-                subject=subject,
-                recipients=recipients,
-                html=html_body,
-                body=text_body or self._html_to_text(html_body)
-            )
-            
-            self.mail.send(msg)
-            current_app.logger.info(f'Email sent successfully: {subject} to {recipients}')
-            return True
-            
-        except Exception as e:
-            current_app.logger.error(f'Failed to send email: {subject} to {recipients}. Error: {str(e)}')
-            return False
+            self.stats.record_connection()
+            self.mail.send(self._build_message(subject, recipients, html_body, text_body))
+        except Exception:
+            self.stats.record_send(False, time.perf_counter() - started)
+            raise
+        self.stats.record_send(True, time.perf_counter() - started)
+        current_app.logger.info(f'Email sent successfully: {subject} to {recipients}')
+    
+    def deliver_batch(self, messages: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Send many messages over one authenticated SMTP connection
+        
+        ``messages`` are dicts of ``deliver`` keyword arguments. Returns one
+        entry per message: ``None`` on success, otherwise the error text. A
+        dropped connection is re-opened for the next message; if it cannot
+        be opened, the rest of the batch fails without further attempts.
+        """
+        if not self.mail:
+            raise RuntimeError('Mail instance not configured')
+        
+        if current_app.config.get('MAIL_SUPPRESS_SEND', False):
+            current_app.logger.info(f'Email batch suppressed: {len(messages)} messages')
+            return [None] * len(messages)
+        
+        self.stats.record_batch()
+        errors = []
+        connection = None
+        
+        try:
+            for index, message in enumerate(messages):
+                if connection is None:
+                    try:
+                        connection = self.mail.connect().__enter__()
+                        self.stats.record_connection()
+                    except Exception as e:
+                        current_app.logger.error(f'SMTP connection failed: {str(e)}')
+                        errors.extend([f'SMTP connection failed: {str(e)}'] * (len(messages) - index))
+                        break
+                
+                started = time.perf_counter()
+                try:
+                    connection.send(self._build_message(**message))
+                    self.stats.record_send(True, time.perf_counter() - started)
+                    errors.append(None)
+                    
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    self.stats.record_send(False, time.perf_counter() - started)
+                    errors.append(str(e))
+                    self._close_connection(connection)
+                    connection = None
+                    
+                except Exception as e:
+                    self.stats.record_send(False, time.perf_counter() - started)
+                    errors.append(str(e))
+        finally:
+            self._close_connection(connection)
+        
+        current_app.logger.info(
+            f'Email batch delivered: {errors.count(None)} sent, {len(errors) - errors.count(None)} failed'
+        )
+        return errors
+    
+    def _build_message(self, subject: str, recipients: list, html_body: str, text_body: str = None) -> Message:
+        return Message(
+            subject=subject,
+            recipients=recipients,
+            html=html_body,
+            body=text_body or self._html_to_text(html_body)
+        )
+    
+    @staticmethod
+    def _close_connection(connection) -> None:
+        if connection is None:
+            return
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass  # The server may already have dropped the connection
+    
+    def dashboard_url(self) -> str:
+        """Dashboard link for notifications, also when rendered outside a request (worker, CLI)"""
+        if current_app.config.get('DASHBOARD_URL'):
+            return current_app.config['DASHBOARD_URL']
+        if has_request_context():
+            return url_for('main.dashboard', _external=True)
+        
+        # url_for needs SERVER_NAME outside a request; bind the URL map to APP_BASE_URL instead
+        base = urlsplit(current_app.config['APP_BASE_URL'])
+        adapter = current_app.url_map.bind(base.netloc, script_name=base.path or '/', url_scheme=base.scheme)
+        return adapter.build('main.dashboard', force_external=True)
     
     def _html_to_text(self, html: str) -> str:
         """Convert HTML to plain text (basic implementation)"""
@@ -65,18 +218,26 @@ class EmailService:
         )
     
     def send_approval_notification(self, purchase: Purchase, approver_email: str, approval_type: str = 'sublead') -> bool:
-        """Send approval notification email"""
+        """Send approval notification email, or hold it for the approver's digest"""
         if not approver_email:
             current_app.logger.error('No approver email provided')
             return False
         
+        if self._wants_digest(approver_email):
+            db.session.add(DigestItem(
+                approver_email=approver_email,
+                approval_type=approval_type,
+                purchase_id=purchase.id
+            ))
+            return True
+        
         subject = f'Purchase Order Needs {approval_type.title()} Approval - MIT Motorsports'
         
         html_body = render_template(
             'email/approval_notification.html',
             purchase=purchase,
             approval_type=approval_type,
-            dashboard_url=url_for('main.dashboard', _external=True)
+            dashboard_url=self.dashboard_url()
         )
         
         return self._send_email(
@@ -85,6 +246,49 @@ class EmailService:
             html_body=html_body
         )
     
+    def send_approval_digest(self, approver_email: str, items: list) -> bool:
+        """Send one email listing every purchase held for an approver's digest"""
+        count = len(items)
+        subject = f'{count} Purchase Order{"s" if count != 1 else ""} Awaiting Your Approval - MIT Motorsports'
+        
+        html_body = render_template(
+            'email/approval_digest.html',
+            items=items,
+            dashboard_url=self.dashboard_url()
+        )
+        
+        return self._send_email(
+            subject=subject,
+            recipients=[approver_email],
+            html_body=html_body
+        )
+    
+    def send_import_summary(self, approver_email: str, summary: Dict[str, Any], importer: User) -> bool:
+        """Send one email summarizing the imported purchases an approver must review"""
+        count = summary['count']
+        subject = (f'{count} Imported Purchase Order{"s" if count != 1 else ""} '
+                   f'{"Need" if count != 1 else "Needs"} Approval - MIT Motorsports')
+        
+        html_body = render_template(
+            'email/import_summary.html',
+            summary=summary,
+            importer=importer,
+            dashboard_url=self.dashboard_url()
+        )
+        
+        return self._send_email(
+            subject=subject,
+            recipients=[approver_email],
+            html_body=html_body
+        )
+    
+    @staticmethod
+    def _wants_digest(approver_email: str) -> bool:
+        """Check whether an approver has opted in to approval digests"""
+        return bool(db.session.query(User.approval_digest).filter(
+            User.email == approver_email
+        ).scalar())
+    
     def send_approval_status_notification(self, purchase: Purchase, status: str, reason: str = None) -> bool:
         """Send approval status notification to requester"""
         if status == 'approved':
@@ -98,7 +302,7 @@ class EmailService:
             template,
             purchase=purchase,
             reason=reason,
-            dashboard_url=url_for('main.dashboard', _external=True)
+            dashboard_url=self.dashboard_url()
         )
         
         return self._send_email(
@@ -116,7 +320,7 @@ class EmailService:
             purchase=purchase,
             old_status=old_status,
             new_status=new_status,
-            dashboard_url=url_for('main.dashboard', _external=True)
+            dashboard_url=self.dashboard_url()
         )
         
         return self._send_email(
@@ -132,7 +336,7 @@ class EmailService:
         html_body = render_template(
             'email/arrival_notification.html',
             purchase=purchase,
-            dashboard_url=url_for('main.dashboard', _external=True)
+            dashboard_url=self.dashboard_url()
         )
         
         return self._send_email(
@@ -142,12 +346,20 @@ class EmailService:
         )
     
     def send_bulk_notification(self, subject: str, recipients: list, template: str, **template_vars) -> Dict[str, Any]:
-        """Send bulk notification to multiple recipients"""
+        """Send bulk notification to multiple recipients
+        
+        The template is compiled and the shared context (including context
+        processors) is built once; only the per-recipient render repeats.
+        """
         result = {'success': 0, 'failed': 0, 'errors': []}
         
+        compiled = current_app.jinja_env.get_or_select_template(template)
+        context = dict(template_vars)
+        current_app.update_template_context(context)
+        
         for recipient in recipients:
             try:
-                html_body = render_template(template, recipient=recipient, **template_vars)
+                html_body = compiled.render({**context, 'recipient': recipient})
                 
                 if self._send_email(subject, [recipient], html_body):
                     result['success'] += 1
@@ -166,19 +378,17 @@ class EmailService:
         result = {'success': False, 'message': ''}
         
         try:
-            # Try to send a test email to the configured sender
+            # Try to send a test email to the configured sender, bypassing the outbox
             test_subject = 'Email Configuration Test'
             test_body = '<p>This is a test email to verify email configuration.</p>'
             
-            if self._send_email(
+            self.deliver(
                 subject=test_subject,
                 recipients=[current_app.config.get('MAIL_USERNAME')],
                 html_body=test_body
-            ):
-                result['success'] = True
-                result['message'] = 'Email configuration is working'
-            else:
-                result['message'] = 'Failed to send test email'
+            )
+            result['success'] = True
+            result['message'] = 'Email configuration is working'
                 
         except Exception as e:
             result['message'] = f'Email configuration error: {str(e)}'
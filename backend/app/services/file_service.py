@@ -2,18 +2,70 @@
 File handling service
 """
 import os
-import uuid
+import re
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional, Dict, Any, Tuple
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 from flask import current_app
-from PIL import Image
+from sqlalchemy import case, delete, update
+from sqlalchemy.exc import IntegrityError
 import mimetypes
 
+from . import image_processing
+from ..models import Purchase, StoredFile
+from ..models.base import db
+from ..unit_of_work import unit_of_work
+
+
+# Sharded content-addressed path, e.g. arrival_photos/ab/cd/<sha256>_thumb.jpg
+_CONTENT_ADDRESSED = re.compile(
+    r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})(?P<thumb>_thumb)?\.[a-z0-9]+$'
+)
+
+# One process pool per web worker process, created on first use
+_executor = None
+_executor_pid = None
+_executor_slots = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int, max_pending: int):
+    """Return this process's image pool, recreating it after a fork"""
+    global _executor, _executor_pid, _executor_slots
+    
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _executor_pid = os.getpid()
+            _executor_slots = threading.BoundedSemaphore(max_pending)
+        return _executor, _executor_slots
+
+
+def _discard_executor() -> None:
+    """Drop a broken pool so the next upload starts a fresh one"""
+    global _executor
+    
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
 
 class FileService:
     """Service for handling file uploads and management"""
     
+    CHUNK_SIZE = 64 * 1024
+    
+    # Subfolders whose files are kept alive by references (arrival photos) or
+    # are scratch space; uploads anywhere else have no owner and are never collected
+    COLLECTABLE_SUBFOLDERS = (Purchase.ARRIVAL_PHOTO_FOLDER, 'temp')
+    
     def __init__(self):
         # Lazy load config to avoid application context issues
         self._upload_folder = None
@@ -73,8 +125,8 @@ class FileService:
         result['valid'] = True
         return result
     
-    def save_file(self, file: FileStorage, subfolder: str = '', custom_name: str = None) -> Dict[str, Any]:
-        """Save uploaded file with validation"""
+    def save_file(self, file: FileStorage, subfolder: str = '') -> Dict[str, Any]:
+        """Save uploaded file with validation, deduplicated by content"""
         result = {'success': False, 'message': '', 'filename': None, 'filepath': None}
         
         # Validate file
@@ -83,35 +135,75 @@ class FileService:
             result['message'] = validation['message']
             return result
         
+        temp_path = None
         try:
-            # Generate secure filename
-            if custom_name:
-                filename = self._generate_unique_filename(custom_name, file.filename)
-            else:
-                filename = self._generate_unique_filename(file.filename)
+            # Hash while streaming to a temp file on the same filesystem
+            temp_folder = os.path.join(self.upload_folder, 'temp')
+            os.makedirs(temp_folder, exist_ok=True)
+            ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+            fd, temp_path = tempfile.mkstemp(dir=temp_folder, suffix=ext)
             
-            # Create upload directory if it doesn't exist
-            upload_path = os.path.join(self.upload_folder, subfolder) if subfolder else self.upload_folder
-            os.makedirs(upload_path, exist_ok=True)
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: file.stream.read(self.CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            
+            is_image = self._is_image_file(file.filename)
+            failure = None
+            if is_image:
+                # Normalize before choosing the path, so the content address
+                # (and the ETag derived from it) matches the stored bytes
+                failure = self._normalize_image(temp_path)
+                if failure is None:
+                    digest, size = self._hash_file(temp_path)
             
-            # Save file
+            sha256 = digest.hexdigest()
+            filename = self._content_path(sha256, file.filename)
+            upload_path = os.path.join(self.upload_folder, subfolder) if subfolder else self.upload_folder
             filepath = os.path.join(upload_path, filename)
-            file.save(filepath)
             
-            # Process image if it's an image file
-            if self._is_image_file(filename):
-                self._process_image(filepath)
+            with unit_of_work():
+                # Claim the row before looking at the file: the orphan cleanup
+                # removes a file only while holding its row, so it cannot
+                # delete this one between the check and the commit
+                self._register_stored_file(subfolder, filename, sha256, size)
+                
+                created = not os.path.exists(filepath)
+                if created:
+                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                    if is_image:
+                        if failure is None:
+                            image_processing.mark_processing(filepath)
+                        else:
+                            image_processing.mark_failed(filepath, failure)
+                    os.replace(temp_path, filepath)
+            
+            if is_image:
+                # Build the thumbnail off the request thread
+                if created and failure is None:
+                    result['state'] = self._schedule_processing(filepath)
+                else:
+                    result['state'] = image_processing.processing_state(filepath)
+                result['thumbnail'] = image_processing.thumbnail_path(filename)
+            else:
+                result['state'] = image_processing.STATE_READY
             
             result['success'] = True
             result['message'] = 'File uploaded successfully'
             result['filename'] = filename
             result['filepath'] = filepath
             
-            current_app.logger.info(f'File saved: {filepath}')
+            current_app.logger.info(f'File saved: {filepath}' if created else f'File deduplicated: {filepath}')
             
         except Exception as e:
             result['message'] = f'Failed to save file: {str(e)}'
             current_app.logger.error(f'File save failed: {str(e)}')
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
         
         return result
     
@@ -125,6 +217,9 @@ class FileService:
             
             if os.path.exists(filepath):
                 os.remove(filepath)
+                for derived in self._derived_files(filepath):
+                    if os.path.exists(derived):
+                        os.remove(derived)
                 result['success'] = True
                 result['message'] = 'File deleted successfully'
                 current_app.logger.info(f'File deleted: {filepath}')
@@ -158,40 +253,134 @@ class FileService:
             'is_image': self._is_image_file(filename)
         }
     
-    def cleanup_orphaned_files(self, referenced_files: list, subfolder: str = '') -> Dict[str, Any]:
-        """Clean up files that are no longer referenced"""
+    def get_processing_status(self, filename: str, subfolder: str = '') -> Dict[str, Any]:
+        """Report whether an upload's derived images are ready"""
+        filepath = os.path.join(self.upload_folder, subfolder, filename) if subfolder else \
+                  os.path.join(self.upload_folder, filename)
+        
+        state = image_processing.processing_state(filepath)
+        if state is None:
+            return {'exists': False}
+        
+        status = {'exists': True, 'filename': filename, 'state': state}
+        if self._is_image_file(filename):
+            thumbnail = image_processing.thumbnail_path(filepath)
+            if state == image_processing.STATE_READY and os.path.exists(thumbnail):
+                status['thumbnail'] = image_processing.thumbnail_path(filename)
+            if state == image_processing.STATE_FAILED:
+                status['error'] = image_processing.failure_reason(filepath)
+        return status
+    
+    def immutable_etag(self, filename: str) -> Optional[str]:
+        """Strong ETag for a content-addressed upload whose bytes will no longer change
+        
+        ``filename`` is relative to the upload folder. Returns None for legacy
+        uploads and for images that are still being processed.
+        """
+        match = _CONTENT_ADDRESSED.search(filename)
+        if not match:
+            return None
+        
+        if self._is_image_file(filename):
+            original = os.path.join(self.upload_folder, filename.replace('_thumb.', '.', 1) if match.group('thumb') else filename)
+            if image_processing.processing_state(original) != image_processing.STATE_READY:
+                return None
+        
+        return match.group('sha256') + (match.group('thumb') or '')
+    
+    def cleanup_orphaned_files(self, subfolder: str = None, grace_period: int = None) -> Dict[str, Any]:
+        """Delete stored files nothing has referenced for the grace period"""
         result = {'deleted': 0, 'errors': []}
+        if subfolder is not None and subfolder not in self.COLLECTABLE_SUBFOLDERS:
+            result['errors'].append(f'Files in {subfolder} have no reference owner and are never collected')
+            return result
+        grace_period = grace_period if grace_period is not None else \
+            current_app.config.get('UPLOAD_ORPHAN_GRACE_PERIOD', 24 * 3600)
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_period)
+        orphaned = (StoredFile.ref_count <= 0, StoredFile.released_at < cutoff)
         
         try:
-            upload_path = os.path.join(self.upload_folder, subfolder) if subfolder else self.upload_folder
+            subfolders = [subfolder] if subfolder is not None else list(self.COLLECTABLE_SUBFOLDERS)
+            candidates = db.session.query(StoredFile.id, StoredFile.subfolder, StoredFile.path).filter(
+                *orphaned, StoredFile.subfolder.in_(subfolders)
+            ).order_by(StoredFile.id).all()
             
-            if not os.path.exists(upload_path):
-                return result
-            
-            for filename in os.listdir(upload_path):
-                if filename not in referenced_files:
-                    try:
-                        filepath = os.path.join(upload_path, filename)
-                        os.remove(filepath)
-                        result['deleted'] += 1
-                        current_app.logger.info(f'Orphaned file deleted: {filepath}')
-                    except Exception as e:
-                        result['errors'].append(f'Failed to delete {filename}: {str(e)}')
+            for stored in candidates:
+                # The file is removed while the row deletion is uncommitted, so
+                # an upload claiming the same row waits and then recreates both
+                deleted = db.session.execute(
+                    delete(StoredFile).where(StoredFile.id == stored.id, *orphaned)
+                ).rowcount
+                if not deleted:
+                    db.session.rollback()
+                    continue
+                
+                filepath = os.path.join(self.upload_folder, stored.subfolder, stored.path)
+                try:
+                    for path in [filepath] + self._derived_files(filepath):
+                        if os.path.exists(path):
+                            os.remove(path)
+                except Exception as e:
+                    db.session.rollback()
+                    result['errors'].append(f'Failed to delete {stored.path}: {str(e)}')
+                    continue
+                
+                db.session.commit()
+                self._prune_shard(os.path.dirname(filepath))
+                result['deleted'] += 1
+                current_app.logger.info(f'Orphaned file deleted: {filepath}')
                         
         except Exception as e:
+            db.session.rollback()
             result['errors'].append(f'Cleanup failed: {str(e)}')
         
         return result
     
-    def _generate_unique_filename(self, original_filename: str, fallback_filename: str = None) -> str:
-        """Generate a unique filename"""
-        filename = secure_filename(original_filename or fallback_filename or 'file')
+    def _content_path(self, sha256: str, original_filename: str) -> str:
+        """Sharded storage path for content with the given hash, e.g. ab/cd/abcd...ef.jpg"""
+        ext = os.path.splitext(secure_filename(original_filename or ''))[1].lower()
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+    
+    @staticmethod
+    def _prune_shard(directory: str) -> None:
+        """Remove the two hash-prefix directories above a deleted file once empty"""
+        for _ in range(2):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return  # Not empty, or already gone
+            directory = os.path.dirname(directory)
+    
+    def _hash_file(self, filepath: str) -> Tuple[Any, int]:
+        """SHA-256 digest and size of a file on disk"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+        return digest, size
+    
+    def _register_stored_file(self, subfolder: str, path: str, sha256: str, size: int) -> None:
+        """Record a stored file, restarting the grace period if it is still unreferenced
         
-        # Add UUID to ensure uniqueness
-        name, ext = os.path.splitext(filename)
-        unique_id = str(uuid.uuid4())[:8]
+        Writes the row even when nothing changes, so this transaction holds
+        it until the caller commits.
+        """
+        touch = (
+            update(StoredFile)
+            .where(StoredFile.subfolder == subfolder, StoredFile.path == path)
+            .values(released_at=case((StoredFile.ref_count <= 0, datetime.utcnow()), else_=StoredFile.released_at))
+        )
+        if db.session.execute(touch).rowcount:
+            return
         
-        return f"{name}_{unique_id}{ext}"
+        try:
+            with db.session.begin_nested():
+                db.session.add(StoredFile(subfolder=subfolder, path=path, sha256=sha256, size=size))
+        except IntegrityError:
+            # The same content was registered concurrently
+            db.session.execute(touch)
     
     def _is_allowed_mime_type(self, mime_type: str) -> bool:
         """Check if MIME type is allowed"""
@@ -206,25 +395,82 @@ class FileService:
         image_extensions = {'png', 'jpg', 'jpeg', 'gif'}
         return filename.rsplit('.', 1)[1].lower() in image_extensions
     
-    def _process_image(self, filepath: str) -> None:
-        """Process uploaded image (resize, optimize)"""
+    def _derived_files(self, filepath: str) -> list:
+        """Thumbnail and state markers that belong to an upload"""
+        return [
+            image_processing.thumbnail_path(filepath),
+            f'{filepath}.{image_processing.STATE_PROCESSING}',
+            f'{filepath}.{image_processing.STATE_FAILED}'
+        ]
+    
+    def _submit(self, function, *args):
+        """Run ``function`` on the image pool; None when the pool is off, full or broken"""
+        config = current_app.config
+        if config.get('IMAGE_PROCESSING_MODE', 'pool') != 'pool':
+            return None
+        
+        executor, slots = _get_executor(
+            config.get('IMAGE_PROCESSING_WORKERS', 2),
+            config.get('IMAGE_PROCESSING_MAX_PENDING', 32)
+        )
+        if not slots.acquire(blocking=False):
+            current_app.logger.warning(f'Image pool backlog full, processing inline: {args[0]}')
+            return None
+        
         try:
-            with Image.open(filepath) as img:
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                # Resize if too large
-                max_size = (1920, 1080)
-                if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                # Save with optimization
-                img.save(filepath, optimize=True, quality=85)
-                
+            future = executor.submit(function, *args)
+        except Exception as e:
+            slots.release()
+            _discard_executor()
+            current_app.logger.error(f'Image pool unavailable, processing inline: {str(e)}')
+            return None
+        future.add_done_callback(lambda _: slots.release())
+        return future
+    
+    def _normalize_image(self, filepath: str) -> Optional[str]:
+        """Resize and re-encode an image in place, waiting for the pool; returns the error if it failed"""
+        try:
+            future = self._submit(image_processing.normalize_image, filepath)
+            if future is not None:
+                try:
+                    future.result()
+                    return None
+                except BrokenProcessPool as e:
+                    _discard_executor()
+                    current_app.logger.error(f'Image pool unavailable, processing inline: {str(e)}')
+            image_processing.normalize_image(filepath)
+            return None
         except Exception as e:
-            current_app.logger.warning(f'Image processing failed for {filepath}: {str(e)}')
+            # Don't fail the upload; the original bytes are stored instead
+            current_app.logger.warning(f'Image normalization failed for {filepath}: {str(e)}')
+            return str(e)
+    
+    def _schedule_processing(self, filepath: str) -> str:
+        """Hand an image's thumbnail to the process pool, or build it inline when the pool is off or full"""
+        future = self._submit(image_processing.process_upload, filepath)
+        if future is None:
+            return self._process_image(filepath)
+        
+        logger = current_app.logger
+        
+        def _done(future):
+            if future.exception() is not None:
+                logger.error(f'Image processing crashed for {filepath}: {future.exception()}')
+            elif future.result() == image_processing.STATE_FAILED:
+                logger.warning(f'Image processing failed for {filepath}: '
+                               f'{image_processing.failure_reason(filepath)}')
+        
+        future.add_done_callback(_done)
+        return image_processing.STATE_PROCESSING
+    
+    def _process_image(self, filepath: str) -> str:
+        """Build an uploaded image's thumbnail on this thread"""
+        state = image_processing.process_upload(filepath)
+        if state == image_processing.STATE_FAILED:
             # Don't fail the upload if image processing fails
+            current_app.logger.warning(f'Image processing failed for {filepath}: '
+                                       f'{image_processing.failure_reason(filepath)}')
+        return state
     
     def create_thumbnail(self, filepath: str, size: Tuple[int, int] = (200, 200)) -> Optional[str]:
         """Create thumbnail for image"""
@@ -232,16 +478,7 @@ class FileService:
             return None
         
         try:
-            with Image.open(filepath) as img:
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                
-                # Generate thumbnail filename
-                name, ext = os.path.splitext(filepath)
-                thumbnail_path = f"{name}_thumb{ext}"
-                
-                img.save(thumbnail_path, optimize=True, quality=85)
-                return thumbnail_path
-                
+            return image_processing.create_thumbnail(filepath, size)
         except Exception as e:
             current_app.logger.error(f'Thumbnail creation failed: {str(e)}')
             return None
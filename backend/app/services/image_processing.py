@@ -0,0 +1,121 @@
+"""
+Image normalization pipeline for uploaded files
+
+The functions here run in worker processes, so they only take plain
+arguments and never touch the Flask app or database. Processing state is
+kept in marker files next to the upload so every web worker can report it:
+
+    <file>.processing   thumbnailing still running
+    <file>.failed       processing gave up; the file holds the error
+    (neither)           the image and its thumbnail are ready
+
+Uploads are normalized before they are hashed and stored, so only the
+thumbnail is derived once the file is in place.
+"""
+import os
+from typing import Optional, Tuple
+from PIL import Image
+
+STATE_PROCESSING = 'processing'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+MAX_IMAGE_SIZE = (1920, 1080)
+THUMBNAIL_SIZE = (200, 200)
+
+
+def thumbnail_path(filepath: str) -> str:
+    """Path of the thumbnail derived from ``filepath``"""
+    name, ext = os.path.splitext(filepath)
+    return f"{name}_thumb{ext}"
+
+
+def processing_state(filepath: str) -> Optional[str]:
+    """Current processing state of an upload, or None if it does not exist"""
+    if os.path.exists(f'{filepath}.{STATE_PROCESSING}'):
+        return STATE_PROCESSING
+    if os.path.exists(f'{filepath}.{STATE_FAILED}'):
+        return STATE_FAILED
+    if os.path.exists(filepath):
+        return STATE_READY
+    return None
+
+
+def failure_reason(filepath: str) -> Optional[str]:
+    """Error recorded for an upload whose processing failed"""
+    try:
+        with open(f'{filepath}.{STATE_FAILED}') as marker:
+            return marker.read()
+    except OSError:
+        return None
+
+
+def mark_processing(filepath: str) -> None:
+    """Record that an upload is waiting for processing"""
+    with open(f'{filepath}.{STATE_PROCESSING}', 'w'):
+        pass
+
+
+def mark_failed(filepath: str, reason: str) -> None:
+    """Record that processing an upload gave up, and why"""
+    with open(f'{filepath}.{STATE_FAILED}', 'w') as marker:
+        marker.write(reason)
+
+
+def _save_atomic(img: Image.Image, target: str, **options) -> None:
+    """Encode to a temporary file and swap it in so readers never see a partial image"""
+    directory, name = os.path.split(target)
+    ext = os.path.splitext(name)[1].lower()
+    temp_path = os.path.join(directory, f'.{name}.tmp')
+    try:
+        img.save(temp_path, format=Image.registered_extensions().get(ext), **options)
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def normalize_image(filepath: str, max_size: Tuple[int, int] = MAX_IMAGE_SIZE) -> None:
+    """Resize an image to fit ``max_size`` and re-encode it optimized, in place"""
+    with Image.open(filepath) as img:
+        # Convert to RGB if necessary
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGB')
+
+        # Resize if too large
+        if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        _save_atomic(img, filepath, optimize=True, quality=85)
+
+
+def create_thumbnail(filepath: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> str:
+    """Write the thumbnail for an image and return its path"""
+    target = thumbnail_path(filepath)
+    with Image.open(filepath) as img:
+        # draft() lets the JPEG decoder downscale while reading
+        img.draft('RGB', (size[0] * 2, size[1] * 2))
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGB')
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        _save_atomic(img, target, optimize=True, quality=85)
+    return target
+
+
+def process_upload(filepath: str, thumbnail_size: Tuple[int, int] = THUMBNAIL_SIZE) -> str:
+    """Derive the thumbnail of a stored image, then clear the processing marker
+
+    Returns the final state. The image itself is left untouched, so the
+    file stays usable either way.
+    """
+    processing_marker = f'{filepath}.{STATE_PROCESSING}'
+    try:
+        create_thumbnail(filepath, thumbnail_size)
+        state = STATE_READY
+    except Exception as e:
+        mark_failed(filepath, str(e))
+        state = STATE_FAILED
+    finally:
+        if os.path.exists(processing_marker):
+            os.remove(processing_marker)
+    return state
@@ -0,0 +1,73 @@
+"""
+Email outbox delivery service
+"""
+from datetime import datetime
+from typing import Dict, Any
+from flask import current_app
+
+from ..models import EmailOutbox, OutboxStatus
+from ..models.base import db
+from .email_service import EmailService
+
+
+class OutboxService:
+    """Service for draining the email outbox in batches"""
+
+    def __init__(self, email_service: EmailService = None):
+        self.email_service = email_service or EmailService()
+
+    def dispatch_batch(self, batch_size: int = None) -> Dict[str, Any]:
+        """Deliver one batch of due messages and commit their new state"""
+        config = current_app.config
+        batch_size = batch_size or config.get('OUTBOX_BATCH_SIZE', 50)
+        result = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+        # SKIP LOCKED lets several workers share the outbox on PostgreSQL;
+        # SQLite ignores the locking clause, so run a single worker there.
+        messages = EmailOutbox.query.filter(
+            EmailOutbox.status == OutboxStatus.PENDING,
+            EmailOutbox.next_attempt_at <= datetime.utcnow()
+        ).order_by(EmailOutbox.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+        # One SMTP connection carries the whole batch
+        errors = self.email_service.deliver_batch([
+            {
+                'subject': message.subject,
+                'recipients': message.recipient_list,
+                'html_body': message.html_body,
+                'text_body': message.text_body
+            }
+            for message in messages
+        ]) if messages else []
+
+        for message, error in zip(messages, errors):
+            if error is None:
+                message.mark_sent()
+                result['sent'] += 1
+            else:
+                message.mark_attempt_failed(
+                    error,
+                    max_attempts=config.get('OUTBOX_MAX_ATTEMPTS', 8),
+                    backoff=config.get('OUTBOX_RETRY_BACKOFF', 30),
+                    max_backoff=config.get('OUTBOX_MAX_BACKOFF', 3600)
+                )
+                if message.status == OutboxStatus.FAILED:
+                    result['failed'] += 1
+                    current_app.logger.error(f'Outbox message {message.id} failed permanently: {error}')
+                else:
+                    result['retrying'] += 1
+                    current_app.logger.warning(f'Outbox message {message.id} will be retried: {error}')
+
+        db.session.commit()
+        return result
+
+    def drain(self, batch_size: int = None) -> Dict[str, Any]:
+        """Dispatch batches until no due messages remain"""
+        totals = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+        while True:
+            result = self.dispatch_batch(batch_size)
+            for key in totals:
+                totals[key] += result[key]
+            if not any(result.values()):
+                return totals
@@ -0,0 +1,237 @@
+"""
+Bulk import of purchase requests from CSV or XLSX files
+"""
+import csv
+import io
+import os
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import insert
+
+from ..cache import mark_purchases_changed
+from ..models import Purchase, User, UrgencyLevel
+from ..models.base import db
+from ..policy import Permission, has_permission
+from .email_service import EmailService
+from .purchase_service import PurchaseService
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - only needed for .xlsx imports
+    openpyxl = None
+
+
+REQUIRED_COLUMNS = ('item_name', 'vendor_name', 'price', 'subteam')
+OPTIONAL_COLUMNS = ('item_link', 'shipping_cost', 'quantity', 'subproject', 'purpose', 'notes',
+                    'urgency', 'requester_name', 'requester_email')
+
+_URGENCIES = {level.value.lower(): level for level in UrgencyLevel}
+
+
+class PurchaseImportService:
+    """Service for creating many purchase requests from one spreadsheet
+
+    Rows are streamed from the file, validated one pass per row with
+    column converters resolved once from the header, and inserted with
+    one executemany INSERT per batch. Invalid rows are reported by line
+    and skipped; valid rows are committed together. Instead of one email
+    per purchase, each approver gets a single summary of the import.
+    """
+
+    BATCH_SIZE = 1000
+    MAX_REPORTED_ERRORS = 500
+
+    def __init__(self):
+        self.email_service = EmailService()
+
+    def import_file(self, stream: IO, filename: str, user: User, dry_run: bool = False) -> Dict[str, Any]:
+        """Validate and insert every row of a CSV or XLSX file as a pending purchase"""
+        result = {'success': False, 'message': '', 'imported': 0, 'rejected': 0, 'errors': [], 'notified': 0}
+
+        try:
+            rows = self._read_rows(stream, filename)
+            header = next(rows, None)
+        except (ValueError, UnicodeDecodeError) as e:
+            result['message'] = str(e)
+            return result
+
+        columns, message = self._map_columns(header)
+        if message:
+            result['message'] = message
+            return result
+
+        # Requesters may only import orders in their own name
+        on_behalf = has_permission(user, Permission.VIEW_ALL_ORDERS)
+        max_rows = current_app.config.get('PURCHASE_IMPORT_MAX_ROWS', 20000)
+        now = datetime.utcnow()
+        batch = []
+        summaries = defaultdict(lambda: {'count': 0, 'total_cost': Decimal('0'), 'subteams': defaultdict(int)})
+
+        try:
+            for line, values in rows:
+                if line - 1 > max_rows:
+                    raise ValueError(f'At most {max_rows} rows per import')
+
+                record, error = self._validate(values, columns)
+                if error:
+                    result['rejected'] += 1
+                    if len(result['errors']) < self.MAX_REPORTED_ERRORS:
+                        result['errors'].append({'line': line, 'message': error})
+                    continue
+
+                if not on_behalf or not record.get('requester_email'):
+                    record['requester_name'] = user.full_name
+                    record['requester_email'] = user.email
+                record.setdefault('requester_name', record['requester_email'])
+                record.update(user_id=user.id, created_at=now, updated_at=now, purchase_date=now)
+                batch.append(record)
+
+                sublead_email = PurchaseService.SUBLEAD_EMAILS.get(record['subteam'])
+                if sublead_email:
+                    summary = summaries[sublead_email]
+                    summary['count'] += 1
+                    summary['total_cost'] += record['price'] * record['quantity'] + record['shipping_cost']
+                    summary['subteams'][record['subteam']] += 1
+
+                if len(batch) >= self.BATCH_SIZE:
+                    result['imported'] += self._insert(batch, dry_run)
+                    batch = []
+
+            result['imported'] += self._insert(batch, dry_run)
+
+            if dry_run:
+                db.session.rollback()
+                result['success'] = True
+                result['message'] = f'{result["imported"]} rows valid, {result["rejected"]} rejected'
+                return result
+
+            if result['imported']:
+                mark_purchases_changed(db.session)
+                for approver_email, summary in summaries.items():
+                    summary['subteams'] = dict(summary['subteams'])
+                    self.email_service.send_import_summary(approver_email, summary, user)
+                result['notified'] = len(summaries)
+
+            db.session.commit()
+
+            result['success'] = True
+            result['message'] = f'Imported {result["imported"]} purchases, rejected {result["rejected"]} rows'
+            current_app.logger.info(f'Purchase import by {user.email}: {result["imported"]} imported, '
+                                    f'{result["rejected"]} rejected')
+
+        except Exception as e:
+            db.session.rollback()
+            result['imported'] = 0
+            result['notified'] = 0
+            result['message'] = f'Failed to import purchases: {str(e)}'
+            current_app.logger.error(f'Purchase import failed: {str(e)}')
+
+        return result
+
+    @staticmethod
+    def _insert(batch: List[Dict[str, Any]], dry_run: bool) -> int:
+        """One executemany INSERT for a batch of validated rows"""
+        if batch and not dry_run:
+            db.session.execute(insert(Purchase), batch)
+        return len(batch)
+
+    @staticmethod
+    def _read_rows(stream: IO, filename: str) -> Iterator[Tuple[int, list]]:
+        """Yield the header, then (line number, cell values) for each non-empty row"""
+        extension = os.path.splitext(filename or '')[1].lower()
+
+        if extension == '.xlsx':
+            if openpyxl is None:
+                raise ValueError('XLSX import requires openpyxl; upload a CSV instead')
+            sheet = openpyxl.load_workbook(stream, read_only=True, data_only=True).active
+            rows = sheet.iter_rows(values_only=True)
+        elif extension == '.csv':
+            if isinstance(stream.read(0), bytes):
+                stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+            rows = csv.reader(stream)
+        else:
+            raise ValueError('Import file must be .csv or .xlsx')
+
+        header = next(rows, None)
+        if header is None:
+            return
+        yield header
+
+        for line, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield line, values
+
+    @staticmethod
+    def _map_columns(header: Optional[list]) -> Tuple[Dict[str, int], Optional[str]]:
+        """Column name -> index for the known columns, or an error message"""
+        if not header:
+            return {}, 'Import file is empty'
+
+        columns = {}
+        for index, name in enumerate(header):
+            key = str(name or '').strip().lower().replace(' ', '_')
+            if key in REQUIRED_COLUMNS or key in OPTIONAL_COLUMNS:
+                columns.setdefault(key, index)
+
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            return {}, f'Missing required columns: {", ".join(missing)}'
+        return columns, None
+
+    @staticmethod
+    def _validate(values: list, columns: Dict[str, int]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Convert one row to INSERT values, or return why it is invalid"""
+        cells = {}
+        for name, index in columns.items():
+            value = values[index] if index < len(values) else None
+            cells[name] = str(value).strip() if value is not None else ''
+
+        for name in REQUIRED_COLUMNS:
+            if not cells[name]:
+                return None, f'Missing required field: {name}'
+
+        try:
+            price = Decimal(cells['price'].lstrip('$').replace(',', ''))
+            shipping_cost = Decimal(cells.get('shipping_cost', '').lstrip('$').replace(',', '') or '0')
+        except InvalidOperation:
+            return None, 'Price and shipping cost must be numbers'
+        if price < 0 or shipping_cost < 0:
+            return None, 'Price and shipping cost cannot be negative'
+
+        try:
+            quantity = int(Decimal(cells.get('quantity') or '1'))
+        except (InvalidOperation, ValueError):
+            return None, f'Invalid quantity: {cells["quantity"]!r}'
+        if quantity < 1:
+            return None, 'Quantity must be at least 1'
+
+        urgency = _URGENCIES.get((cells.get('urgency') or 'neither').lower())
+        if urgency is None:
+            return None, f'Unknown urgency: {cells["urgency"]!r}'
+
+        requester_email = cells.get('requester_email', '').lower()
+        if requester_email and '@' not in requester_email:
+            return None, f'Invalid requester email: {requester_email!r}'
+
+        record = {
+            'item_name': cells['item_name'][:200],
+            'vendor_name': cells['vendor_name'][:200],
+            'item_link': cells.get('item_link', ''),
+            'price': price.quantize(Decimal('0.01')),
+            'shipping_cost': shipping_cost.quantize(Decimal('0.01')),
+            'quantity': quantity,
+            'subteam': cells['subteam'],
+            'subproject': cells.get('subproject', ''),
+            'purpose': cells.get('purpose', ''),
+            'notes': cells.get('notes', ''),
+            'urgency': urgency,
+        }
+        if requester_email:
+            record['requester_email'] = requester_email
+            if cells.get('requester_name'):
+                record['requester_name'] = cells['requester_name']
+        return record, None
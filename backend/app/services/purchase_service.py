@@ -1,56 +1,76 @@
 """
 Purchase management service
 """
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
 from typing import Optional, Dict, Any, List
 from flask import current_app
-from sqlalchemy import or_, and_
+from sqlalchemy import func, tuple_
 
-from ..models import Purchase, User, PurchaseStatus, ApprovalStatus, UrgencyLevel
+from ..models import Purchase, User, PurchaseStatus, ApprovalStatus, UrgencyLevel, StoredFile, TransitionConflict
 from ..models.base import db
+from ..cache import purchase_cache, mark_purchases_changed
+from ..policy import scope_purchases, scope_key, scope_condition
+from ..filters import PurchaseFilter
+from ..unit_of_work import unit_of_work
 from .email_service import EmailService
+from .search_service import SearchService
 
 
 class PurchaseService:
     """Service for handling purchase operations"""
     
-    def __init__(self, email_service: EmailService = None):
+    # This is a simplified version - in production, you'd have a proper mapping
+    # of subteams to sublead emails
+    SUBLEAD_EMAILS = {
+        'MechE Structures': 'sublead1@mit.edu',
+        'Electrical': 'sublead2@mit.edu',
+        # Add more mappings
+    }
+    
+    def __init__(self, email_service: EmailService = None, search_service: SearchService = None):
         self.email_service = email_service or EmailService()
+        self.search_service = search_service or SearchService()
     
     def create_purchase(self, user: User, purchase_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new purchase order"""
         result = {'success': False, 'message': '', 'purchase': None}
         
         try:
-            # Validate required fields
-            required_fields = ['item_name', 'vendor_name', 'price', 'subteam', 'requester_name', 'requester_email']
-            for field in required_fields:
-                if not purchase_data.get(field):
-                    result['message'] = f'Missing required field: {field}'
-                    return result
-            
-            # Create purchase object
-            purchase = Purchase(
-                item_name=purchase_data['item_name'],
-                vendor_name=purchase_data['vendor_name'],
-                item_link=purchase_data.get('item_link', ''),
-                price=float(purchase_data['price']),
-                shipping_cost=float(purchase_data.get('shipping_cost', 0)),
-                quantity=int(purchase_data.get('quantity', 1)),
-                subteam=purchase_data['subteam'],
-                subproject=purchase_data.get('subproject', ''),
-                purpose=purchase_data.get('purpose', ''),
-                notes=purchase_data.get('notes', ''),
-                requester_name=purchase_data['requester_name'],
-                requester_email=purchase_data['requester_email'],
-                urgency=UrgencyLevel(purchase_data.get('urgency', 'Neither')),
-                user_id=user.id
-            )
-            
-            db.session.add(purchase)
-            db.session.commit()
-            
-            # Send approval notification
-            self._send_approval_notification(purchase)
+            with unit_of_work():
+                # Validate required fields
+                required_fields = ['item_name', 'vendor_name', 'price', 'subteam', 'requester_name', 'requester_email']
+                for field in required_fields:
+                    if not purchase_data.get(field):
+                        result['message'] = f'Missing required field: {field}'
+                        return result
+                
+                # Create purchase object
+                purchase = Purchase(
+                    item_name=purchase_data['item_name'],
+                    vendor_name=purchase_data['vendor_name'],
+                    item_link=purchase_data.get('item_link', ''),
+                    price=float(purchase_data['price']),
+                    shipping_cost=float(purchase_data.get('shipping_cost', 0)),
+                    quantity=int(purchase_data.get('quantity', 1)),
+                    subteam=purchase_data['subteam'],
+                    subproject=purchase_data.get('subproject', ''),
+                    purpose=purchase_data.get('purpose', ''),
+                    notes=purchase_data.get('notes', ''),
+                    requester_name=purchase_data['requester_name'],
+                    requester_email=purchase_data['requester_email'],
+                    urgency=UrgencyLevel(purchase_data.get('urgency', 'Neither')),
+                    user_id=user.id
+                )
+                
+                db.session.add(purchase)
+                mark_purchases_changed(db.session)
+                db.session.flush()
+                
+                # Queue approval notification in the same transaction
+                self._send_approval_notification(purchase)
             
             result['success'] = True
             result['message'] = 'Purchase order created successfully'
@@ -59,84 +79,150 @@ class PurchaseService:
             current_app.logger.info(f'Purchase created: {purchase.id} by user {user.email}')
             
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Failed to create purchase: {str(e)}'
             current_app.logger.error(f'Purchase creation failed: {str(e)}')
         
         return result
     
-    def get_purchases_for_user(self, user: User, filters: Dict[str, Any] = None) -> List[Purchase]:
-        """Get purchases based on user role and filters"""
-        query = Purchase.query
-        
+    def build_purchase_query(self, user: User, filters: Dict[str, Any] = None):
+        """Build the role-scoped, filtered purchase query (unordered)"""
         # Apply role-based filtering
-        if user.is_requester():
-            query = query.filter_by(user_id=user.id)
-        elif user.is_sublead():
-            # Subleads can see their team's orders (this could be enhanced with team mapping)
-            query = query.filter(
-                or_(
-                    Purchase.user_id == user.id,
-                    Purchase.approval_status == ApprovalStatus.PENDING_SUBLEAD
-                )
-            )
-        # Executives and business users can see all orders
+        query = scope_purchases(Purchase.query, user)
         
         # Apply filters
         if filters:
-            if filters.get('status'):
-                query = query.filter_by(status=PurchaseStatus(filters['status']))
-            
-            if filters.get('approval_status'):
-                query = query.filter_by(approval_status=ApprovalStatus(filters['approval_status']))
-            
-            if filters.get('subteam'):
-                query = query.filter_by(subteam=filters['subteam'])
+            # field[op]=value conditions; see app.filters
+            where = filters.get('where')
+            if where is None:
+                where = PurchaseFilter.from_args(filters)
+            if where:
+                query = query.filter(*where.clauses())
             
             if filters.get('include_deleted') is False:
                 query = query.filter_by(is_deleted=False)
             
             if filters.get('search'):
-                search_term = f"%{filters['search']}%"
-                query = query.filter(
-                    or_(
-                        Purchase.item_name.ilike(search_term),
-                        Purchase.vendor_name.ilike(search_term),
-                        Purchase.requester_name.ilike(search_term)
-                    )
-                )
+                query = self.search_service.apply(query, filters['search'])
+        
+        return query
+    
+    # sort= keys; a leading '-' sorts descending. Each has an index on (key, id).
+    SORT_COLUMNS = {
+        'created_at': Purchase.created_at,
+        'total_cost': Purchase.total_cost,
+    }
+    DEFAULT_SORT = '-created_at'
+    
+    def _sort(self, filters: Dict[str, Any] = None):
+        """Sort column and direction requested by the filters"""
+        sort = (filters or {}).get('sort') or self.DEFAULT_SORT
+        column = self.SORT_COLUMNS.get(sort.lstrip('-'))
+        if column is None:
+            raise ValueError(f'Unknown sort: {sort}; use one of {", ".join(self.SORT_COLUMNS)}')
+        return sort, column, sort.startswith('-')
+    
+    def _ordering(self, filters: Dict[str, Any] = None, ranked: bool = True) -> list:
+        """ORDER BY clauses: relevance first when searching, then the sort key and id"""
+        _, column, descending = self._sort(filters)
+        if descending:
+            order = [column.desc(), Purchase.id.desc()]
+        else:
+            order = [column.asc(), Purchase.id.asc()]
+        if ranked and filters and filters.get('search'):
+            rank = self.search_service.rank(filters['search'])
+            if rank is not None:
+                order.insert(0, rank)
+        return order
+    
+    def get_purchases_for_user(self, user: User, filters: Dict[str, Any] = None) -> List[Purchase]:
+        """Get purchases based on user role and filters"""
+        query = self.build_purchase_query(user, filters)
+        return query.order_by(*self._ordering(filters)).all()
+    
+    def get_purchases_page(self, user: User, filters: Dict[str, Any] = None, per_page: int = 20,
+                           cursor: str = None, page: int = None, include_total: bool = False,
+                           columns: list = None) -> Dict[str, Any]:
+        """Get one page of purchases with the LIMIT pushed down into SQL.
+        
+        Keyset mode (the default) seeks past ``cursor`` on ``(sort key, id)``
+        and returns an opaque ``next_cursor``; the total is only counted when
+        ``include_total`` is set. Passing ``page`` selects the legacy offset
+        mode, which always reports ``total`` and ``pages`` and, when
+        searching, orders by relevance.
+        
+        With ``columns`` the page is returned as projected rows of just those
+        columns instead of ORM objects; ``id`` must be among them for cursors
+        to work, and the sort column is added when missing.
+        """
+        query = self.build_purchase_query(user, filters)
+        sort, sort_column, descending = self._sort(filters)
+        if columns and not any(column is sort_column for column in columns):
+            columns = list(columns) + [sort_column]
+        
+        if page is not None and cursor is None:
+            ordered = query.order_by(*self._ordering(filters))
+            if columns:
+                ordered = ordered.with_entities(*columns)
+            purchases = ordered.offset((page - 1) * per_page).limit(per_page).all()
+            total = self._count(query)
+            return {
+                'purchases': purchases,
+                'pagination': {
+                    'mode': 'offset',
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total,
+                    'pages': (total + per_page - 1) // per_page
+                }
+            }
+        
+        ordered = query.order_by(*self._ordering(filters, ranked=False))
+        if cursor:
+            last_value, last_id = _decode_cursor(cursor, sort)
+            position = tuple_(sort_column, Purchase.id)
+            boundary = tuple_(last_value, last_id)
+            ordered = ordered.filter(position < boundary if descending else position > boundary)
+        if columns:
+            ordered = ordered.with_entities(*columns)
+        
+        # Fetch one extra row to learn whether another page exists
+        rows = ordered.limit(per_page + 1).all()
+        purchases = rows[:per_page]
+        has_more = len(rows) > per_page
+        
+        pagination = {
+            'mode': 'cursor',
+            'per_page': per_page,
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(purchases[-1], sort) if has_more else None
+        }
+        if include_total:
+            pagination['total'] = self._count(query)
         
-        return query.order_by(Purchase.created_at.desc()).all()
+        return {'purchases': purchases, 'pagination': pagination}
+    
+    @staticmethod
+    def _count(query) -> int:
+        """Count rows for a query without wrapping it in a subquery"""
+        return query.order_by(None).with_entities(func.count(Purchase.id)).scalar()
     
     def approve_purchase(self, purchase_id: int, approver: User, reason: str = None) -> Dict[str, Any]:
         """Approve a purchase order"""
-        result = {'success': False, 'message': ''}
+        result = {'success': False, 'message': '', 'conflict': False}
         
-        purchase = Purchase.query.get(purchase_id)
-        if not purchase:
-            result['message'] = 'Purchase not found'
+        transition = self._approval_transition(approver)
+        if transition is None:
+            result['message'] = 'Not authorized to approve this purchase'
             return result
         
         try:
-            if approver.is_sublead() and purchase.approval_status == ApprovalStatus.PENDING_SUBLEAD:
-                purchase.approve_by_sublead(approver.email)
-                
-                # Send notification to requester
-                self.email_service.send_approval_status_notification(purchase, 'approved')
-                
-                # If needs executive approval, send notification to executive
-                if purchase.approval_status == ApprovalStatus.PENDING_EXECUTIVE:
-                    self._send_executive_approval_notification(purchase)
+            with unit_of_work():
+                changed = Purchase.compare_and_set([purchase_id], *transition)
+                if not changed:
+                    return self._single_failure(result, purchase_id, approver,
+                                                lambda purchase: 'Not authorized to approve this purchase')
                 
-            elif approver.is_executive() and purchase.approval_status == ApprovalStatus.PENDING_EXECUTIVE:
-                purchase.approve_by_executive(approver.email)
-                
-                # Send notification to requester
-                self.email_service.send_approval_status_notification(purchase, 'approved')
-                
-            else:
-                result['message'] = 'Not authorized to approve this purchase'
-                return result
+                self._notify_approval(changed[0])
             
             result['success'] = True
             result['message'] = 'Purchase approved successfully'
@@ -144,30 +230,153 @@ class PurchaseService:
             current_app.logger.info(f'Purchase {purchase_id} approved by {approver.email}')
             
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Failed to approve purchase: {str(e)}'
             current_app.logger.error(f'Purchase approval failed: {str(e)}')
         
         return result
     
-    def reject_purchase(self, purchase_id: int, rejector: User, reason: str = None) -> Dict[str, Any]:
-        """Reject a purchase order"""
-        result = {'success': False, 'message': ''}
+    @staticmethod
+    def _approval_transition(approver: User):
+        """Expected state and new values for the approval stage the approver acts on"""
+        if approver.is_sublead():
+            expected, values = Purchase.sublead_approval(approver.email)
+        elif approver.is_executive():
+            expected, values = Purchase.executive_approval(approver.email)
+        else:
+            return None
+        return scope_condition(expected, approver), values
+    
+    @staticmethod
+    def _rejection_transition(rejector: User, reason: str = None):
+        """Expected state and new values for a rejection, limited to purchases the rejector may see"""
+        expected, values = Purchase.rejection(reason)
+        return scope_condition(expected, rejector), values
+    
+    def _notify_approval(self, purchase: Purchase) -> None:
+        """Queue the notifications for an approved purchase; the caller commits"""
+        # Send notification to requester
+        self.email_service.send_approval_status_notification(purchase, 'approved')
         
-        purchase = Purchase.query.get(purchase_id)
-        if not purchase:
+        # If needs executive approval, send notification to executive
+        if purchase.approval_status == ApprovalStatus.PENDING_EXECUTIVE:
+            self._send_executive_approval_notification(purchase)
+    
+    def _single_failure(self, result: Dict[str, Any], purchase_id: int, user: User, explain) -> Dict[str, Any]:
+        """Fill in why a compare-and-set on one purchase matched no row"""
+        # Purchases outside the user's scope are reported as not found, as by GET
+        purchase = scope_purchases(Purchase.query.filter(Purchase.id == purchase_id), user).first()
+        if purchase is None:
             result['message'] = 'Purchase not found'
+        else:
+            result['message'] = explain(purchase)
+            result['conflict'] = True
+        return result
+    
+    def bulk_approve_purchases(self, purchase_ids: List[int], approver: User) -> Dict[str, Any]:
+        """Approve many purchases with one conditional UPDATE and one commit"""
+        transition = self._approval_transition(approver)
+        if transition is None:
+            return {'success': False, 'message': 'Not authorized to approve purchases', 'results': []}
+        
+        return self._bulk_transition(
+            purchase_ids, approver, 'approve', transition,
+            notify=self._notify_approval,
+            explain=lambda purchase: 'Not authorized to approve this purchase',
+            done='Purchase approved successfully',
+            summary='approved'
+        )
+    
+    def bulk_reject_purchases(self, purchase_ids: List[int], rejector: User, reason: str = None) -> Dict[str, Any]:
+        """Reject many purchases with one conditional UPDATE and one commit"""
+        if not rejector.can_approve_orders():
+            return {'success': False, 'message': 'Not authorized to reject purchases', 'results': []}
+        
+        return self._bulk_transition(
+            purchase_ids, rejector, 'reject', self._rejection_transition(rejector, reason),
+            notify=lambda purchase: self.email_service.send_approval_status_notification(purchase, 'rejected', reason),
+            explain=lambda purchase: 'Purchase is already rejected',
+            done='Purchase rejected successfully',
+            summary='rejected'
+        )
+    
+    def _bulk_transition(self, purchase_ids: List[int], user: User, action: str, transition, notify, explain,
+                         done: str, summary: str, before=None, after=None) -> Dict[str, Any]:
+        """Apply one transition to a batch of purchases and report per id
+        
+        A single UPDATE ... WHERE id IN (...) AND <expected state> RETURNING
+        moves every purchase still in the expected state. Only when some
+        ids did not match is one more query run to explain why.
+        """
+        result = {'success': False, 'message': '', 'results': [], 'succeeded': 0, 'failed': 0}
+        
+        ids = list(dict.fromkeys(purchase_ids))
+        limit = current_app.config.get('BULK_ACTION_MAX_ITEMS', 200)
+        if not ids:
+            result['message'] = 'No purchase ids provided'
+            return result
+        if len(ids) > limit:
+            result['message'] = f'At most {limit} purchases per request'
             return result
         
+        try:
+            # One transaction for every transition and its queued notifications
+            with unit_of_work():
+                if before:
+                    before(ids)
+                changed = Purchase.compare_and_set(ids, *transition)
+                for purchase in changed:
+                    notify(purchase)
+                if after and changed:
+                    after(changed)
+                # Read before the commit expires the instances
+                statuses = {purchase.id: purchase.approval_status.value for purchase in changed}
+                
+                errors = {}
+                missed = [purchase_id for purchase_id in ids if purchase_id not in statuses]
+                if missed:
+                    missing = scope_purchases(Purchase.query.filter(Purchase.id.in_(missed)), user)
+                    found = {purchase.id: purchase for purchase in missing}
+                    errors = {
+                        purchase_id: explain(found[purchase_id]) if purchase_id in found else 'Purchase not found'
+                        for purchase_id in missed
+                    }
+            
+        except Exception as e:
+            result['message'] = f'Failed to {action} purchases: {str(e)}'
+            current_app.logger.error(f'Bulk {action} failed: {str(e)}')
+            return result
+        
+        result['results'] = [
+            {'id': purchase_id, 'success': True, 'message': done, 'approval_status': statuses[purchase_id]}
+            if purchase_id in statuses else
+            {'id': purchase_id, 'success': False, 'message': errors[purchase_id]}
+            for purchase_id in ids
+        ]
+        result['succeeded'] = len(changed)
+        result['failed'] = len(ids) - len(changed)
+        result['success'] = bool(changed)
+        result['message'] = f'{len(changed)} of {len(ids)} purchases {summary}'
+        
+        current_app.logger.info(f'Bulk {action} by {user.email}: {len(changed)} succeeded, {result["failed"]} failed')
+        return result
+    
+    def reject_purchase(self, purchase_id: int, rejector: User, reason: str = None) -> Dict[str, Any]:
+        """Reject a purchase order"""
+        result = {'success': False, 'message': '', 'conflict': False}
+        
         if not rejector.can_approve_orders():
             result['message'] = 'Not authorized to reject purchases'
             return result
         
         try:
-            purchase.reject(reason)
-            
-            # Send notification to requester
-            self.email_service.send_approval_status_notification(purchase, 'rejected', reason)
+            with unit_of_work():
+                changed = Purchase.compare_and_set([purchase_id], *self._rejection_transition(rejector, reason))
+                if not changed:
+                    return self._single_failure(result, purchase_id, rejector,
+                                                lambda purchase: 'Purchase is already rejected')
+                
+                # Send notification to requester
+                self.email_service.send_approval_status_notification(changed[0], 'rejected', reason)
             
             result['success'] = True
             result['message'] = 'Purchase rejected successfully'
@@ -175,44 +384,62 @@ class PurchaseService:
             current_app.logger.info(f'Purchase {purchase_id} rejected by {rejector.email}')
             
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Failed to reject purchase: {str(e)}'
             current_app.logger.error(f'Purchase rejection failed: {str(e)}')
         
         return result
     
+    # Statuses the business team can set in bulk, by API value
+    BULK_STATUSES = {
+        status.value: status
+        for status in (PurchaseStatus.PURCHASED, PurchaseStatus.SHIPPED, PurchaseStatus.ARRIVED)
+    }
+    
     def update_purchase_status(self, purchase_id: int, new_status: str, user: User, **kwargs) -> Dict[str, Any]:
         """Update purchase status"""
-        result = {'success': False, 'message': ''}
-        
-        purchase = Purchase.query.get(purchase_id)
-        if not purchase:
-            result['message'] = 'Purchase not found'
-            return result
+        result = {'success': False, 'message': '', 'conflict': False}
         
         if not user.can_manage_orders():
             result['message'] = 'Not authorized to update purchase status'
             return result
         
+        target = self.BULK_STATUSES.get(new_status)
+        if target is None:
+            result['message'] = f'Invalid status: {new_status}'
+            return result
+        
+        photo_filename = kwargs.get('photo_filename') if target == PurchaseStatus.ARRIVED else None
+        
         try:
-            old_status = purchase.status.value
-            
-            if new_status == 'Purchased':
-                purchase.mark_as_purchased()
-            elif new_status == 'Shipped':
-                purchase.mark_as_shipped()
-            elif new_status == 'Arrived':
-                photo_filename = kwargs.get('photo_filename')
-                purchase.mark_as_arrived(photo_filename)
+            with unit_of_work():
+                old_photo = None
+                if photo_filename:
+                    # The replaced photo's reference is released, so read it first
+                    old_photo = db.session.query(Purchase.arrival_photo).filter(
+                        Purchase.id == purchase_id, Purchase.fulfillment_guard(target)
+                    ).scalar()
                 
-                # Send arrival notification
-                self.email_service.send_arrival_notification(purchase)
-            else:
-                result['message'] = f'Invalid status: {new_status}'
-                return result
-            
-            # Send status update notification
-            self.email_service.send_status_update_notification(purchase, old_status, new_status)
+                # The expected state is checked in the UPDATE itself
+                old_status = Purchase.PREVIOUS_STATUS[target].value
+                changed = Purchase.compare_and_set([purchase_id], *Purchase.fulfillment(target, photo_filename))
+                if not changed:
+                    return self._single_failure(
+                        result, purchase_id, user,
+                        lambda purchase: purchase.fulfillment_error(target) or 'Purchase was changed by another request'
+                    )
+                purchase = changed[0]
+                
+                if photo_filename and photo_filename != old_photo:
+                    if old_photo:
+                        StoredFile.release(Purchase.ARRIVAL_PHOTO_FOLDER, old_photo)
+                    StoredFile.acquire(Purchase.ARRIVAL_PHOTO_FOLDER, photo_filename)
+                
+                if target == PurchaseStatus.ARRIVED:
+                    # Send arrival notification
+                    self.email_service.send_arrival_notification(purchase)
+                
+                # Send status update notification
+                self.email_service.send_status_update_notification(purchase, old_status, new_status)
             
             result['success'] = True
             result['message'] = f'Purchase status updated to {new_status}'
@@ -221,13 +448,58 @@ class PurchaseService:
             
         except ValueError as e:
             result['message'] = str(e)
+            result['conflict'] = isinstance(e, TransitionConflict)
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Failed to update status: {str(e)}'
             current_app.logger.error(f'Status update failed: {str(e)}')
         
         return result
     
+    def bulk_update_purchase_status(self, purchase_ids: List[int], new_status: str, user: User,
+                                    photo_filename: str = None) -> Dict[str, Any]:
+        """Move many purchases to one fulfillment status in a single transaction"""
+        if not user.can_manage_orders():
+            return {'success': False, 'message': 'Not authorized to update purchase status', 'results': []}
+        
+        target = self.BULK_STATUSES.get(new_status)
+        if target is None:
+            return {'success': False, 'message': f'Invalid status: {new_status}', 'results': []}
+        
+        # Every row that moves was in the expected state, so they share the old status
+        old_status = Purchase.PREVIOUS_STATUS[target].value
+        old_photos = {}
+        
+        def read_old_photos(ids):
+            # Photos being replaced, so their references can be released
+            old_photos.update(db.session.query(Purchase.id, Purchase.arrival_photo).filter(
+                Purchase.id.in_(ids), Purchase.fulfillment_guard(target)
+            ))
+        
+        def notify(purchase):
+            if target == PurchaseStatus.ARRIVED:
+                self.email_service.send_arrival_notification(purchase)
+            self.email_service.send_status_update_notification(purchase, old_status, new_status)
+        
+        def swap_photos(changed):
+            replaced = [old_photos.get(purchase.id) for purchase in changed]
+            for photo in replaced:
+                if photo and photo != photo_filename:
+                    StoredFile.release(Purchase.ARRIVAL_PHOTO_FOLDER, photo)
+            added = sum(1 for photo in replaced if photo != photo_filename)
+            if added:
+                StoredFile.acquire(Purchase.ARRIVAL_PHOTO_FOLDER, photo_filename, added)
+        
+        with_photo = target == PurchaseStatus.ARRIVED and photo_filename
+        return self._bulk_transition(
+            purchase_ids, user, 'update', Purchase.fulfillment(target, photo_filename),
+            notify=notify,
+            explain=lambda purchase: purchase.fulfillment_error(target) or 'Purchase was modified by another request',
+            done=f'Purchase status updated to {new_status}',
+            summary=f'updated to {new_status}',
+            before=read_old_photos if with_photo else None,
+            after=swap_photos if with_photo else None
+        )
+    
     def delete_purchase(self, purchase_id: int, user: User) -> Dict[str, Any]:
         """Soft delete a purchase"""
         result = {'success': False, 'message': ''}
@@ -243,7 +515,8 @@ class PurchaseService:
             return result
         
         try:
-            purchase.soft_delete()
+            with unit_of_work():
+                purchase.soft_delete()
             
             result['success'] = True
             result['message'] = 'Purchase deleted successfully'
@@ -251,7 +524,6 @@ class PurchaseService:
             current_app.logger.info(f'Purchase {purchase_id} deleted by {user.email}')
             
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Failed to delete purchase: {str(e)}'
             current_app.logger.error(f'Purchase deletion failed: {str(e)}')
         
@@ -271,7 +543,8 @@ class PurchaseService:
             return result
         
         try:
-            purchase.restore()
+            with unit_of_work():
+                purchase.restore()
             
             result['success'] = True
             result['message'] = 'Purchase restored successfully'
@@ -279,58 +552,111 @@ class PurchaseService:
             current_app.logger.info(f'Purchase {purchase_id} restored by {user.email}')
             
         except Exception as e:
-            db.session.rollback()
             result['message'] = f'Failed to restore purchase: {str(e)}'
             current_app.logger.error(f'Purchase restoration failed: {str(e)}')
         
         return result
     
     def get_purchase_statistics(self, user: User = None) -> Dict[str, Any]:
-        """Get purchase statistics"""
-        query = Purchase.query.filter_by(is_deleted=False)
-        
-        if user and user.is_requester():
-            query = query.filter_by(user_id=user.id)
-        
-        total_orders = query.count()
-        pending_approval = query.filter(
-            Purchase.approval_status.in_([
-                ApprovalStatus.PENDING_SUBLEAD,
-                ApprovalStatus.PENDING_EXECUTIVE
-            ])
-        ).count()
-        
-        approved_orders = query.filter_by(approval_status=ApprovalStatus.FULLY_APPROVED).count()
-        purchased_orders = query.filter_by(status=PurchaseStatus.PURCHASED).count()
-        shipped_orders = query.filter_by(status=PurchaseStatus.SHIPPED).count()
-        arrived_orders = query.filter_by(status=PurchaseStatus.ARRIVED).count()
-        
-        # Calculate total value
-        total_value = db.session.query(
-            db.func.sum(Purchase.price + Purchase.shipping_cost)
-        ).filter_by(is_deleted=False).scalar() or 0
-        
-        return {
-            'total_orders': total_orders,
-            'pending_approval': pending_approval,
-            'approved_orders': approved_orders,
-            'purchased_orders': purchased_orders,
-            'shipped_orders': shipped_orders,
-            'arrived_orders': arrived_orders,
-            'total_value': float(total_value)
+        """Get purchase statistics, cached per visibility scope"""
+        scope = scope_key(user) if user else ('all',)
+        return purchase_cache.get_or_set(
+            ('statistics', scope),
+            lambda: self._compute_purchase_statistics(user)
+        )
+    
+    # Facet name -> column counted per value
+    FACETS = {
+        'status': Purchase.status,
+        'approval_status': Purchase.approval_status,
+        'subteam': Purchase.subteam,
+        'urgency': Purchase.urgency,
+    }
+    
+    def get_purchase_facets(self, user: User, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Get per-value counts of each facet for a filtered list, cached per scope and filter"""
+        filters = dict(filters or {})
+        if filters.get('where') is None:
+            filters['where'] = PurchaseFilter.from_args(filters)
+        key = (
+            'facets',
+            scope_key(user),
+            filters['where'].key(),
+            filters.get('search') or '',
+            filters.get('include_deleted') is False
+        )
+        return purchase_cache.get_or_set(key, lambda: self._compute_purchase_facets(user, filters))
+    
+    def _compute_purchase_facets(self, user: User, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Compute every facet with one query grouped by all facet columns"""
+        columns = list(self.FACETS.values())
+        query = self.build_purchase_query(user, filters).with_entities(*columns, func.count(Purchase.id))
+        
+        facets = {
+            name: {member.value: 0 for member in column.type.enum_class} if isinstance(column.type, db.Enum) else {}
+            for name, column in self.FACETS.items()
+        }
+        total = 0
+        
+        # Each row is one combination of facet values; roll them up per facet in Python
+        for *values, count in query.group_by(*columns):
+            total += count
+            for name, value in zip(self.FACETS, values):
+                value = getattr(value, 'value', value)
+                facets[name][value] = facets[name].get(value, 0) + count
+        
+        return {'total': total, 'facets': facets}
+    
+    def _compute_purchase_statistics(self, user: User = None) -> Dict[str, Any]:
+        """Compute statistics and breakdowns with a single grouped query"""
+        pending = Purchase.approval_status.in_([
+            ApprovalStatus.PENDING_SUBLEAD,
+            ApprovalStatus.PENDING_EXECUTIVE
+        ])
+        
+        query = db.session.query(
+            Purchase.subteam,
+            Purchase.status,
+            func.count(Purchase.id),
+            func.count(Purchase.id).filter(pending),
+            func.count(Purchase.id).filter(Purchase.approval_status == ApprovalStatus.FULLY_APPROVED),
+            func.sum(Purchase.total_cost)
+        ).filter(Purchase.is_deleted == False)  # noqa: E712
+        
+        if user:
+            query = scope_purchases(query, user)
+        
+        stats = {
+            'total_orders': 0,
+            'pending_approval': 0,
+            'approved_orders': 0,
+            'total_value': 0.0,
+            'by_status': {status.value: 0 for status in PurchaseStatus},
+            'by_subteam': {}
         }
+        
+        # Each row is one (subteam, status) group; roll them up in Python
+        for subteam, status, count, pending_count, approved_count, total in \
+                query.group_by(Purchase.subteam, Purchase.status):
+            total = float(total or 0)
+            stats['total_orders'] += count
+            stats['pending_approval'] += pending_count
+            stats['approved_orders'] += approved_count
+            stats['total_value'] += total
+            stats['by_status'][status.value] += count
+            
+            team = stats['by_subteam'].setdefault(subteam, {'total_orders': 0, 'total_value': 0.0})
+            team['total_orders'] += count
+            team['total_value'] += total
+        
+        stats['purchased_orders'] = stats['by_status'][PurchaseStatus.PURCHASED.value]
+        stats['shipped_orders'] = stats['by_status'][PurchaseStatus.SHIPPED.value]
+        stats['arrived_orders'] = stats['by_status'][PurchaseStatus.ARRIVED.value]
+        return stats
     
     def _send_approval_notification(self, purchase: Purchase) -> None:
         """Send approval notification to appropriate approver"""
-        # This is a simplified version - in production, you'd have a proper mapping
-        # of subteams to sublead emails
-        sublead_emails = {
-            'MechE Structures': 'sublead1@mit.edu',
-            'Electrical': 'sublead2@mit.edu',
-            # Add more mappings
-        }
-        
-        sublead_email = sublead_emails.get(purchase.subteam)
+        sublead_email = self.SUBLEAD_EMAILS.get(purchase.subteam)
         if sublead_email:
             self.email_service.send_approval_notification(purchase, sublead_email, 'sublead')
     
@@ -341,3 +667,24 @@ class PurchaseService:
         
         for exec_email in exec_emails:
             self.email_service.send_approval_notification(purchase, exec_email, 'executive')
+
+
+def _encode_cursor(purchase, sort: str) -> str:
+    """Encode the keyset position of a purchase (or projected row) under a sort as an opaque cursor"""
+    key = sort.lstrip('-')
+    value = getattr(purchase, key)
+    payload = json.dumps([sort, value.isoformat() if key == 'created_at' else str(value), purchase.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str, sort: str):
+    """Decode a cursor produced by ``_encode_cursor`` for the same sort"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if cursor_sort != sort:
+            raise ValueError
+        value = datetime.fromisoformat(value) if sort.lstrip('-') == 'created_at' else Decimal(value)
+        return value, int(last_id)
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise ValueError('Invalid pagination cursor') from e
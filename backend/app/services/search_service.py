@@ -0,0 +1,144 @@
+"""
+Full-text search service for purchases
+"""
+import re
+from typing import List, Optional
+from flask import current_app
+from sqlalchemy import or_, func, text, literal_column, table, column, inspect
+
+from ..models import Purchase
+from ..models.base import db
+
+
+FTS_TABLE = 'purchases_fts'
+PG_INDEX = 'idx_purchase_search'
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        item_name, vendor_name, requester_name,
+        content='purchases', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON purchases BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, item_name, vendor_name, requester_name)
+        VALUES (new.id, new.item_name, new.vendor_name, new.requester_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON purchases BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, vendor_name, requester_name)
+        VALUES ('delete', old.id, old.item_name, old.vendor_name, old.requester_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF item_name, vendor_name, requester_name ON purchases BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, vendor_name, requester_name)
+        VALUES ('delete', old.id, old.item_name, old.vendor_name, old.requester_name);
+        INSERT INTO {FTS_TABLE}(rowid, item_name, vendor_name, requester_name)
+        VALUES (new.id, new.item_name, new.vendor_name, new.requester_name);
+    END""",
+]
+
+_PG_DOCUMENT = "coalesce(item_name, '') || ' ' || coalesce(vendor_name, '') || ' ' || coalesce(requester_name, '')"
+
+_PG_CONFIG = literal_column("'simple'")
+
+_fts = table(FTS_TABLE, column('rowid'))
+
+
+class SearchService:
+    """Service for indexed, ranked prefix search over purchases.
+
+    PostgreSQL uses a GIN index on a ``to_tsvector`` expression, which the
+    database keeps current on every write. SQLite uses an FTS5 external
+    content table maintained by triggers, so ORM and bulk Core writes stay
+    in sync alike. When no index is available the service falls back to
+    the original ``ILIKE`` scan.
+    """
+
+    def __init__(self):
+        self._fts_available = {}
+
+    def install(self) -> None:
+        """Create (or rebuild) the search index for the current database"""
+        dialect = db.engine.dialect.name
+
+        if dialect == 'sqlite':
+            for statement in _SQLITE_DDL:
+                db.session.execute(text(statement))
+            # Populate the index from rows written before it existed
+            db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        elif dialect == 'postgresql':
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON purchases "
+                f"USING GIN (to_tsvector('simple', {_PG_DOCUMENT}))"
+            ))
+
+        db.session.commit()
+        self._fts_available.pop(db.engine.url, None)
+
+    def apply(self, query, search: str):
+        """Restrict a purchase query to rows matching the search string"""
+        terms = self._tokenize(search)
+        dialect = db.engine.dialect.name
+
+        if terms and dialect == 'postgresql':
+            return query.filter(self._pg_document().op('@@')(self._pg_query(terms)))
+
+        if terms and dialect == 'sqlite' and self._has_fts_table():
+            return query.join(_fts, _fts.c.rowid == Purchase.id).filter(
+                literal_column(FTS_TABLE).op('MATCH')(self._fts_query(terms))
+            )
+
+        search_term = f"%{search}%"
+        return query.filter(
+            or_(
+                Purchase.item_name.ilike(search_term),
+                Purchase.vendor_name.ilike(search_term),
+                Purchase.requester_name.ilike(search_term)
+            )
+        )
+
+    def rank(self, search: str) -> Optional[object]:
+        """ORDER BY expression putting the best matches first.
+
+        Only valid on a query that went through ``apply`` with the same
+        search string; returns ``None`` when results cannot be ranked.
+        """
+        terms = self._tokenize(search)
+        dialect = db.engine.dialect.name
+
+        if terms and dialect == 'postgresql':
+            return func.ts_rank(self._pg_document(), self._pg_query(terms)).desc()
+
+        if terms and dialect == 'sqlite' and self._has_fts_table():
+            # bm25() scores are negative; lower means more relevant
+            return func.bm25(literal_column(FTS_TABLE)).asc()
+
+        return None
+
+    @staticmethod
+    def _tokenize(search: str) -> List[str]:
+        """Split a search string into index-safe word tokens"""
+        return re.findall(r'\w+', (search or '').lower())
+
+    @staticmethod
+    def _fts_query(terms: List[str]) -> str:
+        """Build an FTS5 MATCH expression: every term, prefix-matched"""
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def _pg_query(terms: List[str]):
+        """Build a tsquery requiring every term, prefix-matched"""
+        return func.to_tsquery(_PG_CONFIG, ' & '.join(f'{term}:*' for term in terms))
+
+    @staticmethod
+    def _pg_document():
+        """The indexed tsvector expression; must match the index definition"""
+        return func.to_tsvector(_PG_CONFIG, literal_column(_PG_DOCUMENT))
+
+    def _has_fts_table(self) -> bool:
+        """Check (once per database) whether the FTS5 table is installed"""
+        url = db.engine.url
+        if url not in self._fts_available:
+            self._fts_available[url] = inspect(db.engine).has_table(FTS_TABLE)
+            if not self._fts_available[url]:
+                current_app.logger.warning('Search index not installed; falling back to ILIKE search')
+        return self._fts_available[url]
@@ -0,0 +1,118 @@
+"""
+Signed access/refresh token service
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+import jwt
+from flask import current_app
+
+from ..models import User, UserRole
+from .auth_service import AuthService
+
+
+class TokenService:
+    """Service for issuing and verifying JWT access and refresh tokens
+
+    Access tokens carry the user id, role and permissions, so a request
+    bearing one is authorized without a database lookup. The trade-off is
+    that a role change or deactivation only takes effect once the access
+    token expires (JWT_ACCESS_TOKEN_EXPIRES). Refresh tokens are checked
+    against the database and stop working when the password changes.
+    """
+
+    ACCESS = 'access'
+    REFRESH = 'refresh'
+
+    @staticmethod
+    def issue_tokens(user: User) -> Dict[str, Any]:
+        """Issue an access token and a refresh token for a user"""
+        config = current_app.config
+        return {
+            'access_token': TokenService._encode(user, TokenService.ACCESS, config['JWT_ACCESS_TOKEN_EXPIRES'], {
+                'email': user.email,
+                'name': user.full_name,
+                'role': user.role.value,
+                'perms': AuthService.get_user_permissions(user)
+            }),
+            'refresh_token': TokenService._encode(user, TokenService.REFRESH, config['JWT_REFRESH_TOKEN_EXPIRES'], {
+                'ver': TokenService._password_version(user)
+            }),
+            'token_type': 'Bearer',
+            'expires_in': int(config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+        }
+
+    @staticmethod
+    def refresh(refresh_token: str) -> Dict[str, Any]:
+        """Exchange a refresh token for a new token pair"""
+        result = {'success': False, 'message': '', 'tokens': None, 'user': None}
+
+        try:
+            claims = TokenService.decode(refresh_token, TokenService.REFRESH)
+        except jwt.ExpiredSignatureError:
+            result['message'] = 'Refresh token expired'
+            return result
+        except jwt.InvalidTokenError:
+            result['message'] = 'Invalid refresh token'
+            return result
+
+        user = User.get_cached(int(claims['sub']))
+        if not user or not user.is_active or claims.get('ver') != TokenService._password_version(user):
+            result['message'] = 'Invalid refresh token'
+            return result
+
+        result['success'] = True
+        result['message'] = 'Token refreshed'
+        result['tokens'] = TokenService.issue_tokens(user)
+        result['user'] = user
+        return result
+
+    @staticmethod
+    def decode(token: str, token_type: str = ACCESS) -> Dict[str, Any]:
+        """Verify a token's signature, expiry and type; raises jwt.InvalidTokenError"""
+        config = current_app.config
+        claims = jwt.decode(
+            token,
+            config['JWT_SECRET_KEY'],
+            algorithms=[config.get('JWT_ALGORITHM', 'HS256')],
+            options={'require': ['sub', 'exp', 'typ']}
+        )
+        if claims['typ'] != token_type:
+            raise jwt.InvalidTokenError(f'Expected a {token_type} token')
+        return claims
+
+    @staticmethod
+    def user_from_request(authorization: Optional[str]) -> Optional[User]:
+        """Build the user for a request from its Bearer access token, without querying
+
+        The returned user is transient: it can be read and checked for
+        permissions, but changes to it are not saved.
+        """
+        if not authorization or not authorization.startswith('Bearer '):
+            return None
+
+        try:
+            claims = TokenService.decode(authorization[len('Bearer '):].strip(), TokenService.ACCESS)
+        except jwt.InvalidTokenError:
+            return None
+
+        return User(
+            id=int(claims['sub']),
+            email=claims['email'],
+            full_name=claims['name'],
+            role=UserRole(claims['role']),
+            is_active=True
+        )
+
+    @staticmethod
+    def _encode(user: User, token_type: str, expires, claims: Dict[str, Any]) -> str:
+        config = current_app.config
+        now = datetime.now(timezone.utc)
+        payload = {'sub': str(user.id), 'typ': token_type, 'iat': now, 'exp': now + expires, **claims}
+        return jwt.encode(payload, config['JWT_SECRET_KEY'], algorithm=config.get('JWT_ALGORITHM', 'HS256'))
+
+    @staticmethod
+    def _password_version(user: User) -> str:
+        """Short fingerprint of the password hash; changes whenever the password does"""
+        return hashlib.sha256(user.password_hash.encode()).hexdigest()[:16]
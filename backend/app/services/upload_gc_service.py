@@ -0,0 +1,214 @@
+"""
+Orphaned upload garbage collection service
+"""
+import json
+import os
+import time
+from typing import Dict, Any, Iterator, Optional, Set, Tuple
+from flask import current_app
+
+from ..models import Purchase, StoredFile
+from ..models.base import db
+from . import image_processing
+from .file_service import FileService
+
+
+class UploadGCService:
+    """Service for removing upload files that nothing references
+
+    Complements the refcount cleanup in ``FileService``: this job walks the
+    upload tree, so it also reclaims legacy uploads, files left behind by
+    crashed requests and stale temp files. The walk visits entries in a
+    fixed order, which lets a large tree be collected over several runs
+    from a checkpoint.
+    """
+
+    def __init__(self, file_service: FileService = None):
+        self.file_service = file_service or FileService()
+
+    def referenced_paths(self, subfolder: str) -> Set[str]:
+        """Paths under ``subfolder`` that are still referenced, streamed from the database"""
+        referenced = set()
+
+        if subfolder == Purchase.ARRIVAL_PHOTO_FOLDER:
+            photos = db.session.query(Purchase.arrival_photo).filter(
+                Purchase.arrival_photo.isnot(None)
+            ).execution_options(yield_per=1000)
+            referenced.update(row[0] for row in photos)
+
+        # Tracked files are reclaimed by refcount, never by the scan
+        stored = db.session.query(StoredFile.path).filter(
+            StoredFile.subfolder == subfolder
+        ).execution_options(yield_per=1000)
+        referenced.update(row[0] for row in stored)
+
+        return referenced
+
+    def collect(self, subfolder: str, grace_period: int = None, dry_run: bool = False,
+                checkpoint_path: str = None, max_files: int = None, batch_size: int = None) -> Dict[str, Any]:
+        """Delete unreferenced files under ``subfolder`` older than the grace period
+
+        With ``checkpoint_path`` the scan resumes after the last path recorded
+        there, and stops early after ``max_files`` entries so big trees can be
+        collected incrementally. A dry run only reports what would go.
+        """
+        config = current_app.config
+        grace_period = grace_period if grace_period is not None else \
+            config.get('UPLOAD_ORPHAN_GRACE_PERIOD', 24 * 3600)
+        batch_size = batch_size or config.get('UPLOAD_GC_BATCH_SIZE', 500)
+        cutoff = time.time() - grace_period
+
+        result = {
+            'subfolder': subfolder, 'scanned': 0, 'kept': 0, 'recent': 0,
+            'deleted': 0, 'bytes_reclaimed': 0, 'errors': [], 'complete': False, 'dry_run': dry_run
+        }
+        if subfolder not in FileService.COLLECTABLE_SUBFOLDERS:
+            result['errors'].append(f'Files in {subfolder} have no reference owner and are never collected')
+            result['complete'] = True
+            return result
+
+        root = os.path.join(self.file_service.upload_folder, subfolder)
+        if not os.path.isdir(root):
+            result['complete'] = True
+            return result
+
+        resume = self._load_checkpoint(checkpoint_path, subfolder)
+        referenced = self.referenced_paths(subfolder)
+        batch = []
+        last = None
+
+        for parts, entry in self._walk(root, resume):
+            if max_files is not None and result['scanned'] >= max_files:
+                break
+
+            result['scanned'] += 1
+            last = parts
+            relative = '/'.join(parts)
+
+            if self._owner_path(relative) in referenced:
+                result['kept'] += 1
+                continue
+
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError as e:
+                result['errors'].append(f'Failed to stat {relative}: {str(e)}')
+                continue
+
+            # Uploads still in flight have no reference yet
+            if stat.st_mtime > cutoff:
+                result['recent'] += 1
+                continue
+
+            batch.append((entry.path, stat.st_size))
+            if len(batch) >= batch_size:
+                self._delete_batch(batch, root, dry_run, result)
+                batch = []
+                self._save_checkpoint(checkpoint_path, subfolder, last, dry_run)
+        else:
+            result['complete'] = True
+
+        self._delete_batch(batch, root, dry_run, result)
+        if result['complete']:
+            self._save_checkpoint(checkpoint_path, subfolder, None, dry_run)
+        elif last is not None:
+            self._save_checkpoint(checkpoint_path, subfolder, last, dry_run)
+
+        current_app.logger.info(
+            f'Upload GC {subfolder}{" (dry run)" if dry_run else ""}: scanned {result["scanned"]}, '
+            f'deleted {result["deleted"]}, reclaimed {result["bytes_reclaimed"]} bytes'
+        )
+        return result
+
+    @classmethod
+    def _walk(cls, directory: str, resume: Optional[Tuple[str, ...]] = None,
+              prefix: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], os.DirEntry]]:
+        """Yield files depth-first in sorted order, skipping everything up to ``resume``
+
+        Paths are compared as tuples of components, which matches the order
+        of a sorted depth-first walk.
+        """
+        try:
+            with os.scandir(directory) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError:
+            return
+
+        for entry in entries:
+            parts = prefix + (entry.name,)
+            if entry.is_dir(follow_symlinks=False):
+                # Skip whole directories that sort before the checkpoint
+                if resume and parts < resume[:len(parts)]:
+                    continue
+                yield from cls._walk(entry.path, resume, parts)
+            elif not resume or parts > resume:
+                yield parts, entry
+
+    @staticmethod
+    def _owner_path(relative: str) -> str:
+        """Upload a thumbnail or state marker belongs to"""
+        for state in (image_processing.STATE_PROCESSING, image_processing.STATE_FAILED):
+            if relative.endswith(f'.{state}'):
+                return relative[:-len(state) - 1]
+
+        name, ext = os.path.splitext(relative)
+        if name.endswith('_thumb'):
+            return name[:-len('_thumb')] + ext
+        return relative
+
+    def _delete_batch(self, batch: list, root: str, dry_run: bool, result: Dict[str, Any]) -> None:
+        """Remove a batch of files and any directories they leave empty"""
+        for path, size in batch:
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    result['errors'].append(f'Failed to delete {path}: {str(e)}')
+                    continue
+                self._prune_empty_dirs(os.path.dirname(path), root)
+
+            result['deleted'] += 1
+            result['bytes_reclaimed'] += size
+
+    @staticmethod
+    def _prune_empty_dirs(directory: str, root: str) -> None:
+        """Remove empty directories up to, but not including, ``root``"""
+        while os.path.abspath(directory) != os.path.abspath(root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return  # Not empty
+            directory = os.path.dirname(directory)
+
+    @staticmethod
+    def _load_checkpoint(checkpoint_path: str, subfolder: str) -> Optional[Tuple[str, ...]]:
+        """Last path scanned in a previous run, if any"""
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return None
+
+        with open(checkpoint_path) as checkpoint:
+            last = json.load(checkpoint).get(subfolder)
+        return tuple(last.split('/')) if last else None
+
+    @staticmethod
+    def _save_checkpoint(checkpoint_path: str, subfolder: str, last: Optional[Tuple[str, ...]], dry_run: bool) -> None:
+        """Record progress atomically; ``None`` marks the subfolder as finished"""
+        if not checkpoint_path or dry_run:
+            return
+
+        state = {}
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint:
+                state = json.load(checkpoint)
+
+        if last is None:
+            state.pop(subfolder, None)
+        else:
+            state[subfolder] = '/'.join(last)
+
+        temp_path = f'{checkpoint_path}.tmp'
+        with open(temp_path, 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(temp_path, checkpoint_path)
@@ -0,0 +1,95 @@
+"""
+Request-scoped unit of work and commit accounting
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .models.base import db
+
+_DEPTH = 'unit_of_work_depth'
+
+
+@contextmanager
+def unit_of_work():
+    """Group the writes made inside the block into one commit
+
+    Model methods only mutate the session; the outermost unit commits
+    when its block exits and rolls back if it raises. A unit opened
+    inside another one becomes a savepoint: if it raises, only its own
+    writes are rolled back before the error propagates, and otherwise
+    they are committed together with the outer unit.
+    """
+    session = db.session()
+    depth = session.info.get(_DEPTH, 0)
+    session.info[_DEPTH] = depth + 1
+
+    try:
+        if depth:
+            _begin_sqlite_transaction(session)
+            with session.begin_nested():
+                yield session
+        else:
+            try:
+                yield session
+                session.commit()
+            except BaseException:
+                session.rollback()
+                raise
+    finally:
+        session.info[_DEPTH] = depth
+
+
+def _begin_sqlite_transaction(session) -> None:
+    """Open the transaction before a savepoint on SQLite
+
+    pysqlite only issues BEGIN ahead of DML, so a SAVEPOINT sent first
+    would start the transaction itself and its RELEASE would commit.
+    """
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+
+
+class CommitStats:
+    """Per-process count of requests and database commits by endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, list] = {}
+
+    def record(self, endpoint: str, commits: int) -> None:
+        with self._lock:
+            totals = self._endpoints.setdefault(endpoint, [0, 0])
+            totals[0] += 1
+            totals[1] += commits
+
+    def stats(self) -> Dict[str, dict]:
+        """Requests, commits and commits per request for each endpoint seen"""
+        with self._lock:
+            return {
+                endpoint: {'requests': requests, 'commits': commits,
+                           'commits_per_request': round(commits / requests, 2)}
+                for endpoint, (requests, commits) in sorted(self._endpoints.items())
+            }
+
+
+commit_stats = CommitStats()
+
+
+@event.listens_for(Engine, 'commit')
+def _count_commit(connection):
+    # Only commits made while serving a request; the background flushers have no request
+    if has_request_context():
+        g.db_commits = g.get('db_commits', 0) + 1
+
+
+def init_app(app) -> None:
+    """Record the number of commits each request made"""
+    @app.teardown_request
+    def record_commits(exc):
+        commit_stats.record(request.endpoint or 'unmatched', g.pop('db_commits', 0))
@@ -1,15 +1,23 @@
 """
 API routes for purchases and data management
 """
+import os
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 
-from ..services import PurchaseService, FileService
+from ..services import PurchaseService, FileService, AllowlistService, PurchaseImportService
 from ..models import Purchase
+from ..serializers import PurchaseListSerializer, json_response
+from ..cache import purchase_cache, user_cache
+from ..policy import scope_purchases
+from ..filters import PurchaseFilter
+from ..unit_of_work import commit_stats
 
 api_bp = Blueprint('api', __name__)
 purchase_service = PurchaseService()
 file_service = FileService()
+allowlist_service = AllowlistService()
+purchase_import_service = PurchaseImportService()
 
 
 @api_bp.route('/purchases', methods=['GET'])
@@ -17,47 +25,64 @@ file_service = FileService()
 def get_purchases():
     """Get purchases based on user role and filters"""
     # Get query parameters
-    status = request.args.get('status')
-    approval_status = request.args.get('approval_status')
-    subteam = request.args.get('subteam')
-    search = request.args.get('search')
-    include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 20))
-    
-    filters = {
-        'status': status,
-        'approval_status': approval_status,
-        'subteam': subteam,
-        'search': search,
-        'include_deleted': include_deleted
-    }
+    cursor = request.args.get('cursor')
+    page = request.args.get('page', type=int)
+    per_page = request.args.get('per_page', current_app.config.get('ITEMS_PER_PAGE', 20), type=int)
+    per_page = max(1, min(per_page, current_app.config.get('MAX_ITEMS_PER_PAGE', 100)))
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
     
     try:
-        purchases = purchase_service.get_purchases_for_user(current_user, filters)
+        filters = _list_filters()
+        filters['sort'] = request.args.get('sort')
         
-        # Pagination
-        total = len(purchases)
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_purchases = purchases[start:end]
+        serializer = PurchaseListSerializer.from_request_arg(request.args.get('fields'))
+        result = purchase_service.get_purchases_page(
+            current_user,
+            filters,
+            per_page=per_page,
+            cursor=cursor,
+            page=max(page, 1) if page is not None else None,
+            include_total=include_total,
+            columns=serializer.columns
+        )
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'purchases': [purchase.to_dict() for purchase in paginated_purchases],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'pages': (total + per_page - 1) // per_page
-            }
+            'purchases': serializer.serialize(result['purchases']),
+            'pagination': result['pagination']
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f'Failed to get purchases: {str(e)}')
         return jsonify({'success': False, 'message': 'Failed to retrieve purchases'}), 500
 
 
+@api_bp.route('/purchases/facets', methods=['GET'])
+@login_required
+def get_purchase_facets():
+    """Get counts per status, approval status, subteam and urgency for the list filters"""
+    try:
+        result = purchase_service.get_purchase_facets(current_user, _list_filters())
+        return jsonify({'success': True, **result})
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f'Failed to get purchase facets: {str(e)}')
+        return jsonify({'success': False, 'message': 'Failed to retrieve purchase facets'}), 500
+
+
+def _list_filters() -> dict:
+    """Filters shared by the purchase list and its facets, parsed from the query string"""
+    return {
+        'where': PurchaseFilter.from_args(request.args),
+        'search': request.args.get('search'),
+        'include_deleted': request.args.get('include_deleted', 'false').lower() == 'true'
+    }
+
+
 @api_bp.route('/purchases', methods=['POST'])
 @login_required
 def create_purchase():
@@ -83,15 +108,12 @@ def create_purchase():
 @login_required
 def get_purchase(purchase_id):
     """Get a specific purchase"""
-    purchase = Purchase.query.get(purchase_id)
+    # Purchases outside the user's scope are reported as not found
+    purchase = scope_purchases(Purchase.query.filter(Purchase.id == purchase_id), current_user).first()
     
     if not purchase:
         return jsonify({'success': False, 'message': 'Purchase not found'}), 404
     
-    # Check permissions
-    if current_user.is_requester() and purchase.user_id != current_user.id:
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     return jsonify({
         'success': True,
         'purchase': purchase.to_dict()
@@ -110,7 +132,7 @@ def approve_purchase(purchase_id):
     if result['success']:
         return jsonify({'success': True, 'message': result['message']})
     else:
-        return jsonify({'success': False, 'message': result['message']}), 400
+        return jsonify({'success': False, 'message': result['message']}), 409 if result['conflict'] else 400
 
 
 @api_bp.route('/purchases/<int:purchase_id>/reject', methods=['POST'])
@@ -125,7 +147,74 @@ def reject_purchase(purchase_id):
     if result['success']:
         return jsonify({'success': True, 'message': result['message']})
     else:
-        return jsonify({'success': False, 'message': result['message']}), 400
+        return jsonify({'success': False, 'message': result['message']}), 409 if result['conflict'] else 400
+
+
+@api_bp.route('/purchases/import', methods=['POST'])
+@login_required
+def import_purchases():
+    """Create purchase orders from an uploaded CSV or XLSX file"""
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'message': 'No file provided'}), 400
+    
+    file = request.files['file']
+    dry_run = request.form.get('dry_run', 'false').lower() in ['true', '1', 'yes']
+    result = purchase_import_service.import_file(file.stream, file.filename, current_user, dry_run=dry_run)
+    
+    return jsonify(result), 200 if result['success'] else 400
+
+
+@api_bp.route('/purchases/bulk-approve', methods=['POST'])
+@login_required
+def bulk_approve_purchases():
+    """Approve several purchase orders in one transaction"""
+    data = request.get_json() or {}
+    ids = data.get('ids')
+    
+    if not isinstance(ids, list) or not all(isinstance(purchase_id, int) for purchase_id in ids):
+        return jsonify({'success': False, 'message': 'ids must be a list of purchase ids'}), 400
+    
+    result = purchase_service.bulk_approve_purchases(ids, current_user)
+    
+    return jsonify(result), 200 if result['results'] else 400
+
+
+@api_bp.route('/purchases/bulk-reject', methods=['POST'])
+@login_required
+def bulk_reject_purchases():
+    """Reject several purchase orders in one transaction"""
+    data = request.get_json() or {}
+    ids = data.get('ids')
+    reason = data.get('reason', '')
+    
+    if not isinstance(ids, list) or not all(isinstance(purchase_id, int) for purchase_id in ids):
+        return jsonify({'success': False, 'message': 'ids must be a list of purchase ids'}), 400
+    
+    result = purchase_service.bulk_reject_purchases(ids, current_user, reason)
+    
+    return jsonify(result), 200 if result['results'] else 400
+
+
+@api_bp.route('/purchases/bulk-status', methods=['POST'])
+@login_required
+def bulk_update_purchase_status():
+    """Move several purchase orders to one fulfillment status"""
+    data = request.get_json() or {}
+    ids = data.get('ids')
+    
+    if not isinstance(ids, list) or not all(isinstance(purchase_id, int) for purchase_id in ids):
+        return jsonify({'success': False, 'message': 'ids must be a list of purchase ids'}), 400
+    if 'status' not in data:
+        return jsonify({'success': False, 'message': 'Status is required'}), 400
+    
+    result = purchase_service.bulk_update_purchase_status(
+        ids,
+        data['status'],
+        current_user,
+        photo_filename=data.get('photo_filename')
+    )
+    
+    return jsonify(result), 200 if result['results'] else 400
 
 
 @api_bp.route('/purchases/<int:purchase_id>/status', methods=['PUT'])
@@ -150,7 +239,7 @@ def update_purchase_status(purchase_id):
     if result['success']:
         return jsonify({'success': True, 'message': result['message']})
     else:
-        return jsonify({'success': False, 'message': result['message']}), 400
+        return jsonify({'success': False, 'message': result['message']}), 409 if result['conflict'] else 400
 
 
 @api_bp.route('/purchases/<int:purchase_id>', methods=['DELETE'])
@@ -192,6 +281,40 @@ def get_statistics():
         return jsonify({'success': False, 'message': 'Failed to retrieve statistics'}), 500
 
 
+@api_bp.route('/metrics', methods=['GET'])
+@login_required
+def get_metrics():
+    """Get in-process cache and commit metrics for this worker"""
+    if not current_user.is_executive():
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'caches': {
+            'purchases': purchase_cache.stats(),
+            'users': user_cache.stats()
+        },
+        'commits': commit_stats.stats()
+    })
+
+
+@api_bp.route('/allowlist/import', methods=['POST'])
+@login_required
+def import_allowlist():
+    """Bulk-load the registration allowlist from a CSV with email and role columns"""
+    if not current_user.is_executive():
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'message': 'No file provided'}), 400
+    
+    replace = request.form.get('replace', 'false').lower() in ['true', '1', 'yes']
+    result = allowlist_service.import_csv(request.files['file'].stream, replace=replace)
+    
+    return jsonify(result), 200 if result['success'] else 400
+
+
 @api_bp.route('/upload', methods=['POST'])
 @login_required
 def upload_file():
@@ -205,10 +328,32 @@ def upload_file():
     result = file_service.save_file(file, subfolder)
     
     if result['success']:
-        return jsonify({
+        response = {
             'success': True,
             'message': result['message'],
-            'filename': result['filename']
-        })
+            'filename': result['filename'],
+            'state': result['state']
+        }
+        if 'thumbnail' in result:
+            response['thumbnail'] = result['thumbnail']
+        # 202 while derived images are still being produced
+        return jsonify(response), 202 if result['state'] == 'processing' else 200
     else:
         return jsonify({'success': False, 'message': result['message']}), 400
+
+
+@api_bp.route('/upload/status/<path:filename>', methods=['GET'])
+@login_required
+def upload_status(filename):
+    """Report the processing state of an uploaded file"""
+    subfolder = request.args.get('subfolder', 'arrival_photos')
+    
+    if '..' in filename.split('/') or '..' in subfolder.split('/'):
+        return jsonify({'success': False, 'message': 'Invalid file path'}), 400
+    
+    status = file_service.get_processing_status(filename, subfolder)
+    if not status['exists']:
+        return jsonify({'success': False, 'message': 'File not found'}), 404
+    
+    status.pop('exists')
+    return jsonify({'success': True, **status})
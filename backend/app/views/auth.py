@@ -3,14 +3,33 @@ Authentication routes
 """
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user, logout_user
+from sqlalchemy import inspect
 
-from ..services import AuthService
+from ..services import AuthService, TokenService
 from ..models import User
+from ..passwords import PasswordHasherBusy
 
 auth_bp = Blueprint('auth', __name__)
 auth_service = AuthService()
 
 
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    """Shed logins and password changes while every password hashing slot is taken"""
+    current_app.logger.warning(f'Request rejected: {str(error)}')
+    response = jsonify({'success': False, 'message': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def _session_user() -> User:
+    """Current user attached to the database session, even when it came from an access token"""
+    user = current_user._get_current_object()
+    if inspect(user).transient:
+        return User.get_cached(user.id)
+    return user
+
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """User login endpoint"""
@@ -43,6 +62,55 @@ def login():
         return jsonify({'success': False, 'message': 'Login failed'}), 500
 
 
+@auth_bp.route('/token', methods=['POST'])
+def issue_token():
+    """Exchange credentials for an access token and a refresh token"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'success': False, 'message': 'No data provided'}), 400
+    
+    email = data.get('email', '').strip().lower()
+    password = data.get('password', '')
+    
+    if not email or not password:
+        return jsonify({'success': False, 'message': 'Email and password are required'}), 400
+    
+    user = auth_service.authenticate_user(email, password)
+    
+    if not user:
+        return jsonify({'success': False, 'message': 'Invalid email or password'}), 401
+    
+    current_app.logger.info(f'Tokens issued for {user.email}')
+    return jsonify({
+        'success': True,
+        'message': 'Login successful',
+        'user': user.to_dict(),
+        **TokenService.issue_tokens(user)
+    })
+
+
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    """Exchange a refresh token for a new token pair"""
+    data = request.get_json(silent=True) or {}
+    
+    refresh = data.get('refresh_token', '')
+    if not refresh:
+        return jsonify({'success': False, 'message': 'Refresh token is required'}), 400
+    
+    result = TokenService.refresh(refresh)
+    
+    if result['success']:
+        return jsonify({
+            'success': True,
+            'message': result['message'],
+            **result['tokens']
+        })
+    else:
+        return jsonify({'success': False, 'message': result['message']}), 401
+
+
 @auth_bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
@@ -130,7 +198,7 @@ def get_current_user():
     """Get current user information"""
     return jsonify({
         'success': True,
-        'user': current_user.to_dict()
+        'user': _session_user().to_dict()
     })
 
 
@@ -144,14 +212,16 @@ def update_profile():
         return jsonify({'success': False, 'message': 'No data provided'}), 400
     
     full_name = data.get('full_name', '').strip()
+    approval_digest = data.get('approval_digest')
     
-    result = auth_service.update_user_profile(current_user, full_name)
+    user = _session_user()
+    result = auth_service.update_user_profile(user, full_name, approval_digest)
     
     if result['success']:
         return jsonify({
             'success': True,
             'message': result['message'],
-            'user': current_user.to_dict()
+            'user': user.to_dict()
         })
     else:
         return jsonify({'success': False, 'message': result['message']}), 400
@@ -1,10 +1,16 @@
 """
 Main routes for serving the Angular frontend and basic pages
 """
-from flask import Blueprint, render_template, send_from_directory, current_app
+from flask import Blueprint, render_template, send_from_directory, current_app, request, abort
+from werkzeug.security import safe_join
+from urllib.parse import quote
+import mimetypes
 import os
 
+from ..services import FileService
+
 main_bp = Blueprint('main', __name__)
+file_service = FileService()
 
 
 @main_bp.route('/')
@@ -99,6 +105,44 @@ def health_check():
 
 @main_bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    """Serve uploaded files"""
+    """Serve uploaded files
+    
+    Content-addressed files get a strong ETag and an immutable cache
+    lifetime once processed. With UPLOAD_SERVE_MODE 'x-accel' the bytes are
+    sent by nginx; 'x-sendfile' is handled by send_file via USE_X_SENDFILE.
+    """
     upload_folder = current_app.config.get('UPLOAD_FOLDER', 'static/uploads')
-    return send_from_directory(upload_folder, filename)
+    filepath = safe_join(upload_folder, filename)
+    if filepath is None or not os.path.isfile(filepath):
+        abort(404)
+    
+    etag = file_service.immutable_etag(filename)
+    
+    if current_app.config.get('UPLOAD_SERVE_MODE') == 'x-accel':
+        mime_type, _ = mimetypes.guess_type(filename)
+        response = current_app.response_class(mimetype=mime_type or 'application/octet-stream')
+        prefix = current_app.config.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(filename)
+        if etag:
+            response.set_etag(etag)
+        else:
+            response.last_modified = os.path.getmtime(filepath)
+        _set_upload_cache_headers(response, etag)
+        # nginx serves Range requests; validators are checked here
+        return response.make_conditional(request)
+    
+    # send_file answers If-None-Match and Range requests itself
+    response = send_from_directory(upload_folder, filename, etag=etag or True)
+    _set_upload_cache_headers(response, etag)
+    return response
+
+
+def _set_upload_cache_headers(response, etag):
+    """Cache processed content-addressed uploads forever; revalidate everything else"""
+    if etag:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config.get('UPLOAD_CACHE_MAX_AGE', 31536000)
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the backend
+
+Runs against an in-memory SQLite database unless FLASK_ENV points at
+another configuration.
+
+Usage:
+    python benchmark.py serialization [--rows 5000] [--page-size 100]
+    python benchmark.py smtp [--host localhost] [--port 8025] [--recipients 1000]
+    python benchmark.py passwords [--logins 50]
+    python benchmark.py filters [--rows 20000]
+
+The smtp benchmark needs a local SMTP sink, for example:
+    python -m aiosmtpd -n -l localhost:8025
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from flask import current_app
+from sqlalchemy import event, insert
+
+from app import create_app
+from app.models.base import db
+from app.models import User, UserRole, Purchase, ApprovalStatus, PurchaseStatus, UrgencyLevel
+
+
+def seed_purchases(rows: int) -> User:
+    """Create a user and ``rows`` purchases with a spread of states"""
+    db.create_all()
+    user = User(email='bench@mit.edu', full_name='Bench User', role=UserRole.BUSINESS)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+
+    approvals = list(ApprovalStatus)
+    statuses = list(PurchaseStatus)
+    urgencies = list(UrgencyLevel)
+    start = datetime.utcnow() - timedelta(days=365)
+    batch = []
+
+    for i in range(rows):
+        created_at = start + timedelta(minutes=i)
+        batch.append({
+            'item_name': f'Item {i}',
+            'vendor_name': f'Vendor {i % 50}',
+            'item_link': f'https://example.com/items/{i}',
+            'quantity': 1 + i % 4,
+            'price': 5 + (i * 37) % 4000,
+            'shipping_cost': i % 25,
+            'subteam': f'Subteam {i % 8}',
+            'purpose': 'Benchmark data',
+            'requester_name': 'Bench User',
+            'requester_email': f'member{i % 40}@mit.edu',
+            'approval_status': approvals[i % len(approvals)],
+            'status': statuses[i % len(statuses)],
+            'urgency': urgencies[i % len(urgencies)],
+            'user_id': user.id,
+            'created_at': created_at,
+            'shipped_at': created_at + timedelta(days=3) if i % 3 else None,
+            'arrived_at': created_at + timedelta(days=6) if i % 6 == 1 else None,
+        })
+        if len(batch) == 1000:
+            db.session.execute(insert(Purchase), batch)
+            batch = []
+
+    if batch:
+        db.session.execute(insert(Purchase), batch)
+    db.session.commit()
+    return user
+
+
+def measure(label: str, fn, repeat: int) -> None:
+    """Print mean wall time and peak traced memory of ``fn``"""
+    fn()  # warm up
+
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean_ms = sum(timings) / len(timings) * 1000
+    print(f'  {label:<28} {mean_ms:9.2f} ms   peak {peak / 1024:9.1f} KiB')
+
+
+def bench_serialization(args) -> None:
+    """Compare ORM to_dict() against the projected list serializer"""
+    from app.serializers import PurchaseListSerializer, dumps
+
+    seed_purchases(args.rows)
+    ordered = Purchase.query.order_by(Purchase.created_at.desc(), Purchase.id.desc())
+
+    def orm_path():
+        purchases = ordered.limit(args.page_size).all()
+        return current_app.json.dumps([purchase.to_dict() for purchase in purchases])
+
+    def projected_path(fields=None):
+        serializer = PurchaseListSerializer(fields)
+        rows = ordered.with_entities(*serializer.columns).limit(args.page_size).all()
+        return dumps(serializer.serialize(rows))
+
+    print(f'Serializing pages of {args.page_size} from {args.rows} purchases:')
+    measure('ORM + to_dict + jsonify', orm_path, args.repeat)
+    measure('projected rows, all fields', projected_path, args.repeat)
+    measure('projected rows, 4 fields',
+            lambda: projected_path(['item_name', 'status', 'total_cost', 'created_at']),
+            args.repeat)
+
+
+def bench_smtp(args) -> None:
+    """Compare one SMTP connection per message against pooled batch delivery"""
+    from app import mail
+    from app.services.email_service import EmailService
+
+    current_app.config.update(
+        MAIL_SERVER=args.host,
+        MAIL_PORT=args.port,
+        MAIL_USE_TLS=False,
+        MAIL_USE_SSL=False,
+        MAIL_USERNAME=None,
+        MAIL_PASSWORD=None,
+        MAIL_SUPPRESS_SEND=False,
+        MAIL_DEBUG=0
+    )
+    mail.init_app(current_app)
+
+    html_body = '<p>Benchmark notification</p>'
+    messages = [
+        {'subject': f'Benchmark {i}', 'recipients': [f'member{i}@mit.edu'], 'html_body': html_body}
+        for i in range(args.recipients)
+    ]
+
+    print(f'Delivering {args.recipients} messages to {args.host}:{args.port}:')
+
+    per_message = EmailService()
+    started = time.perf_counter()
+    for message in messages[:args.unpooled]:
+        per_message.deliver(**message)
+    elapsed = time.perf_counter() - started
+    print(f'  {"connection per message":<28} {args.unpooled / elapsed:9.1f} msg/s   '
+          f'({args.unpooled} messages) {per_message.stats.snapshot()}')
+
+    pooled = EmailService()
+    started = time.perf_counter()
+    for offset in range(0, len(messages), args.batch_size):
+        pooled.deliver_batch(messages[offset:offset + args.batch_size])
+    elapsed = time.perf_counter() - started
+    print(f'  {"pooled batches of " + str(args.batch_size):<28} {args.recipients / elapsed:9.1f} msg/s   '
+          f'{pooled.stats.snapshot()}')
+
+
+def bench_passwords(args) -> None:
+    """Login throughput for each password hash cost level"""
+    from app.passwords import hash_password
+
+    db.create_all()
+    user = User(email='bench@mit.edu', full_name='Bench User', role=UserRole.REQUESTER)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    client = app.test_client()
+    credentials = {'email': user.email, 'password': 'password123'}
+
+    # One login at a time, as a sync gunicorn worker serves them
+    print(f'{args.logins} sequential logins per cost level:')
+    for method in args.methods:
+        app.config['PASSWORD_HASH_METHOD'] = method
+        user.password_hash = hash_password('password123')
+        db.session.commit()
+
+        started = time.perf_counter()
+        hash_password('password123')
+        hash_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(args.logins):
+            response = client.post('/auth/login', json=credentials)
+            assert response.status_code == 200, response.get_json()
+        elapsed = time.perf_counter() - started
+        print(f'  {method:<28} hash {hash_ms:8.1f} ms   {args.logins / elapsed:8.1f} logins/s')
+
+
+def bench_filters(args) -> None:
+    """Query plans and timings for common purchase list filters"""
+    from werkzeug.datastructures import MultiDict
+    from app.filters import PurchaseFilter
+    from app.services import PurchaseService
+
+    user = seed_purchases(args.rows)
+    service = PurchaseService()
+    # A requester with no orders: their scoped list has to rule out every row
+    requester = User(email='member7@mit.edu', full_name='Member Seven', role=UserRole.REQUESTER)
+    requester.set_password('password123')
+    db.session.add(requester)
+    db.session.commit()
+
+    requester.id  # load before measure() detaches it
+
+    # A two-day window a third of the way into the seeded range
+    first, last = db.session.query(db.func.min(Purchase.created_at), db.func.max(Purchase.created_at)).one()
+    window_start = (first + (last - first) / 3).date()
+    since = window_start.isoformat()
+    until = (window_start + timedelta(days=1)).isoformat()
+    cases = [
+        ('default list', user, ''),
+        ('status in', user, 'status=Purchased,Shipped'),
+        ('approval_status eq', user, 'approval_status=Pending Executive Approval'),
+        ('subteam + urgency', user, 'subteam=Subteam 3&urgency[in]=Urgent,Both'),
+        ('created_at range', user, f'created_at[gte]={since}&created_at[lte]={until}'),
+        ('shipped_at range', user, f'shipped_at[gte]={since}&shipped_at[lte]={until}'),
+        ('arrived_at range', user, f'arrived_at[gte]={since}&arrived_at[lte]={until}'),
+        ('total_cost range', user, 'total_cost[gte]=3000&total_cost[lt]=3500'),
+        ('requester', user, 'requester=member7@mit.edu'),
+        ('status, own orders', requester, 'status=Shipped'),
+    ]
+
+    print(f'Filtering pages of {args.page_size} from {args.rows} purchases:')
+    for label, viewer, query_string in cases:
+        args_ = MultiDict(part.split('=', 1) for part in query_string.split('&') if part)
+        filters = {'where': PurchaseFilter.from_args(args_), 'include_deleted': False}
+        run = lambda: service.get_purchases_page(viewer, filters, per_page=args.page_size)  # noqa: E731
+        measure(label, run, args.repeat)
+        for detail in explain(run):
+            print(f'      {detail}')
+
+
+def explain(fn) -> list:
+    """SQLite query plan of the last statement ``fn`` executes"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    statement, parameters = captured[-1]
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    return [row[-1] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    serialization = subparsers.add_parser('serialization', help='purchase list serialization')
+    serialization.add_argument('--rows', type=int, default=5000)
+    serialization.add_argument('--page-size', type=int, default=100)
+    serialization.add_argument('--repeat', type=int, default=20)
+    serialization.set_defaults(func=bench_serialization)
+
+    smtp = subparsers.add_parser('smtp', help='SMTP delivery throughput')
+    smtp.add_argument('--host', default='localhost')
+    smtp.add_argument('--port', type=int, default=8025)
+    smtp.add_argument('--recipients', type=int, default=1000)
+    smtp.add_argument('--batch-size', type=int, default=50)
+    smtp.add_argument('--unpooled', type=int, default=200, help='messages sent one connection each')
+    smtp.set_defaults(func=bench_smtp)
+
+    passwords = subparsers.add_parser('passwords', help='login throughput per password hash cost')
+    passwords.add_argument('--logins', type=int, default=50)
+    passwords.add_argument('--methods', nargs='+', default=[
+        'pbkdf2:sha256:1000', 'pbkdf2:sha256:10000', 'pbkdf2:sha256:600000',
+        'scrypt:16384:8:1', 'scrypt:32768:8:1'
+    ])
+    passwords.set_defaults(func=bench_passwords)
+
+    filters = subparsers.add_parser('filters', help='purchase list filter query plans')
+    filters.add_argument('--rows', type=int, default=20000)
+    filters.add_argument('--page-size', type=int, default=20)
+    filters.add_argument('--repeat', type=int, default=20)
+    filters.set_defaults(func=bench_filters)
+
+    args = parser.parse_args()
+    app = create_app()
+    with app.app_context():
+        args.func(args)
+
+
+if __name__ == '__main__':
+    main()
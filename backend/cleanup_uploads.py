@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Garbage-collect upload files that nothing references
+
+Usage:
+    python cleanup_uploads.py --dry-run            # report what would be deleted
+    python cleanup_uploads.py --max-files 100000   # collect incrementally, resuming next run
+"""
+import argparse
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.services import FileService, UploadGCService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete unreferenced upload files')
+    parser.add_argument('--subfolder', action='append', choices=FileService.COLLECTABLE_SUBFOLDERS,
+                        help='subfolder to collect, repeatable (default: all of them)')
+    parser.add_argument('--grace-hours', type=float,
+                        help='keep files younger than this (default: UPLOAD_ORPHAN_GRACE_PERIOD)')
+    parser.add_argument('--dry-run', action='store_true', help='report without deleting')
+    parser.add_argument('--checkpoint', help='progress file for resuming (default: instance/upload_gc.json)')
+    parser.add_argument('--max-files', type=int, help='stop after scanning this many files per subfolder')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        grace_period = int(args.grace_hours * 3600) if args.grace_hours is not None else None
+        checkpoint = args.checkpoint or os.path.join(app.instance_path, 'upload_gc.json')
+        os.makedirs(os.path.dirname(os.path.abspath(checkpoint)), exist_ok=True)
+
+        file_service = FileService()
+        gc = UploadGCService(file_service)
+        for subfolder in args.subfolder or FileService.COLLECTABLE_SUBFOLDERS:
+            if not args.dry_run:
+                tracked = file_service.cleanup_orphaned_files(subfolder=subfolder, grace_period=grace_period)
+                print(f"🗑️  {subfolder}: released stored files deleted: {tracked['deleted']}")
+                for error in tracked['errors']:
+                    print(f'❌ {error}')
+
+            result = gc.collect(subfolder, grace_period=grace_period, dry_run=args.dry_run,
+                                checkpoint_path=checkpoint, max_files=args.max_files)
+            verb = 'would delete' if args.dry_run else 'deleted'
+            print(f"{'✅' if result['complete'] else '⏸️ '} {subfolder}: scanned {result['scanned']}, "
+                  f"{verb} {result['deleted']} ({result['bytes_reclaimed'] / (1024 * 1024):.1f} MB), "
+                  f"kept {result['kept']}, too recent {result['recent']}")
+            for error in result['errors']:
+                print(f'❌ {error}')
+
+
+if __name__ == '__main__':
+    main()
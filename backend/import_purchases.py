@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Import purchase requests from a CSV or XLSX file
+
+Usage:
+    python import_purchases.py orders.csv --user business@mit.edu --dry-run
+    python import_purchases.py bom.xlsx --user business@mit.edu
+"""
+import argparse
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.models import User
+from app.services import PurchaseImportService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create purchase requests from a spreadsheet')
+    parser.add_argument('file', help='.csv or .xlsx file with item_name, vendor_name, price and subteam columns')
+    parser.add_argument('--user', required=True, help='email of the account the purchases are created under')
+    parser.add_argument('--dry-run', action='store_true', help='validate rows without inserting')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        user = User.query.filter_by(email=args.user.lower()).first()
+        if not user:
+            print(f'❌ No user with email {args.user}')
+            sys.exit(1)
+
+        with open(args.file, 'rb') as stream:
+            result = PurchaseImportService().import_file(stream, args.file, user, dry_run=args.dry_run)
+
+        print(f"{'✅' if result['success'] else '❌'} {result['message']}")
+        for error in result['errors']:
+            print(f"   line {error['line']}: {error['message']}")
+        if result['rejected'] > len(result['errors']):
+            print(f"   ... and {result['rejected'] - len(result['errors'])} more")
+        if result['notified']:
+            print(f"📧 Summary queued for {result['notified']} approver(s)")
+
+        sys.exit(0 if result['success'] else 1)
+
+
+if __name__ == '__main__':
+    main()
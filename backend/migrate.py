@@ -9,8 +9,50 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
+from sqlalchemy import text, inspect
+from sqlalchemy.schema import CreateColumn
+
 from app.models.base import db
-from app.models import User, UserRole
+from app.models import User, UserRole, Purchase, ApprovedEmail
+from app.services import SearchService
+
+
+def add_missing_columns(table):
+    """Add model columns that an existing table does not have yet"""
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = str(CreateColumn(column).compile(dialect=db.engine.dialect))
+            if column.computed is not None and db.engine.dialect.name == 'sqlite':
+                # SQLite can only add VIRTUAL generated columns to an existing table
+                ddl = ddl.replace(' STORED', ' VIRTUAL')
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+            print(f"✅ Added column {table.name}.{column.name}")
+    db.session.commit()
+
+
+def upgrade_schema():
+    """Apply additive schema changes that create_all() skips for existing tables"""
+    add_missing_columns(User.__table__)
+    add_missing_columns(Purchase.__table__)
+    
+    # Indexes declared on the models are only created together with their table
+    for table in (User.__table__, Purchase.__table__):
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    
+    # Superseded by idx_created_at_id, which also serves keyset pagination
+    db.session.execute(text('DROP INDEX IF EXISTS idx_created_at'))
+    # Superseded by the (column, created_at, id) indexes behind list filters
+    for name in ('idx_purchase_status', 'idx_approval_status', 'idx_user_id', 'idx_subteam'):
+        db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    # Without statistics SQLite preferred this boolean index over every other one
+    db.session.execute(text('DROP INDEX IF EXISTS idx_is_deleted'))
+    db.session.commit()
+    
+    # Full-text index behind the purchase search filter
+    SearchService().install()
+
 
 def init_database():
     """Initialize the database with tables and test users"""
@@ -22,6 +64,17 @@ def init_database():
         db.create_all()
         print("✅ Database tables created!")
         
+        print("🔧 Upgrading database schema...")
+        upgrade_schema()
+        print("✅ Database schema up to date!")
+        
+        if ApprovedEmail.query.count() == 0:
+            print("🔧 Seeding registration allowlist...")
+            for role, emails in User.get_approved_emails().items():
+                for email in emails:
+                    db.session.add(ApprovedEmail(email=email, role=UserRole(role)))
+            db.session.commit()
+        
         # Check if users already exist
         user_count = User.query.count()
         if user_count > 0:
@@ -0,0 +1,76 @@
+"""
+Shared fixtures: an app on a throwaway SQLite file with one user per role
+"""
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['FLASK_ENV'] = 'testing'
+
+from app import create_app
+from app.cache import purchase_cache, user_cache
+from app.models.base import db
+from app.models import User, UserRole
+from config.settings import TestingConfig
+
+PASSWORD = 'password123'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App with a fresh database; a file so several connections can race on it"""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setattr(TestingConfig, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        for role in UserRole:
+            user = User(email=f'{role.value}@mit.edu', full_name=role.value.title(), role=role)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+    purchase_cache.clear()
+    user_cache.clear()
+
+    # No context is held open during the test: each test client request
+    # must get its own app context (and flask-login its own ``g``)
+    yield app
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def login(app):
+    """Return a test client logged in as the user with the given role"""
+    def login(role: str):
+        client = app.test_client()
+        response = client.post('/auth/login', json={'email': f'{role}@mit.edu', 'password': PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return login
+
+
+@pytest.fixture
+def create_purchase(login):
+    """Create a purchase through the API and return its id"""
+    requester = login('requester')
+
+    def create_purchase(client=None, **fields):
+        data = {
+            'item_name': 'Bolt',
+            'vendor_name': 'McMaster',
+            'price': 10,
+            'subteam': 'Aero',
+            'requester_name': 'Requester',
+            'requester_email': 'requester@mit.edu',
+        }
+        data.update(fields)
+        response = (client or requester).post('/api/purchases', json=data)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['purchase']['id']
+    return create_purchase
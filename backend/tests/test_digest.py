@@ -0,0 +1,32 @@
+"""
+Held approval notifications go out as one digest per approver
+"""
+from datetime import datetime, timedelta
+
+from app.models import DigestItem, EmailOutbox
+from app.models.base import db
+from app.services import DigestService, PurchaseService
+
+
+def test_flush_due_sends_one_digest(app, login, create_purchase, monkeypatch):
+    monkeypatch.setitem(PurchaseService.SUBLEAD_EMAILS, 'Aero', 'sublead@mit.edu')
+    app.config['ENABLE_EMAIL_NOTIFICATIONS'] = True
+    sublead = login('sublead')
+    assert sublead.put('/auth/me', json={'approval_digest': True}).status_code == 200
+
+    create_purchase(item_name='Bolt')
+    create_purchase(item_name='Nut')
+
+    with app.app_context():
+        assert DigestItem.query.count() == 2
+        assert EmailOutbox.query.count() == 0
+
+        # Nothing is due until the oldest item is past the window
+        assert DigestService().flush_due()['digests'] == 0
+
+        result = DigestService().flush_due(now=datetime.utcnow() + timedelta(hours=2))
+        assert result == {'digests': 1, 'items': 2}
+        assert DigestItem.query.count() == 0
+        email = EmailOutbox.query.one()
+        assert email.recipient_list == ['sublead@mit.edu']
+        assert email.subject.startswith('2 Purchase Orders')
@@ -0,0 +1,97 @@
+"""
+Outbox batches go out over one SMTP connection, re-opened after a drop
+"""
+import smtplib
+
+import pytest
+
+from app.models import EmailOutbox, OutboxStatus
+from app.models.base import db
+from app.services import EmailService, OutboxService
+
+
+class FakeConnection:
+    def __init__(self, mail):
+        self.mail = mail
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.mail.closed += 1
+
+    def send(self, message):
+        if self.mail.drop_on and self.mail.drop_on[0] == len(self.mail.sent):
+            self.mail.drop_on.pop(0)
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.mail.sent.append(message.subject)
+
+
+class FakeMail:
+    """Stands in for Flask-Mail, counting connections instead of talking SMTP"""
+
+    def __init__(self, drop_on=(), refuse=False):
+        self.drop_on = list(drop_on)
+        self.refuse = refuse
+        self.connections = 0
+        self.closed = 0
+        self.sent = []
+
+    def connect(self):
+        if self.refuse:
+            raise ConnectionRefusedError('Connection refused')
+        self.connections += 1
+        return FakeConnection(self)
+
+
+def messages(count):
+    return [{'subject': f'Message {n}', 'recipients': ['a@mit.edu'], 'html_body': '<p>Hi</p>'} for n in range(count)]
+
+
+@pytest.fixture
+def sending(app):
+    app.config['MAIL_SUPPRESS_SEND'] = False
+    with app.app_context():
+        yield
+
+
+def test_batch_shares_one_connection(sending):
+    mail = FakeMail()
+    service = EmailService(mail)
+
+    assert service.deliver_batch(messages(3)) == [None, None, None]
+    assert mail.sent == ['Message 0', 'Message 1', 'Message 2']
+    assert (mail.connections, mail.closed) == (1, 1)
+    assert service.stats.snapshot()['connections'] == 1
+    assert service.stats.snapshot()['batches'] == 1
+
+
+def test_dropped_connection_is_reopened(sending):
+    mail = FakeMail(drop_on=[1])
+    errors = EmailService(mail).deliver_batch(messages(3))
+
+    assert errors[0] is None and errors[2] is None
+    assert 'closed' in errors[1]
+    assert mail.sent == ['Message 0', 'Message 2']
+    assert (mail.connections, mail.closed) == (2, 2)
+
+
+def test_unreachable_server_fails_the_rest_without_retrying(sending):
+    mail = FakeMail(refuse=True)
+    errors = EmailService(mail).deliver_batch(messages(3))
+
+    assert len(errors) == 3 and all('SMTP connection failed' in error for error in errors)
+    assert mail.sent == []
+
+
+def test_outbox_dispatch_marks_each_message(app, sending):
+    app.config['ENABLE_EMAIL_NOTIFICATIONS'] = True
+    email_service = EmailService(FakeMail(drop_on=[1]))
+    for n in range(3):
+        email_service._send_email(f'Message {n}', ['a@mit.edu'], '<p>Hi</p>')
+    db.session.commit()
+
+    assert OutboxService(email_service).dispatch_batch() == {'sent': 2, 'retrying': 1, 'failed': 0}
+    statuses = [message.status for message in EmailOutbox.query.order_by(EmailOutbox.id)]
+    assert statuses == [OutboxStatus.SENT, OutboxStatus.PENDING, OutboxStatus.SENT]
+    assert email_service.mail.connections == 2
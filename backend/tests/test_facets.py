@@ -0,0 +1,76 @@
+"""
+Facet counts for the purchase list follow its filters, scope and writes
+"""
+import pytest
+
+from app.models import Purchase, PurchaseStatus, UrgencyLevel
+from app.models.base import db
+
+
+@pytest.fixture
+def purchases(app, create_purchase):
+    ids = [
+        create_purchase(price=10, subteam='Aero'),
+        create_purchase(price=600, subteam='Electrical', urgency='Urgent'),
+        create_purchase(price=1200, subteam='Aero', urgency='Urgent'),
+    ]
+    with app.app_context():
+        db.session.execute(db.update(Purchase).where(Purchase.id == ids[2]).values(status=PurchaseStatus.SHIPPED))
+        db.session.commit()
+    return ids
+
+
+def facets(client, **params):
+    response = client.get('/api/purchases/facets', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return body['total'], body['facets']
+
+
+def test_counts_every_facet(login, purchases):
+    total, counts = facets(login('business'))
+
+    assert total == 3
+    assert counts['subteam'] == {'Aero': 2, 'Electrical': 1}
+    assert counts['urgency'] == {level.value: 0 for level in UrgencyLevel} | {'Neither': 1, 'Urgent': 2}
+    # Enum facets list every value, even those with no purchases
+    assert counts['status'] == {status.value: 0 for status in PurchaseStatus} | {'Not Yet Purchased': 2, 'Shipped': 1}
+    assert counts['approval_status']['Pending Sublead Approval'] == 3
+    assert sum(counts['approval_status'].values()) == 3
+
+
+def test_counts_follow_filters_and_search(login, purchases):
+    business = login('business')
+
+    total, counts = facets(business, urgency='Urgent')
+    assert total == 2 and counts['subteam'] == {'Aero': 1, 'Electrical': 1}
+
+    total, counts = facets(business, **{'total_cost[gte]': '500', 'subteam': 'Aero'})
+    assert total == 1 and counts['status']['Shipped'] == 1
+
+    assert facets(business, search='bolt')[0] == 3
+    assert facets(business, search='nothing like it')[0] == 0
+
+
+def test_counts_keep_the_role_scope(login, create_purchase, purchases):
+    create_purchase(client=login('sublead'), subteam='Powertrain')
+
+    assert facets(login('business'))[1]['subteam'] == {'Aero': 2, 'Electrical': 1, 'Powertrain': 1}
+    assert facets(login('requester'))[1]['subteam'] == {'Aero': 2, 'Electrical': 1}
+
+
+def test_counts_refresh_after_writes(login, create_purchase, purchases):
+    business = login('business')
+    assert facets(business)[0] == 3  # now cached
+
+    create_purchase(subteam='Chassis')
+    total, counts = facets(business)
+    assert total == 4 and counts['subteam']['Chassis'] == 1
+
+    assert business.delete(f'/api/purchases/{purchases[0]}').status_code == 200
+    assert facets(business)[0] == 3
+    assert facets(business, include_deleted='true')[0] == 4
+
+
+def test_invalid_filter_is_a_bad_request(login, purchases):
+    assert login('business').get('/api/purchases/facets', query_string={'urgency': 'Soon'}).status_code == 400
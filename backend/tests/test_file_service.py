@@ -0,0 +1,120 @@
+"""
+Uploads are stored under the hash of the bytes on disk and registered in
+the caller's transaction
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.models import Purchase, StoredFile
+from app.models.base import db
+from app.services import FileService
+from app.services import image_processing
+from app.unit_of_work import unit_of_work
+
+PHOTOS = Purchase.ARRIVAL_PHOTO_FOLDER
+
+
+def png(size=(2400, 1600)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 255)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def upload(file_service, content, filename='photo.png', subfolder=PHOTOS):
+    result = file_service.save_file(FileStorage(io.BytesIO(content), filename=filename), subfolder)
+    assert result['success'], result['message']
+    return result
+
+
+def test_normalized_image_is_addressed_by_its_stored_bytes(app):
+    with app.app_context():
+        file_service = FileService()
+        original = png()
+        result = upload(file_service, original)
+
+        with open(result['filepath'], 'rb') as f:
+            stored = f.read()
+        sha256 = hashlib.sha256(stored).hexdigest()
+
+        assert stored != original  # resized and re-encoded
+        assert os.path.basename(result['filename']) == f'{sha256}.png'
+        assert file_service.immutable_etag(f"{PHOTOS}/{result['filename']}") == sha256
+        assert StoredFile.query.one().sha256 == sha256
+        assert StoredFile.query.one().size == len(stored)
+
+        # The same upload again lands on the same file
+        assert upload(file_service, original)['filename'] == result['filename']
+        assert StoredFile.query.count() == 1
+
+
+def test_unnormalizable_image_keeps_original_bytes(app):
+    with app.app_context():
+        content = b'not really a png'
+        result = upload(FileService(), content)
+
+        assert os.path.basename(result['filename']) == f'{hashlib.sha256(content).hexdigest()}.png'
+        assert result['state'] == image_processing.STATE_FAILED
+
+
+def test_registration_rolls_back_with_the_caller(app):
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                upload(FileService(), b'quote', filename='quote.pdf')
+                raise RuntimeError('caller failed')
+
+        assert StoredFile.query.count() == 0
+
+
+def test_upload_during_cleanup_keeps_the_file(app):
+    with app.app_context():
+        filepath = upload(FileService(), b'quote', filename='quote.pdf')['filepath']
+        db.session.execute(db.update(StoredFile).values(released_at=datetime.utcnow() - timedelta(hours=2)))
+        db.session.commit()
+
+    claimed = threading.Event()
+    results = []
+
+    def reupload():
+        with app.app_context():
+            with unit_of_work():
+                upload(FileService(), b'quote', filename='quote.pdf')
+                claimed.set()
+                # Cleanup starts while this upload is still uncommitted
+                time.sleep(0.3)
+            db.session.remove()
+
+    def cleanup():
+        with app.app_context():
+            claimed.wait()
+            results.append(FileService().cleanup_orphaned_files(grace_period=3600))
+            db.session.remove()
+
+    threads = [threading.Thread(target=reupload), threading.Thread(target=cleanup)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{'deleted': 0, 'errors': []}]
+    assert os.path.exists(filepath)
+    with app.app_context():
+        assert StoredFile.query.count() == 1
+
+
+def test_reupload_restores_a_missing_file(app):
+    with app.app_context():
+        file_service = FileService()
+        filepath = upload(file_service, b'quote', filename='quote.pdf')['filepath']
+        os.remove(filepath)
+
+        upload(file_service, b'quote', filename='quote.pdf')
+        assert os.path.exists(filepath)
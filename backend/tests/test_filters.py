@@ -0,0 +1,100 @@
+"""
+The field[op]=value filter language on the purchase list
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app.filters import PurchaseFilter
+from app.models import Purchase, PurchaseStatus, UrgencyLevel
+from app.models.base import db
+
+
+def test_parse_conditions():
+    where = PurchaseFilter.from_args(MultiDict([
+        ('status', 'Purchased,Shipped'),
+        ('urgency[nin]', 'Neither'),
+        ('total_cost[gt]', '500'),
+        ('max_cost', '900'),
+        ('page', '2'),  # not a filter
+    ]))
+
+    assert {(field, op) for field, op, _ in where.conditions} == {
+        ('status', 'in'), ('urgency', 'nin'), ('total_cost', 'gt'), ('total_cost', 'lte')
+    }
+    # Order of arguments does not change the cache key
+    assert where.key() == PurchaseFilter.from_args(MultiDict([
+        ('max_cost', '900'), ('total_cost[gt]', '500'), ('urgency[nin]', 'Neither'), ('status', 'Purchased,Shipped')
+    ])).key()
+    assert not PurchaseFilter.from_args(MultiDict([('sort', 'total_cost'), ('status', '')]))
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'status[gt]': 'Purchased'}, 'Unknown operator'),
+    ({'status': 'Lost'}, 'Invalid value'),
+    ({'created_at': '2024-01-01'}, 'needs an operator'),
+    ({'created_at[gte]': 'yesterday'}, 'Invalid date'),
+    ({'total_cost[gt]': '5,6'}, 'single value'),
+    ({'total_cost[gt]': 'NaN'}, 'Invalid amount'),
+    ({'user_id': 'me'}, 'Invalid id'),
+])
+def test_invalid_conditions(args, message):
+    with pytest.raises(ValueError, match=message):
+        PurchaseFilter.from_args(MultiDict(args))
+
+
+@pytest.fixture
+def purchases(app, create_purchase):
+    ids = {
+        'cheap': create_purchase(price=10, subteam='Aero'),
+        'mid': create_purchase(price=600, subteam='Electrical', urgency='Urgent'),
+        'dear': create_purchase(price=1200, subteam='Aero', urgency='Special/Large'),
+    }
+    with app.app_context():
+        db.session.execute(db.update(Purchase).where(Purchase.id == ids['mid']).values(status=PurchaseStatus.PURCHASED))
+        db.session.execute(db.update(Purchase).where(Purchase.id == ids['dear']).values(status=PurchaseStatus.SHIPPED))
+        db.session.commit()
+    return ids
+
+
+def listed(client, **params):
+    response = client.get('/api/purchases', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return {purchase['id'] for purchase in response.get_json()['purchases']}
+
+
+@pytest.mark.parametrize('params, expected', [
+    ({'status': 'Purchased'}, {'mid'}),
+    ({'status': 'Purchased,Shipped'}, {'mid', 'dear'}),
+    ({'status[ne]': 'Shipped'}, {'cheap', 'mid'}),
+    ({'urgency[nin]': 'Neither,Urgent'}, {'dear'}),
+    ({'subteam': 'Aero', 'total_cost[gte]': '500'}, {'dear'}),
+    ({'total_cost[gt]': '10', 'total_cost[lt]': '1200'}, {'mid'}),
+    ({'min_cost': '600', 'max_cost': '600'}, {'mid'}),
+    ({'requester': 'requester@mit.edu', 'approval_status': 'Pending Sublead Approval'}, {'cheap', 'mid', 'dear'}),
+])
+def test_list_filters(login, purchases, params, expected):
+    assert listed(login('business'), **params) == {purchases[name] for name in expected}
+
+
+def test_bare_dates_cover_the_whole_day(login, purchases):
+    today = datetime.utcnow().date()
+    business = login('business')
+
+    assert listed(business, **{'created_at[lte]': today.isoformat()}) == set(purchases.values())
+    assert listed(business, **{'created_at[gte]': today.isoformat()}) == set(purchases.values())
+    assert listed(business, **{'created_at[gt]': today.isoformat()}) == set()
+    assert listed(business, **{'created_at[lt]': today.isoformat()}) == set()
+    assert listed(business, **{'created_at[lt]': (today + timedelta(days=1)).isoformat()}) == set(purchases.values())
+
+
+def test_filters_keep_the_role_scope(login, create_purchase, purchases):
+    create_purchase(client=login('sublead'), price=5000)
+    assert listed(login('requester'), **{'total_cost[gt]': '1000'}) == {purchases['dear']}
+
+
+def test_invalid_filter_is_a_bad_request(login, purchases):
+    response = login('business').get('/api/purchases', query_string={'status': 'Lost'})
+    assert response.status_code == 400
+    assert 'status' in response.get_json()['message']
@@ -0,0 +1,54 @@
+"""
+import_purchases.py runs the import outside any request
+"""
+import sys
+
+import pytest
+
+import import_purchases
+from app.models import Purchase, EmailOutbox
+
+CSV = (
+    'item_name,vendor_name,price,subteam\n'
+    'Wire,Digikey,4.50,Electrical\n'
+    'Bolt,McMaster,1.25,Aero\n'
+)
+
+
+def run_cli(app, monkeypatch, *argv):
+    monkeypatch.setattr(import_purchases, 'create_app', lambda: app)
+    monkeypatch.setattr(sys, 'argv', ['import_purchases.py', *argv])
+    with pytest.raises(SystemExit) as exit_info:
+        import_purchases.main()
+    return exit_info.value.code
+
+
+def test_import_queues_sublead_summary_without_request(app, monkeypatch, tmp_path, capsys):
+    app.config['ENABLE_EMAIL_NOTIFICATIONS'] = True
+    app.config['APP_BASE_URL'] = 'https://purchasing.example.org'
+    path = tmp_path / 'orders.csv'
+    path.write_text(CSV)
+
+    assert run_cli(app, monkeypatch, str(path), '--user', 'business@mit.edu') == 0, capsys.readouterr().out
+
+    with app.app_context():
+        assert Purchase.query.count() == 2
+        summary = EmailOutbox.query.filter_by(recipients='sublead2@mit.edu').one()
+        assert summary.subject.startswith('1 Imported Purchase Order Needs Approval')
+        assert 'https://purchasing.example.org/dashboard' in summary.html_body
+
+
+def test_dry_run_inserts_nothing(app, monkeypatch, tmp_path):
+    path = tmp_path / 'orders.csv'
+    path.write_text(CSV)
+
+    assert run_cli(app, monkeypatch, str(path), '--user', 'business@mit.edu', '--dry-run') == 0
+    with app.app_context():
+        assert Purchase.query.count() == 0
+
+
+def test_unknown_user_exits_with_error(app, monkeypatch, tmp_path):
+    path = tmp_path / 'orders.csv'
+    path.write_text(CSV)
+
+    assert run_cli(app, monkeypatch, str(path), '--user', 'nobody@mit.edu') == 1
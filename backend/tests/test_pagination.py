@@ -0,0 +1,72 @@
+"""
+Cursor pagination walks every row once in the requested order
+"""
+import pytest
+
+PRICES = [40, 10, 50, 30, 20]
+
+
+@pytest.fixture
+def purchases(create_purchase):
+    return [create_purchase(item_name=f'Part {price}', price=price) for price in PRICES]
+
+
+def walk(client, **params):
+    """Follow next_cursor to the end; returns the ids in order and the pages seen"""
+    ids, pages, cursor = [], 0, None
+    while True:
+        args = dict(params, per_page=2, **({'cursor': cursor} if cursor else {}))
+        response = client.get('/api/purchases', query_string=args)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert body['pagination']['mode'] == 'cursor'
+        ids += [purchase['id'] for purchase in body['purchases']]
+        pages += 1
+        cursor = body['pagination']['next_cursor']
+        if not body['pagination']['has_more']:
+            assert cursor is None
+            return ids, pages
+
+
+def test_default_sort_is_newest_first(login, purchases):
+    ids, pages = walk(login('business'))
+    assert ids == purchases[::-1]
+    assert pages == 3
+
+
+@pytest.mark.parametrize('sort, reverse', [('total_cost', False), ('-total_cost', True)])
+def test_sort_by_total_cost(login, purchases, sort, reverse):
+    by_cost = [purchase_id for _, purchase_id in sorted(zip(PRICES, purchases), reverse=reverse)]
+    assert walk(login('business'), sort=sort)[0] == by_cost
+
+
+def test_include_total_counts_every_row(login, purchases):
+    response = login('business').get('/api/purchases', query_string={'per_page': 2, 'include_total': 'true'})
+    assert response.get_json()['pagination']['total'] == len(PRICES)
+
+
+def test_offset_mode_still_works(login, purchases):
+    response = login('business').get('/api/purchases', query_string={'per_page': 2, 'page': 3})
+    body = response.get_json()
+    assert [purchase['id'] for purchase in body['purchases']] == purchases[:1]
+    assert body['pagination'] == {'mode': 'offset', 'page': 3, 'per_page': 2, 'total': 5, 'pages': 3}
+
+
+@pytest.mark.parametrize('cursor', ['garbage', 'W10'])
+def test_malformed_cursor_is_rejected(login, purchases, cursor):
+    response = login('business').get('/api/purchases', query_string={'cursor': cursor})
+    assert response.status_code == 400
+
+
+def test_cursor_from_another_sort_is_rejected(login, purchases):
+    business = login('business')
+    body = business.get('/api/purchases', query_string={'per_page': 2}).get_json()
+
+    response = business.get('/api/purchases', query_string={
+        'per_page': 2, 'sort': 'total_cost', 'cursor': body['pagination']['next_cursor']
+    })
+    assert response.status_code == 400
+
+
+def test_unknown_sort_is_rejected(login, purchases):
+    assert login('business').get('/api/purchases', query_string={'sort': 'vendor_name'}).status_code == 400
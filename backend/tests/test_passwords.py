@@ -0,0 +1,70 @@
+"""
+Stored hashes are only upgraded when the configured cost really changed,
+and hashing shares one bounded pool
+"""
+import threading
+
+import pytest
+
+from app.models import User
+from app.models.base import db
+from app import passwords
+from app.passwords import PasswordHasherBusy, hash_password, needs_rehash
+
+
+@pytest.mark.parametrize('method', ['scrypt', 'scrypt:32768:8:1', 'pbkdf2', 'pbkdf2:sha256', 'pbkdf2:sha256:1000'])
+def test_hash_made_with_configured_method_is_current(app, method):
+    app.config['PASSWORD_HASH_METHOD'] = method
+    with app.app_context():
+        assert not needs_rehash(hash_password('password123'))
+
+
+def test_hash_with_other_cost_needs_rehash(app):
+    with app.app_context():
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        stored = hash_password('password123')
+        app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+        assert needs_rehash(stored)
+
+
+def test_login_with_bare_method_does_not_rewrite_hash(app, login):
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2'
+    login('requester')  # upgrades the fixture's pbkdf2:sha256:1000 hash once
+    with app.app_context():
+        upgraded = db.session.query(User.password_hash).filter_by(email='requester@mit.edu').scalar()
+
+    login('requester')
+    with app.app_context():
+        assert db.session.query(User.password_hash).filter_by(email='requester@mit.edu').scalar() == upgraded
+
+
+@pytest.fixture
+def busy_pool(app):
+    """Occupy every hashing slot until the test ends"""
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_WAIT_TIMEOUT=0.1)
+    passwords._executor = None
+    release = threading.Event()
+    with app.app_context():
+        passwords._get_executor(1).submit(release.wait)
+    yield
+    release.set()
+    passwords._executor = None
+
+
+def test_hashing_waits_for_the_bounded_pool(app, busy_pool):
+    with app.app_context():
+        with pytest.raises(PasswordHasherBusy):
+            hash_password('password123')
+
+
+def test_register_while_busy_is_shed(app, busy_pool):
+    from app.models import ApprovedEmail, UserRole
+    with app.app_context():
+        db.session.add(ApprovedEmail(email='new@mit.edu', role=UserRole.REQUESTER))
+        db.session.commit()
+
+    response = app.test_client().post('/auth/register', json={
+        'email': 'new@mit.edu', 'password': 'password123', 'full_name': 'New'
+    })
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
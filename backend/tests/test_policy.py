@@ -0,0 +1,42 @@
+"""
+Reads and approval writes use the same purchase scope
+"""
+from app.models import Purchase, ApprovalStatus, User, UserRole
+from app.models.base import db
+
+
+def add_sublead(app, email):
+    with app.app_context():
+        user = User(email=email, full_name='Other Sublead', role=UserRole.SUBLEAD)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+
+def test_sublead_still_sees_purchase_after_approving(login, create_purchase):
+    purchase_id = create_purchase(urgency='Urgent')
+    sublead = login('sublead')
+
+    assert sublead.post(f'/api/purchases/{purchase_id}/approve', json={}).status_code == 200
+    response = sublead.get(f'/api/purchases/{purchase_id}')
+    assert response.status_code == 200
+    assert response.get_json()['purchase']['approval_status'] == ApprovalStatus.PENDING_EXECUTIVE.value
+
+
+def test_sublead_cannot_reject_purchase_outside_scope(app, login, create_purchase):
+    purchase_id = create_purchase(urgency='Urgent')
+    assert login('sublead').post(f'/api/purchases/{purchase_id}/approve', json={}).status_code == 200
+    add_sublead(app, 'other@mit.edu')
+    other = app.test_client()
+    assert other.post('/auth/login', json={'email': 'other@mit.edu', 'password': 'password123'}).status_code == 200
+
+    assert other.get(f'/api/purchases/{purchase_id}').status_code == 404
+    response = other.post(f'/api/purchases/{purchase_id}/reject', json={'reason': 'no'})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Purchase not found'
+
+    bulk = other.post('/api/purchases/bulk-reject', json={'ids': [purchase_id]}).get_json()
+    assert bulk['results'] == [{'id': purchase_id, 'success': False, 'message': 'Purchase not found'}]
+
+    with app.app_context():
+        assert db.session.get(Purchase, purchase_id).approval_status == ApprovalStatus.PENDING_EXECUTIVE
@@ -0,0 +1,22 @@
+"""
+Profile updates parse the approval digest flag strictly
+"""
+import pytest
+
+
+@pytest.mark.parametrize('value, expected', [(True, True), (False, False), ('true', True), ('false', False), ('False', False)])
+def test_approval_digest_flag(login, value, expected):
+    sublead = login('sublead')
+
+    response = sublead.put('/auth/me', json={'approval_digest': value})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['user']['approval_digest'] is expected
+
+
+@pytest.mark.parametrize('value', ['yes', 1, 'off'])
+def test_approval_digest_rejects_other_values(login, value):
+    sublead = login('sublead')
+
+    response = sublead.put('/auth/me', json={'approval_digest': value})
+    assert response.status_code == 400
+    assert sublead.get('/auth/me').get_json()['user']['approval_digest'] is False
@@ -0,0 +1,22 @@
+"""
+Purchase properties work on unsaved objects as well as loaded rows
+"""
+from app.models import Purchase, UrgencyLevel
+from app.models.base import db
+
+
+def test_needs_executive_approval_before_flush():
+    assert Purchase(price=1, quantity=1, urgency=UrgencyLevel.NEITHER).needs_executive_approval is False
+    assert Purchase(price=1000, quantity=3, shipping_cost=1, urgency=UrgencyLevel.NEITHER).needs_executive_approval is True
+    assert Purchase(price=1, quantity=1, urgency=UrgencyLevel.URGENT).needs_executive_approval is True
+
+
+def test_needs_executive_approval_matches_sql(app, create_purchase):
+    cheap = create_purchase(price=10)
+    dear = create_purchase(price=1500, quantity=2, shipping_cost=5)
+
+    with app.app_context():
+        flagged = {purchase.id for purchase in Purchase.query.filter(Purchase.needs_executive_approval)}
+        assert flagged == {dear}
+        assert db.session.get(Purchase, cheap).needs_executive_approval is False
+        assert db.session.get(Purchase, dear).needs_executive_approval is True
@@ -0,0 +1,69 @@
+"""
+Purchase search: indexed prefix matching, with a substring fallback
+"""
+import pytest
+
+from app.services import SearchService
+
+
+@pytest.fixture
+def purchases(create_purchase):
+    return {
+        'sheet': create_purchase(item_name='Carbon fiber sheet', vendor_name='Rock West'),
+        'bolt': create_purchase(item_name='Carbon bolt', vendor_name='McMaster'),
+        'tube': create_purchase(item_name='Aluminum tube', vendor_name='Rock West'),
+    }
+
+
+@pytest.fixture
+def indexed(app):
+    with app.app_context():
+        SearchService().install()
+
+
+def search(client, text, **params):
+    response = client.get('/api/purchases', query_string=dict(params, search=text))
+    assert response.status_code == 200, response.get_json()
+    return {purchase['id'] for purchase in response.get_json()['purchases']}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('carbon', {'sheet', 'bolt'}),
+    ('carb', {'sheet', 'bolt'}),          # prefix of a word
+    ('carbon sheet', {'sheet'}),          # every term must match
+    ('SHEET carbon', {'sheet'}),          # in any order and case
+    ('rock', {'sheet', 'tube'}),          # vendor names are searched too
+    ('cárbon', {'sheet', 'bolt'}),        # diacritics are ignored
+    ('titanium', set()),
+])
+def test_indexed_search(login, purchases, indexed, text, expected):
+    assert search(login('business'), text) == {purchases[name] for name in expected}
+
+
+def test_index_follows_updates(app, login, purchases, indexed):
+    from app.models import Purchase
+    from app.models.base import db
+
+    with app.app_context():
+        db.session.get(Purchase, purchases['tube']).item_name = 'Titanium tube'
+        db.session.commit()
+
+    business = login('business')
+    assert search(business, 'titanium') == {purchases['tube']}
+    assert search(business, 'aluminum') == set()
+
+
+def test_search_applies_with_pagination_and_scope(login, create_purchase, purchases, indexed):
+    # Someone else's purchase matches but is outside the requester's scope
+    create_purchase(client=login('sublead'), item_name='Carbon rod')
+
+    assert search(login('requester'), 'carbon', page=1) == {purchases['sheet'], purchases['bolt']}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('arbon', {'sheet', 'bolt'}),         # substring, not just prefix
+    ('fiber sheet', {'sheet'}),
+    ('titanium', set()),
+])
+def test_search_without_index_falls_back_to_substring(login, purchases, text, expected):
+    assert search(login('business'), text) == {purchases[name] for name in expected}
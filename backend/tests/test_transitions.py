@@ -0,0 +1,88 @@
+"""
+Purchase state transitions are compare-and-set UPDATEs
+"""
+import threading
+
+from app.models import Purchase, PurchaseStatus, ApprovalStatus, User, EmailOutbox
+from app.models.base import db
+from app.services import PurchaseService
+
+
+def test_racing_approvals_only_one_succeeds(app, create_purchase):
+    purchase_id = create_purchase()
+    app.config['ENABLE_EMAIL_NOTIFICATIONS'] = True
+    start = threading.Barrier(2)
+    results = []
+
+    def approve():
+        with app.app_context():
+            approver = User.query.filter_by(email='sublead@mit.edu').one()
+            start.wait()
+            results.append(PurchaseService().approve_purchase(purchase_id, approver))
+            db.session.remove()
+
+    threads = [threading.Thread(target=approve) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(result['success'] for result in results) == [False, True]
+    loser = next(result for result in results if not result['success'])
+    assert loser['conflict'], loser['message']
+
+    with app.app_context():
+        assert db.session.get(Purchase, purchase_id).approval_status == ApprovalStatus.FULLY_APPROVED
+        # Only the winning approval notified the requester
+        assert EmailOutbox.query.count() == 1
+
+
+def test_second_approval_is_a_conflict(login, create_purchase):
+    purchase_id = create_purchase()
+    sublead = login('sublead')
+
+    assert sublead.post(f'/api/purchases/{purchase_id}/approve', json={}).status_code == 200
+    response = sublead.post(f'/api/purchases/{purchase_id}/approve', json={})
+    assert response.status_code == 409, response.get_json()
+
+
+def test_status_update_from_unexpected_state_is_a_conflict(app, login, create_purchase):
+    purchase_id = create_purchase()
+    business = login('business')
+
+    # Not approved yet, so it cannot be marked purchased
+    response = business.put(f'/api/purchases/{purchase_id}/status', json={'status': 'Purchased'})
+    assert response.status_code == 409, response.get_json()
+    with app.app_context():
+        assert db.session.get(Purchase, purchase_id).status.value == 'Not Yet Purchased'
+
+
+def test_arrival_with_photo_from_unexpected_state_is_a_conflict(app, login, create_purchase):
+    purchase_id = create_purchase()
+    business = login('business')
+
+    # Not shipped yet; the photo does not change how the state is checked
+    for data in ({'status': 'Arrived'}, {'status': 'Arrived', 'photo_filename': 'photo.jpg'}):
+        response = business.put(f'/api/purchases/{purchase_id}/status', json=data)
+        assert response.status_code == 409, response.get_json()
+    with app.app_context():
+        purchase = db.session.get(Purchase, purchase_id)
+        assert purchase.status.value == 'Not Yet Purchased'
+        assert purchase.arrival_photo is None
+
+
+def test_arrival_with_photo_takes_a_reference(app, login, create_purchase):
+    from app.models import StoredFile
+
+    purchase_id = create_purchase()
+    business = login('business')
+    with app.app_context():
+        db.session.add(StoredFile(subfolder=Purchase.ARRIVAL_PHOTO_FOLDER, path='photo.jpg', sha256='0' * 64, size=1, ref_count=0))
+        db.session.execute(db.update(Purchase).where(Purchase.id == purchase_id).values(status=PurchaseStatus.SHIPPED))
+        db.session.commit()
+
+    response = business.put(f'/api/purchases/{purchase_id}/status', json={'status': 'Arrived', 'photo_filename': 'photo.jpg'})
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        assert db.session.get(Purchase, purchase_id).arrival_photo == 'photo.jpg'
+        assert StoredFile.query.one().ref_count == 1
@@ -0,0 +1,77 @@
+"""
+One commit per unit of work; nested units are savepoints
+"""
+import pytest
+
+from app.models import ApprovedEmail, UserRole
+from app.models.base import db
+from app.unit_of_work import unit_of_work, commit_stats
+
+
+def allowlisted(email):
+    return db.session.query(ApprovedEmail.id).filter_by(email=email).first() is not None
+
+
+def test_nested_unit_that_raises_rolls_back_only_its_own_writes(app):
+    with app.app_context():
+        with unit_of_work():
+            db.session.add(ApprovedEmail(email='outer@mit.edu', role=UserRole.REQUESTER))
+            with pytest.raises(RuntimeError):
+                with unit_of_work():
+                    db.session.add(ApprovedEmail(email='inner@mit.edu', role=UserRole.REQUESTER))
+                    db.session.flush()
+                    raise RuntimeError('inner failure')
+            db.session.add(ApprovedEmail(email='after@mit.edu', role=UserRole.REQUESTER))
+
+        db.session.remove()
+        assert allowlisted('outer@mit.edu')
+        assert allowlisted('after@mit.edu')
+        assert not allowlisted('inner@mit.edu')
+
+
+def test_outer_unit_that_raises_rolls_back_everything(app):
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                db.session.add(ApprovedEmail(email='outer@mit.edu', role=UserRole.REQUESTER))
+                with unit_of_work():
+                    db.session.add(ApprovedEmail(email='inner@mit.edu', role=UserRole.REQUESTER))
+                raise RuntimeError('outer failure')
+
+        db.session.remove()
+        assert not allowlisted('outer@mit.edu')
+        assert not allowlisted('inner@mit.edu')
+
+
+def test_nested_unit_before_any_outer_write_rolls_back_with_the_outer_unit(app):
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                with unit_of_work():
+                    db.session.add(ApprovedEmail(email='inner@mit.edu', role=UserRole.REQUESTER))
+                raise RuntimeError('outer failure')
+
+        db.session.remove()
+        assert not allowlisted('inner@mit.edu')
+
+
+def commits(endpoint):
+    return commit_stats.stats().get(endpoint, {'requests': 0, 'commits': 0})
+
+
+def test_approve_and_status_update_commit_once_per_request(app, login, create_purchase):
+    app.config['ENABLE_EMAIL_NOTIFICATIONS'] = True
+    purchase_id = create_purchase()
+    sublead, business = login('sublead'), login('business')
+    before = {endpoint: commits(endpoint) for endpoint in ('api.approve_purchase', 'api.update_purchase_status')}
+
+    response = sublead.post(f'/api/purchases/{purchase_id}/approve', json={})
+    assert response.status_code == 200, response.get_json()
+    for status in ('Purchased', 'Shipped'):
+        response = business.put(f'/api/purchases/{purchase_id}/status', json={'status': status})
+        assert response.status_code == 200, response.get_json()
+
+    for endpoint, requests in (('api.approve_purchase', 1), ('api.update_purchase_status', 2)):
+        after = commits(endpoint)
+        assert after['requests'] - before[endpoint]['requests'] == requests
+        assert after['commits'] - before[endpoint]['commits'] == requests
@@ -0,0 +1,57 @@
+"""
+Refcount cleanup only collects subfolders whose files have a reference owner
+"""
+import io
+import os
+import sys
+
+from werkzeug.datastructures import FileStorage
+
+import cleanup_uploads
+from app.models import Purchase
+from app.services import FileService
+
+
+def upload(file_service, subfolder, content):
+    result = file_service.save_file(FileStorage(io.BytesIO(content), filename='quote.pdf'), subfolder)
+    assert result['success'], result['message']
+    return result['filepath']
+
+
+def test_unreferenced_documents_are_kept(app):
+    with app.app_context():
+        file_service = FileService()
+        document = upload(file_service, 'documents', b'budget spreadsheet')
+        photo = upload(file_service, Purchase.ARRIVAL_PHOTO_FOLDER, b'never attached')
+
+        result = file_service.cleanup_orphaned_files(grace_period=0)
+
+    assert result == {'deleted': 1, 'errors': []}
+    assert os.path.exists(document)
+    assert not os.path.exists(photo)
+
+
+def test_cleanup_refuses_subfolders_without_owner(app):
+    with app.app_context():
+        file_service = FileService()
+        document = upload(file_service, 'documents', b'budget spreadsheet')
+
+        result = file_service.cleanup_orphaned_files(subfolder='documents', grace_period=0)
+
+    assert result['deleted'] == 0 and result['errors']
+    assert os.path.exists(document)
+
+
+def test_cli_only_collects_requested_subfolder(app, monkeypatch, tmp_path):
+    with app.app_context():
+        photo = upload(FileService(), Purchase.ARRIVAL_PHOTO_FOLDER, b'never attached')
+    monkeypatch.setattr(cleanup_uploads, 'create_app', lambda: app)
+    options = ['--grace-hours', '0', '--checkpoint', str(tmp_path / 'upload_gc.json')]
+    monkeypatch.setattr(sys, 'argv', ['cleanup_uploads.py', '--subfolder', 'temp', *options])
+
+    cleanup_uploads.main()
+    assert os.path.exists(photo)
+
+    monkeypatch.setattr(sys, 'argv', ['cleanup_uploads.py', *options])
+    cleanup_uploads.main()
+    assert not os.path.exists(photo)
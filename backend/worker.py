@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Background worker that delivers queued email from the outbox and
+sends approval digests as their windows close
+
+Usage:
+    python worker.py            # poll forever
+    python worker.py --once     # drain due messages and exit
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.services import OutboxService, DigestService
+
+_running = True
+
+
+def _stop(signum, frame):
+    global _running
+    _running = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver queued email from the outbox')
+    parser.add_argument('--once', action='store_true', help='drain due messages and exit')
+    parser.add_argument('--batch-size', type=int, help='messages per batch (default: OUTBOX_BATCH_SIZE)')
+    args = parser.parse_args()
+
+    app = create_app()
+    outbox = OutboxService()
+    digests = DigestService(outbox.email_service)
+    poll_interval = app.config.get('OUTBOX_POLL_INTERVAL', 5)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    print('📬 Outbox worker started')
+    while _running:
+        with app.app_context():
+            # Separate so a failing digest cannot hold up outbox delivery
+            try:
+                flushed = digests.flush_due()
+                if flushed['digests']:
+                    app.logger.info(f'Approval digests queued: {flushed}')
+            except Exception as e:
+                app.logger.error(f'Digest flush error: {str(e)}')
+            
+            try:
+                result = outbox.drain(args.batch_size)
+                if any(result.values()):
+                    app.logger.info(f'Outbox batch: {result}; delivery: {outbox.email_service.stats.snapshot()}')
+            except Exception as e:
+                app.logger.error(f'Outbox worker error: {str(e)}')
+
+        if args.once:
+            break
+        time.sleep(poll_interval)
+
+    print('📭 Outbox worker stopped')
+
+
+if __name__ == '__main__':
+    main()